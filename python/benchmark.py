@@ -0,0 +1,271 @@
+"""
+Offline benchmark suite for the NER pipelines.
+Starts the local mock Language service, streams synthetic invoice corpora from
+synthetic_invoices (10, 10k and 1M invoices by default) through each pipeline
+mode and reports docs/sec, per-document latency p50/p95/p99 and peak RSS. Every (mode, size) run
+happens in a fresh process so peak RSS is not inherited from earlier runs.
+Results can be saved as JSON and compared against a baseline to catch regressions.
+
+Usage:
+    python3 benchmark.py --sizes 10,10000 --json results.json
+    python3 benchmark.py --sizes 10000 --modes fine-tuned --baseline results.json --max-regression 0.15
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import LatencyStats
+from mock_language_service import LATENCY_DISTRIBUTIONS, start_mock_language_service
+from synthetic_invoices import LAYOUTS, generate_invoices
+
+DEFAULT_SIZES = [10, 10_000, 1_000_000]
+MODES = ["fine-tuned", "standard-sync", "standard-async", "comparison"]
+
+# Per-document latency samples kept for the percentiles, so memory stays flat on 1M documents
+RESERVOIR_SIZE = 100_000
+
+# Benchmark settings applied in the worker unless already set in the environment.
+# Rate limits are off so the pipeline, not the client-side quota, is measured, and the
+# poll delays are scaled down to match the mock's sub-second job latencies.
+BENCHMARK_ENVIRONMENT = {
+    "AI_FOUNDRY_PROJECT_NAME": "benchmark",
+    "AI_FOUNDRY_DEPLOYMENT_NAME": "benchmark",
+    "KEY_VAULT_URI": "https://benchmark.invalid/",
+    "RESULT_CACHE_ENABLED": "false",
+    "SECRET_CACHE_ENABLED": "false",
+    "METRICS_OTEL_ENABLED": "false",
+    "RATE_LIMIT_STANDARD_RPS": "0",
+    "RATE_LIMIT_JOB_SUBMIT_RPS": "0",
+    "RATE_LIMIT_JOB_POLL_RPS": "0",
+    "CUSTOM_NER_POLL_FIRST_DELAY": "0.1",
+    "CUSTOM_NER_POLL_MAX_DELAY": "1.0",
+    "LOG_LEVEL": "WARNING",
+}
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _timed_source(invoices, pulled_at):
+    """Record when the pipeline pulls each invoice from the corpus."""
+    for invoice in invoices:
+        pulled_at[invoice["file_name"]] = time.perf_counter()
+        yield invoice
+
+
+def _pipeline(mode):
+    """Return a function mapping an invoice stream to (file_name, entities) pairs for mode."""
+    from config import Config
+
+    if mode == "fine-tuned":
+        from fine_tuned_ner import extract_entities_batched
+        return extract_entities_batched
+    if mode in ("standard-sync", "standard-async"):
+        from model_comparison import iter_standard_model
+        Config.STANDARD_NER_ENGINE = mode.split("-")[1]
+        return iter_standard_model
+    if mode == "comparison":
+        from model_comparison import run_parallel_comparison
+
+        def compare(invoices):
+            standard_results, _ = run_parallel_comparison(invoices)
+            for file_name, entities in standard_results["entities_by_invoice"].items():
+                yield file_name, entities
+        return compare
+    raise ValueError(f"Unknown benchmark mode: {mode}")
+
+
+def run_benchmark(mode, size, endpoint, seed=0, layout="single", quiet=True):
+    """
+    Run one pipeline mode over a synthetic corpus. Meant to run in a fresh process.
+
+    Args:
+        mode (str): One of MODES.
+        size (int): Number of synthetic documents.
+        endpoint (str): Mock Language service endpoint.
+        seed (int): Corpus seed.
+        layout (str): Synthetic corpus layout, "single" or "batch" (see synthetic_invoices).
+        quiet (bool): Discard the pipeline's per-document console output.
+
+    Returns:
+        dict: mode, size, documents, entities, seconds, docs_per_sec, p50/p95/p99 (seconds,
+              None for the comparison mode), peak_rss_mb and the per-stage metrics snapshot.
+    """
+    os.environ["LANGUAGE_SERVICE_ENDPOINT"] = endpoint
+    for name, value in BENCHMARK_ENVIRONMENT.items():
+        os.environ.setdefault(name, value)
+
+    from config import Config
+    from metrics import registry
+
+    Config.set_secrets({
+        Config.LANGUAGE_SERVICE_KEY_SECRET: "benchmark-key",
+        Config.GPT_5_CHAT_KEY_SECRET: "benchmark-key",
+        Config.GPT_5_CHAT_ENDPOINT_SECRET: endpoint,
+        Config.STORAGE_CONNECTION_STRING_SECRET: "",
+    })
+    Config.configure_observability()
+    pipeline = _pipeline(mode)
+
+    pulled_at = {}
+    latencies = LatencyStats("document", capacity=RESERVOIR_SIZE)
+    invoices = generate_invoices(size, layout=layout, seed=seed, with_labels=False)
+    # The comparison only hands back results once both models finish the whole
+    # corpus, so its per-document latency would just be the run time
+    if mode != "comparison":
+        invoices = _timed_source(invoices, pulled_at)
+    documents = 0
+    entities_found = 0
+    output = open(os.devnull, 'w') if quiet else sys.stdout
+    started_at = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        for file_name, entities in pipeline(invoices):
+            pulled = pulled_at.pop(file_name, None)
+            if pulled is not None:
+                latencies.record(time.perf_counter() - pulled)
+            documents += 1
+            entities_found += len(entities)
+    seconds = time.perf_counter() - started_at
+    if quiet:
+        output.close()
+
+    result = {
+        "mode": mode,
+        "size": size,
+        "documents": documents,
+        "entities": entities_found,
+        "seconds": seconds,
+        "docs_per_sec": documents / seconds if seconds else 0.0,
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages": registry.snapshot(),
+    }
+    summary = latencies.summary()
+    result.update({key: summary.get(key) for key in ("p50", "p95", "p99")})
+    return result
+
+
+def _format_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.1f}ms"
+
+
+def format_results(results):
+    """Format benchmark results as a fixed-width table."""
+    lines = [f"{'mode':<16}{'docs':>10}{'seconds':>10}{'docs/sec':>12}{'p50':>10}{'p95':>10}{'p99':>10}"
+             f"{'peak RSS':>11}"]
+    for result in results:
+        lines.append(
+            f"{result['mode']:<16}{result['documents']:>10}{result['seconds']:>10.2f}"
+            f"{result['docs_per_sec']:>12.1f}{_format_ms(result['p50']):>10}{_format_ms(result['p95']):>10}"
+            f"{_format_ms(result['p99']):>10}{result['peak_rss_mb']:>8.1f}MiB")
+    return "\n".join(lines)
+
+
+def find_regressions(results, baseline, max_regression=0.2):
+    """
+    Compare results with a baseline run of the same modes and sizes.
+
+    A run regresses if its docs/sec drops, or its p95 latency rises, by more than
+    max_regression (a fraction) relative to the baseline. Runs missing from the
+    baseline are ignored.
+
+    Returns:
+        list: Human-readable regression descriptions.
+    """
+    baseline_runs = {(run["mode"], run["size"]): run for run in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline_runs.get((result["mode"], result["size"]))
+        if previous is None:
+            continue
+        label = f"{result['mode']} @ {result['size']}"
+        if previous["docs_per_sec"] and result["docs_per_sec"] < previous["docs_per_sec"] * (1 - max_regression):
+            regressions.append(f"{label}: {result['docs_per_sec']:.1f} docs/sec vs "
+                               f"{previous['docs_per_sec']:.1f} baseline")
+        if previous.get("p95") and result.get("p95") and result["p95"] > previous["p95"] * (1 + max_regression):
+            regressions.append(f"{label}: p95 {_format_ms(result['p95'])} vs {_format_ms(previous['p95'])} baseline")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the NER pipelines against the mock Language service")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated corpus sizes")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"Comma-separated subset of {', '.join(MODES)}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--layout", choices=LAYOUTS, default="single", help="Synthetic corpus layout; with \"batch\" a document is a file of several invoices")
+    parser.add_argument("--job-latency", type=float, default=0.2, help="Typical mock job latency in seconds")
+    parser.add_argument("--request-latency", type=float, default=0.02,
+                        help="Typical mock recognize_entities latency in seconds")
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--latency-spread", type=float, default=0.5)
+    parser.add_argument("--throttle-probability", type=float, default=0.0,
+                        help="Fraction of mock requests answered with 429")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Tolerated fractional drop in docs/sec or rise in p95 latency")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipelines' own console output")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(unknown)}")
+
+    server, service, endpoint = start_mock_language_service(
+        job_latency=args.job_latency, throttle_probability=args.throttle_probability,
+        request_latency=args.request_latency, latency_distribution=args.latency_distribution,
+        latency_spread=args.latency_spread, retain_jobs=False, seed=args.seed)
+    print(f"🧪 Mock Language service at {endpoint} "
+          f"(jobs {args.latency_distribution} ~{args.job_latency}s, requests ~{args.request_latency}s)")
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    try:
+        for size in sizes:
+            for mode in modes:
+                print(f"  ▶ {mode} on {size} documents...", flush=True)
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    result = executor.submit(run_benchmark, mode, size, endpoint, args.seed, args.layout,
+                                             not args.verbose).result()
+                results.append(result)
+                print(f"    {result['docs_per_sec']:.1f} docs/sec, p95 {_format_ms(result['p95'])}, "
+                      f"peak RSS {result['peak_rss_mb']:.1f}MiB")
+    finally:
+        server.shutdown()
+
+    print("\n" + "=" * 89)
+    print(format_results(results))
+    print("=" * 89)
+    print(f"Mock service: {service.submitted_jobs} job submissions, {service.status_requests} status polls, "
+          f"{service.recognition_requests} recognition requests, {service.throttled_requests} throttled")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = find_regressions(results, json.load(f), args.max_regression)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.max_regression:.0%}:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.max_regression:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
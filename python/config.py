@@ -2,14 +2,26 @@
 Centralized configuration management for Azure NLP Solution.
 Loads all configuration from environment variables and Key Vault.
 Retrieves Key Vault URI directly from Key Vault if not provided in .env.
+Secrets are resolved lazily on first use, fetched concurrently and can be kept
+in an encrypted local cache so short-lived workers skip Key Vault entirely.
+Heavy dependencies are only imported by the accessors that need them.
 """
 
+import logging
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
+from http_client import create_session, sdk_session
+from invoice_loader import resolve_invoices_dir
+from metrics import registry
+from polling import PollingPolicy
+from rate_limiter import JOB_POLL, JOB_SUBMIT, STANDARD, TokenBucket
+
+# The Azure SDK clients, caches, ledgers and the standard NER engine are imported
+# by the get_* accessors that build them, so an entry point only loads what it uses
 
 
 class Config:
@@ -31,11 +43,128 @@ class Config:
     AZURE_SUBSCRIPTION_ID = os.getenv("AZURE_SUBSCRIPTION_ID")
     AZURE_ENVIRONMENT = os.getenv("AZURE_ENVIRONMENT", "qa")  # qa, prod, or dev
     
+    # Fine-tuned model job batching (service limits: 25 documents, 125,000 characters per job)
+    CUSTOM_NER_MAX_DOCUMENTS_PER_JOB = int(os.getenv("CUSTOM_NER_MAX_DOCUMENTS_PER_JOB", "25"))
+    CUSTOM_NER_MAX_CHARACTERS_PER_JOB = int(os.getenv("CUSTOM_NER_MAX_CHARACTERS_PER_JOB", "125000"))
+    # Number of analyze-text jobs kept running on the service at the same time
+    CUSTOM_NER_MAX_IN_FLIGHT_JOBS = int(os.getenv("CUSTOM_NER_MAX_IN_FLIGHT_JOBS", "8"))
+    # Job status polling: short first poll, exponential backoff with jitter, overall deadline
+    CUSTOM_NER_POLL_FIRST_DELAY = float(os.getenv("CUSTOM_NER_POLL_FIRST_DELAY", "0.5"))
+    CUSTOM_NER_POLL_MULTIPLIER = float(os.getenv("CUSTOM_NER_POLL_MULTIPLIER", "1.6"))
+    CUSTOM_NER_POLL_MAX_DELAY = float(os.getenv("CUSTOM_NER_POLL_MAX_DELAY", "10"))
+    CUSTOM_NER_POLL_JITTER = float(os.getenv("CUSTOM_NER_POLL_JITTER", "0.2"))
+    CUSTOM_NER_JOB_DEADLINE_SECONDS = float(os.getenv("CUSTOM_NER_JOB_DEADLINE_SECONDS", "600"))
+    
+    # Standard NER batching (service limit: 5 documents per recognize_entities request)
+    STANDARD_NER_BATCH_SIZE = int(os.getenv("STANDARD_NER_BATCH_SIZE", "5"))
+    STANDARD_NER_ADAPTIVE_BATCHING = os.getenv("STANDARD_NER_ADAPTIVE_BATCHING", "true").lower() == "true"
+    STANDARD_NER_TARGET_LATENCY = float(os.getenv("STANDARD_NER_TARGET_LATENCY", "2.0"))
+    STANDARD_NER_MAX_CHARACTERS_PER_REQUEST = int(os.getenv("STANDARD_NER_MAX_CHARACTERS_PER_REQUEST", "25600"))
+    # Engine: "sync", "async" or "auto" (async once a run has more than STANDARD_NER_ASYNC_THRESHOLD documents)
+    STANDARD_NER_ENGINE = os.getenv("STANDARD_NER_ENGINE", "auto").lower()
+    STANDARD_NER_ASYNC_THRESHOLD = int(os.getenv("STANDARD_NER_ASYNC_THRESHOLD", "50"))
+    STANDARD_NER_CONCURRENCY = int(os.getenv("STANDARD_NER_CONCURRENCY", "8"))
+    
+    # Shared HTTP connection pool
+    HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+    HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+    HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+    HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+    HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))
+    
+    # Client-side rate limits in requests/second per endpoint class (0 disables a limit)
+    RATE_LIMIT_STANDARD_RPS = float(os.getenv("RATE_LIMIT_STANDARD_RPS", "15"))
+    RATE_LIMIT_JOB_SUBMIT_RPS = float(os.getenv("RATE_LIMIT_JOB_SUBMIT_RPS", "5"))
+    RATE_LIMIT_JOB_POLL_RPS = float(os.getenv("RATE_LIMIT_JOB_POLL_RPS", "20"))
+    # Retries for a request the service answered with HTTP 429
+    RATE_LIMIT_MAX_THROTTLE_RETRIES = int(os.getenv("RATE_LIMIT_MAX_THROTTLE_RETRIES", "5"))
+    
+    # Persistent entity result cache (set RESULT_CACHE_ENABLED=false to always call the models)
+    RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", str(Path(__file__).parent / ".cache" / "ner_results.sqlite"))
+    RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "100000"))
+    
+    # Durable per-run ledger of document/job states so interrupted batch runs can be resumed
+    JOB_LEDGER_ENABLED = os.getenv("JOB_LEDGER_ENABLED", "true").lower() == "true"
+    JOB_LEDGER_PATH = os.getenv("JOB_LEDGER_PATH", str(Path(__file__).parent / ".cache" / "job_ledger.sqlite"))
+    
+    # Manifest of processed invoices used by --incremental runs to process only new or changed files
+    INVOICE_MANIFEST_PATH = os.getenv("INVOICE_MANIFEST_PATH",
+                                      str(Path(__file__).parent / ".cache" / "invoice_manifest.sqlite"))
+    
+    # Local rule-based pre-extraction of deterministic "Label: value" fields. Types listed in
+    # RULE_EXTRACTOR_ENTITY_TYPES are extracted locally and cut from the model input; documents
+    # missing any RULE_EXTRACTOR_REQUIRED_TYPES are sent to the model unchanged.
+    RULE_EXTRACTOR_ENABLED = os.getenv("RULE_EXTRACTOR_ENABLED", "true").lower() == "true"
+    RULE_EXTRACTOR_ENTITY_TYPES = [
+        entity_type.strip() for entity_type in
+        os.getenv("RULE_EXTRACTOR_ENTITY_TYPES", "InvoiceNumber,Date,Amount,Quantity,UnitPrice").split(",")
+        if entity_type.strip()
+    ]
+    RULE_EXTRACTOR_REQUIRED_TYPES = [
+        entity_type.strip() for entity_type in
+        os.getenv("RULE_EXTRACTOR_REQUIRED_TYPES", "InvoiceNumber,Date").split(",")
+        if entity_type.strip()
+    ]
+    
+    # Logging and metrics export. LOG_LEVEL=DEBUG brings back the request/response debug output;
+    # METRICS_PROMETHEUS_PATH writes Prometheus text at the end of a run (e.g. for the node_exporter
+    # textfile collector); METRICS_OTEL_ENABLED publishes through OpenTelemetry (opentelemetry-api).
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    METRICS_PROMETHEUS_PATH = os.getenv("METRICS_PROMETHEUS_PATH")
+    METRICS_OTEL_ENABLED = os.getenv("METRICS_OTEL_ENABLED", "false").lower() == "true"
+    
+    # Optional encrypted local secret cache (needs the cryptography package and a Fernet key;
+    # generate one with `python3 secret_cache.py`)
+    SECRET_CACHE_ENABLED = os.getenv("SECRET_CACHE_ENABLED", "false").lower() == "true"
+    SECRET_CACHE_PATH = os.getenv("SECRET_CACHE_PATH", str(Path(__file__).parent / ".cache" / "secrets.bin"))
+    SECRET_CACHE_TTL_SECONDS = float(os.getenv("SECRET_CACHE_TTL_SECONDS", "900"))
+    SECRET_CACHE_KEY = os.getenv("SECRET_CACHE_KEY")
+    
+    # Key Vault secret names
+    LANGUAGE_SERVICE_KEY_SECRET = "language-service-key"
+    STORAGE_CONNECTION_STRING_SECRET = "storage-connection-string"
+    GPT_5_CHAT_KEY_SECRET = "gpt-5-chat-key"
+    GPT_5_CHAT_ENDPOINT_SECRET = "gpt-5-chat-endpoint"
+    
+    # Blob invoice ingestion (--invoices blob://<container>/<prefix>). Keep HTTP_POOL_MAXSIZE at or
+    # above the download concurrency; blobs larger than the range size download as parallel ranges.
+    INVOICES_CONTAINER = os.getenv("INVOICES_CONTAINER", "invoices")
+    BLOB_DOWNLOAD_CONCURRENCY = int(os.getenv("BLOB_DOWNLOAD_CONCURRENCY", "8"))
+    BLOB_DOWNLOAD_RANGE_BYTES = int(os.getenv("BLOB_DOWNLOAD_RANGE_BYTES", str(4 * 1024 * 1024)))
+    # STORAGE_CONNECTION_STRING (above) overrides the Key Vault secret, e.g. "UseDevelopmentStorage=true" for Azurite
+    
+    # Daemon mode (extraction_daemon.py): arriving invoices are micro-batched until the batch is full
+    # or the window since its first invoice closes; health and metrics are served over HTTP
+    DAEMON_BATCH_MAX_DOCUMENTS = int(os.getenv("DAEMON_BATCH_MAX_DOCUMENTS", "25"))
+    DAEMON_BATCH_WINDOW_SECONDS = float(os.getenv("DAEMON_BATCH_WINDOW_SECONDS", "2"))
+    DAEMON_POLL_INTERVAL_SECONDS = float(os.getenv("DAEMON_POLL_INTERVAL_SECONDS", "1"))
+    DAEMON_QUEUE_MAX_DOCUMENTS = int(os.getenv("DAEMON_QUEUE_MAX_DOCUMENTS", "10000"))
+    DAEMON_HTTP_HOST = os.getenv("DAEMON_HTTP_HOST", "127.0.0.1")
+    DAEMON_HTTP_PORT = int(os.getenv("DAEMON_HTTP_PORT", "8080"))
+    # A failed invoice is retried after DAEMON_RETRY_BACKOFF_SECONDS, doubling per attempt; after
+    # DAEMON_MAX_ATTEMPTS failures it is written to the dead-letter folder with its last error
+    DAEMON_MAX_ATTEMPTS = int(os.getenv("DAEMON_MAX_ATTEMPTS", "3"))
+    DAEMON_RETRY_BACKOFF_SECONDS = float(os.getenv("DAEMON_RETRY_BACKOFF_SECONDS", "5"))
+    
+    # Extraction reports (streamed to Blob Storage in staged blocks)
+    REPORTS_CONTAINER = os.getenv("REPORTS_CONTAINER", "reports")
+    REPORT_BLOCK_SIZE_BYTES = int(os.getenv("REPORT_BLOCK_SIZE_BYTES", str(4 * 1024 * 1024)))
+    
     # Credentials
     _credential = None
     _key_vault_client = None
-    _language_service_key = None
-    _storage_connection_string_from_kv = None
+    _secrets = {}
+    _secrets_lock = threading.Lock()
+    _secret_cache = None
+    _http_session = None
+    _sdk_http_session = None
+    _result_cache = None
+    _blob_service_client = None
+    _rate_limiters = {}
+    _rule_extractor = None
     
     @classmethod
     def _resolve_key_vault_uri(cls):
@@ -106,13 +235,158 @@ class Config:
         
         return True
     
+    @classmethod
+    def configure_observability(cls):
+        """Set up leveled logging and, if enabled, OpenTelemetry metric export."""
+        logging.basicConfig(level=getattr(logging, cls.LOG_LEVEL, logging.INFO),
+                            format="  [%(levelname)s] %(message)s")
+        if cls.METRICS_OTEL_ENABLED:
+            try:
+                registry.register_opentelemetry()
+            except RuntimeError as e:
+                print(f"⚠️  {e}", file=sys.stderr)
+    
+    @classmethod
+    def export_metrics(cls):
+        """Write the Prometheus metrics file if METRICS_PROMETHEUS_PATH is set."""
+        if not cls.METRICS_PROMETHEUS_PATH:
+            return
+        try:
+            registry.write_prometheus(cls.METRICS_PROMETHEUS_PATH)
+            print(f"📈 Metrics written to {cls.METRICS_PROMETHEUS_PATH}")
+        except OSError as e:
+            print(f"⚠️  Could not write metrics file: {e}", file=sys.stderr)
+    
     @classmethod
     def get_credential(cls):
         """Get Azure credential for authentication."""
         if cls._credential is None:
+            from azure.identity import DefaultAzureCredential
             cls._credential = DefaultAzureCredential()
         return cls._credential
     
+    @classmethod
+    def get_http_session(cls):
+        """Get the shared pooled keep-alive HTTP session."""
+        if cls._http_session is None:
+            cls._http_session = create_session(
+                pool_connections=cls.HTTP_POOL_CONNECTIONS,
+                pool_maxsize=cls.HTTP_POOL_MAXSIZE,
+                connect_timeout=cls.HTTP_CONNECT_TIMEOUT,
+                read_timeout=cls.HTTP_READ_TIMEOUT,
+                max_retries=cls.HTTP_MAX_RETRIES,
+                retry_backoff=cls.HTTP_RETRY_BACKOFF,
+            )
+        return cls._http_session
+    
+    @classmethod
+    def get_http_transport(cls):
+        """Get an Azure SDK transport that shares the HTTP session's pools, leaving retries to the SDK."""
+        from azure.core.pipeline.transport import RequestsTransport
+        if cls._sdk_http_session is None:
+            cls._sdk_http_session = sdk_session(cls.get_http_session())
+        return RequestsTransport(session=cls._sdk_http_session, session_owner=False)
+    
+    @classmethod
+    def get_blob_service_client(cls):
+        """Get a Blob Storage client that shares the pooled HTTP transport."""
+        if cls._blob_service_client is None:
+            from azure.storage.blob import BlobServiceClient
+            cls._blob_service_client = BlobServiceClient.from_connection_string(
+                cls.get_storage_connection_string(),
+                transport=cls.get_http_transport()
+            )
+        return cls._blob_service_client
+    
+    @classmethod
+    def get_result_cache(cls):
+        """Get the persistent entity result cache, or None if caching is disabled."""
+        if not cls.RESULT_CACHE_ENABLED:
+            return None
+        if cls._result_cache is None:
+            from result_cache import ResultCache
+            cls._result_cache = ResultCache(
+                cls.RESULT_CACHE_PATH,
+                ttl_seconds=cls.RESULT_CACHE_TTL_SECONDS,
+                max_entries=cls.RESULT_CACHE_MAX_ENTRIES,
+            )
+        return cls._result_cache
+    
+    @classmethod
+    def get_job_ledger(cls, run_id):
+        """Open the job ledger for a run, or return None if the ledger is disabled."""
+        if not cls.JOB_LEDGER_ENABLED:
+            return None
+        from job_ledger import JobLedger
+        return JobLedger(cls.JOB_LEDGER_PATH, run_id)
+    
+    @classmethod
+    def get_invoice_manifest(cls, location, pipeline):
+        """Open the processed-invoice manifest of one pipeline for an invoice location."""
+        from blob_invoice_source import BLOB_SCHEME
+        from invoice_manifest import InvoiceManifest
+        if not location.startswith(BLOB_SCHEME):
+            location = resolve_invoices_dir(location)
+        return InvoiceManifest(cls.INVOICE_MANIFEST_PATH, location, pipeline)
+    
+    @classmethod
+    def get_polling_policy(cls):
+        """Get the job status polling policy for the fine-tuned model."""
+        return PollingPolicy(
+            first_delay=cls.CUSTOM_NER_POLL_FIRST_DELAY,
+            multiplier=cls.CUSTOM_NER_POLL_MULTIPLIER,
+            max_delay=cls.CUSTOM_NER_POLL_MAX_DELAY,
+            jitter=cls.CUSTOM_NER_POLL_JITTER,
+            deadline=cls.CUSTOM_NER_JOB_DEADLINE_SECONDS,
+        )
+    
+    @classmethod
+    def get_rate_limiter(cls, name):
+        """
+        Get the shared token bucket for an endpoint class.
+        
+        Args:
+            name (str): rate_limiter.STANDARD, JOB_SUBMIT or JOB_POLL.
+        """
+        if name not in cls._rate_limiters:
+            rates = {
+                STANDARD: cls.RATE_LIMIT_STANDARD_RPS,
+                JOB_SUBMIT: cls.RATE_LIMIT_JOB_SUBMIT_RPS,
+                JOB_POLL: cls.RATE_LIMIT_JOB_POLL_RPS,
+            }
+            cls._rate_limiters[name] = TokenBucket(rates[name], name=name)
+        return cls._rate_limiters[name]
+    
+    @classmethod
+    def get_rate_limiters(cls):
+        """Get every rate limiter created so far."""
+        return list(cls._rate_limiters.values())
+    
+    @classmethod
+    def get_rule_extractor(cls):
+        """Get the local rule-based pre-extractor, or None if it is disabled."""
+        if not cls.RULE_EXTRACTOR_ENABLED:
+            return None
+        if cls._rule_extractor is None:
+            from rule_extractor import RuleExtractor
+            cls._rule_extractor = RuleExtractor(
+                entity_types=cls.RULE_EXTRACTOR_ENTITY_TYPES,
+                required_types=cls.RULE_EXTRACTOR_REQUIRED_TYPES,
+            )
+        return cls._rule_extractor
+    
+    @classmethod
+    def get_batch_sizer(cls):
+        """Get a new batch sizer for the standard NER model, configured from the environment."""
+        from standard_ner import AdaptiveBatchSizer
+        return AdaptiveBatchSizer(
+            initial=cls.STANDARD_NER_BATCH_SIZE,
+            maximum=cls.STANDARD_NER_BATCH_SIZE,
+            target_latency=cls.STANDARD_NER_TARGET_LATENCY,
+            max_characters=cls.STANDARD_NER_MAX_CHARACTERS_PER_REQUEST,
+            adaptive=cls.STANDARD_NER_ADAPTIVE_BATCHING,
+        )
+    
     @classmethod
     def get_key_vault_client(cls):
         """Get Key Vault client for retrieving secrets."""
@@ -121,38 +395,161 @@ class Config:
             if not cls.KEY_VAULT_URI:
                 cls._resolve_key_vault_uri()
             
+            from azure.keyvault.secrets import SecretClient
             credential = cls.get_credential()
             cls._key_vault_client = SecretClient(
                 vault_url=cls.KEY_VAULT_URI,
-                credential=credential
+                credential=credential,
+                transport=cls.get_http_transport()
             )
         return cls._key_vault_client
     
     @classmethod
-    def get_language_service_key(cls):
-        """Get language service API key from Key Vault."""
-        if cls._language_service_key is None:
+    def get_secret_cache(cls):
+        """Get the encrypted local secret cache, or None if it is disabled or unavailable."""
+        if not cls.SECRET_CACHE_ENABLED:
+            return None
+        if cls._secret_cache is None:
+            if not cls.SECRET_CACHE_KEY:
+                print("⚠️  SECRET_CACHE_ENABLED is set but SECRET_CACHE_KEY is missing; not caching secrets",
+                      file=sys.stderr)
+                cls.SECRET_CACHE_ENABLED = False
+                return None
             try:
-                kv_client = cls.get_key_vault_client()
-                secret = kv_client.get_secret("language-service-key")
-                cls._language_service_key = secret.value
-            except Exception as e:
-                print(f"❌ Error retrieving language-service-key from Key Vault: {e}", file=sys.stderr)
-                sys.exit(1)
-        return cls._language_service_key
+                from secret_cache import EncryptedSecretCache
+                cls._secret_cache = EncryptedSecretCache(
+                    cls.SECRET_CACHE_PATH,
+                    cls.SECRET_CACHE_KEY,
+                    ttl_seconds=cls.SECRET_CACHE_TTL_SECONDS,
+                )
+            except (RuntimeError, ValueError) as e:
+                print(f"⚠️  Secret cache disabled: {e}", file=sys.stderr)
+                cls.SECRET_CACHE_ENABLED = False
+                return None
+        return cls._secret_cache
     
     @classmethod
-    def get_storage_connection_string(cls):
-        """Get storage connection string from Key Vault."""
-        if cls._storage_connection_string_from_kv is None:
+    def prefetch_secrets(cls, names):
+        """
+        Resolve several Key Vault secrets at once.
+        
+        Secrets already resolved in this process are skipped, then the encrypted
+        local cache is consulted (if enabled) and whatever is still missing is
+        fetched from Key Vault concurrently. Secrets replaced by an environment
+        variable (see _secret_overrides) are never fetched. Exits if any secret
+        cannot be retrieved.
+        
+        Args:
+            names (list): Key Vault secret names.
+        """
+        overrides = cls._secret_overrides()
+        # The lock only guards the dict; Key Vault and the cache are read without it
+        with cls._secrets_lock:
+            missing = [name for name in dict.fromkeys(names) if name not in cls._secrets and name not in overrides]
+        if not missing:
+            return
+        
+        cache = cls.get_secret_cache()
+        if cache:
+            cached = cache.get_many(missing)
+            with cls._secrets_lock:
+                cls._secrets.update(cached)
+            missing = [name for name in missing if name not in cached]
+            if not missing:
+                return
+        
+        kv_client = cls.get_key_vault_client()
+        with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+            futures = {name: pool.submit(kv_client.get_secret, name) for name in missing}
+        
+        fetched = {}
+        failed = []
+        for name, future in futures.items():
             try:
-                kv_client = cls.get_key_vault_client()
-                secret = kv_client.get_secret("storage-connection-string")
-                cls._storage_connection_string_from_kv = secret.value
+                fetched[name] = future.result().value
             except Exception as e:
-                print(f"❌ Error retrieving storage-connection-string from Key Vault: {e}", file=sys.stderr)
-                sys.exit(1)
-        return cls._storage_connection_string_from_kv
+                print(f"❌ Error retrieving {name} from Key Vault: {e}", file=sys.stderr)
+                failed.append(name)
+        
+        with cls._secrets_lock:
+            cls._secrets.update(fetched)
+        if cache and fetched:
+            try:
+                cache.put_many(fetched)
+            except OSError as e:
+                print(f"⚠️  Could not write secret cache: {e}", file=sys.stderr)
+        if failed:
+            sys.exit(1)
+    
+    @classmethod
+    def _secret_overrides(cls):
+        """Return Key Vault secret name -> value for secrets set through the environment."""
+        overrides = {cls.STORAGE_CONNECTION_STRING_SECRET: cls.STORAGE_CONNECTION_STRING}
+        return {name: value for name, value in overrides.items() if value}
+    
+    @classmethod
+    def get_secret(cls, name):
+        """Get a single Key Vault secret (or its environment override), fetching it on first use."""
+        override = cls._secret_overrides().get(name)
+        if override:
+            return override
+        if name not in cls._secrets:
+            cls.prefetch_secrets([name])
+        return cls._secrets[name]
+
+    @classmethod
+    def get_secrets(cls, names):
+        """
+        Resolve several secrets (see prefetch_secrets) and return their values,
+        e.g. to hand them to worker processes.
+        
+        Returns:
+            dict: Key Vault secret name -> value.
+        """
+        cls.prefetch_secrets(names)
+        return {name: cls.get_secret(name) for name in names}
+    
+    @classmethod
+    def share_rate_limits(cls, parts):
+        """
+        Split the client-side rate limits evenly between parts processes that share
+        one service quota. Call before the first rate limiter is created.
+        """
+        cls.RATE_LIMIT_STANDARD_RPS /= parts
+        cls.RATE_LIMIT_JOB_SUBMIT_RPS /= parts
+        cls.RATE_LIMIT_JOB_POLL_RPS /= parts
+    
+    @classmethod
+    def set_secrets(cls, values):
+        """
+        Provide secret values directly so Key Vault is never contacted,
+        e.g. when running against the local mock service.
+
+        Args:
+            values (dict): Key Vault secret name -> value.
+        """
+        with cls._secrets_lock:
+            cls._secrets.update(values)
+
+    @classmethod
+    def get_language_service_key(cls):
+        """Get language service API key from Key Vault."""
+        return cls.get_secret(cls.LANGUAGE_SERVICE_KEY_SECRET)
+    
+    @classmethod
+    def get_storage_connection_string(cls):
+        """Get storage connection string from STORAGE_CONNECTION_STRING or Key Vault."""
+        return cls.get_secret(cls.STORAGE_CONNECTION_STRING_SECRET)
+    
+    @classmethod
+    def get_gpt_5_chat_key(cls):
+        """Get the standard NER model API key from Key Vault."""
+        return cls.get_secret(cls.GPT_5_CHAT_KEY_SECRET)
+    
+    @classmethod
+    def get_gpt_5_chat_endpoint(cls):
+        """Get the standard NER model endpoint from Key Vault."""
+        return cls.get_secret(cls.GPT_5_CHAT_ENDPOINT_SECRET)
     
     @classmethod
     def to_dict(cls):
@@ -1,154 +1,284 @@
-from dotenv import load_dotenv
-import os
-import csv
+import argparse
+import logging
+import re
 from datetime import datetime
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
-from azure.storage.blob import BlobServiceClient
-from azure.ai.textanalytics import TextAnalyticsClient
+from itertools import islice
+from azure.ai.textanalytics import TextAnalyticsClient, __version__ as TEXT_ANALYTICS_SDK_VERSION
 from azure.core.credentials import AzureKeyCredential
 from config import Config
+from http_client import format_pool_stats
+from metrics import STAGE_BATCH_BUILD, STAGE_PARSE, registry
+from rate_limiter import STANDARD, format_rate_limit_stats
+from invoice_loader import iter_invoice_source
+from report_sink import open_report_sink
+from result_cache import ResultCache
+from standard_ner import CLIENT_RETRY_OPTIONS, AsyncEntityRecognizer, recognize_entities_batched, use_async_engine
 
-# Initialize configuration (automatically resolves Key Vault URI)
-Config.validate(strict=True)
+logger = logging.getLogger(__name__)
 
-credential = DefaultAzureCredential()
-client_kv = Config.get_key_vault_client()
-
-# Retrieve secrets from Key Vault
-gpt_5_chat_key = client_kv.get_secret("gpt-5-chat-key").value
-gpt_5_chat_endpoint = client_kv.get_secret("gpt-5-chat-endpoint").value
-storage_connection_string = Config.get_storage_connection_string()
+# Key Vault secrets this script needs; fetched together on first use
+REQUIRED_SECRETS = [
+    Config.GPT_5_CHAT_KEY_SECRET,
+    Config.GPT_5_CHAT_ENDPOINT_SECRET,
+    Config.STORAGE_CONNECTION_STRING_SECRET,
+]
 
 def authenticate_client():
-    ta_credential = AzureKeyCredential(gpt_5_chat_key)
+    Config.prefetch_secrets(REQUIRED_SECRETS)
+    ta_credential = AzureKeyCredential(Config.get_gpt_5_chat_key())
     text_analytics_client = TextAnalyticsClient(
-        endpoint=gpt_5_chat_endpoint,
-        credential=ta_credential)
+        endpoint=Config.get_gpt_5_chat_endpoint(),
+        credential=ta_credential,
+        transport=Config.get_http_transport(),
+        **CLIENT_RETRY_OPTIONS)
     return text_analytics_client
 
-client = authenticate_client()
-
-# Fetch invoice files from local filesystem
-def fetch_invoices_from_local(test_invoices_dir="../data/test_invoices"):
-    """Fetch all test invoice files from local filesystem."""
-    try:
-        invoices = []
-        
-        # Get the directory path relative to the script location
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        full_path = os.path.join(script_dir, test_invoices_dir)
-        
-        # List all .txt files in the test_invoices directory
-        if not os.path.exists(full_path):
-            print(f"Error: Test invoices directory not found at {full_path}")
-            return []
-        
-        txt_files = sorted([f for f in os.listdir(full_path) if f.endswith('.txt')])
-        
-        for file_name in txt_files:
-            file_path = os.path.join(full_path, file_name)
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                invoices.append(content)
-        
-        print(f"Loaded {len(invoices)} test invoice files from {full_path}")
-        return invoices
-    except Exception as err:
-        print(f"Error loading test invoices from local filesystem: {err}")
-        return []
+REPORT_FIELDNAMES = ["Document Number", "Entity Text", "Type", "Offset", "Length", "Confidence", "Tags"]
 
 # Entities will be dynamically extracted from API response
 CUSTOM_ENTITIES = []  # Will be populated based on actual entity types found
 
+def _entity_to_dict(entity):
+    """Convert an SDK CategorizedEntity into a JSON-serializable dict for caching."""
+    return {
+        "text": entity.text,
+        "category": entity.category,
+        "subcategory": entity.subcategory,
+        "offset": entity.offset,
+        "length": entity.length,
+        "confidence_score": entity.confidence_score,
+    }
+
+def _cache_key(document):
+    """Result cache key for a document sent to the standard NER model."""
+    return ResultCache.make_key(
+        document, "EntityRecognition", Config.get_gpt_5_chat_endpoint(), TEXT_ANALYTICS_SDK_VERSION)
+
+def recognize_entities_cached(recognize, batch):
+    """
+    Run recognize_entities on a batch, skipping documents with cached results.
+    Uncached documents are passed to recognize (the sync or async engine), which
+    returns one result per document or None for documents it could not process.
+    Empty documents are not sent at all.
+    Returns one entity dict list per document, or None for documents that failed;
+    failures are not cached.
+    """
+    cache = Config.get_result_cache()
+    keys = [_cache_key(document) for document in batch]
+    batch_entities = [cache.get(key) if cache is not None and document else None for key, document in zip(keys, batch)]
+    for idx, document in enumerate(batch):
+        if not document:
+            batch_entities[idx] = []
+    pending = [idx for idx, entities in enumerate(batch_entities) if entities is None]
+    
+    if pending:
+        results = recognize([batch[idx] for idx in pending])
+        for idx, result in zip(pending, results):
+            if result is None:
+                continue
+            if result.is_error:
+                print(f"    Document error: {result.error}")
+                continue
+            with registry.time_stage(STAGE_PARSE):
+                batch_entities[idx] = [_entity_to_dict(entity) for entity in result.entities]
+            if cache is not None:
+                cache.put(keys[idx], batch_entities[idx])
+    
+    return batch_entities
+
+def _merge_rule_entities(plan, entities):
+    """Combine locally extracted fields with model entities found in the residual text."""
+    rule_entities = [
+        {
+            "text": entity["text"],
+            "category": entity["category"],
+            "subcategory": None,
+            "offset": entity["offset"],
+            "length": entity["length"],
+            "confidence_score": entity["confidenceScore"],
+        }
+        for entity in plan.entities
+    ]
+    return sorted(rule_entities + plan.remap_model_entities(entities), key=lambda entity: entity["offset"])
+
+def _iter_batches(documents, batch_size):
+    """Yield lists of up to batch_size documents from any iterable."""
+    iterator = iter(documents)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
 def entity_recognition_example(client, documents):
+    """
+    Extract entities from documents (any iterable of invoice texts) in batches
+    and upload the results as a CSV report. Deterministic fields are extracted
+    locally by the rule extractor and only the residual text goes to the model.
+    
+    Returns:
+        dict: report (blob name), uploaded (bool), entity_counts (report rows per
+              document, in input order) and failed_documents (input positions of
+              documents that failed on their own or with their batch).
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    csv_file = f"entity_extraction_results_{timestamp}.csv"
+    reports_container = Config.REPORTS_CONTAINER
+    try:
+        blob_service_client = Config.get_blob_service_client()
+    except Exception as err:
+        print(f"  Failed to connect to Azure Storage: {err}")
+        blob_service_client = None
+    # Rows are streamed to the reports container in staged blocks as batches complete
+    sink = open_report_sink(blob_service_client, reports_container, csv_file, REPORT_FIELDNAMES,
+                            block_size=Config.REPORT_BLOCK_SIZE_BYTES)
+    
     print("Step 1: Starting entity extraction from invoice documents...")
-    batch_size = 5
-    csv_rows = []
+    batch_size = Config.STANDARD_NER_BATCH_SIZE
+    async_recognizer = None
+    use_async, documents = use_async_engine(
+        documents, Config.STANDARD_NER_ENGINE, Config.STANDARD_NER_ASYNC_THRESHOLD)
+    if use_async:
+        # Large corpus: run several recognize_entities requests concurrently
+        async_recognizer = AsyncEntityRecognizer(
+            Config.get_gpt_5_chat_endpoint(), Config.get_gpt_5_chat_key(),
+            batch_size=batch_size, concurrency=Config.STANDARD_NER_CONCURRENCY,
+            max_throttle_retries=Config.RATE_LIMIT_MAX_THROTTLE_RETRIES, limiter=Config.get_rate_limiter(STANDARD),
+            batch_sizer=Config.get_batch_sizer())
+        recognize = async_recognizer.recognize
+        batch_size = async_recognizer.window_size
+        print(f"  Using async engine ({Config.STANDARD_NER_CONCURRENCY} concurrent requests)")
+    else:
+        batch_sizer = Config.get_batch_sizer()
+        recognize = lambda batch: recognize_entities_batched(
+            client, batch, batch_sizer, max_throttle_retries=Config.RATE_LIMIT_MAX_THROTTLE_RETRIES,
+            limiter=Config.get_rate_limiter(STANDARD))
+    extractor = Config.get_rule_extractor()
     detected_entity_types = set()  # Track all entity types found
+    invoice_pattern = re.compile(r"INV-\d+")
+    entity_counts = []
+    failed_documents = []
     
-    for i in range(0, len(documents), batch_size):
+    for batch_index, batch in enumerate(_iter_batches(documents, batch_size)):
+        i = batch_index * batch_size
+        batch_counts = []
         try:
-            print(f"  Processing batch {i//batch_size + 1} (documents {i+1} to {min(i+batch_size, len(documents))})...")
-            batch = documents[i:i+batch_size]
-            results = client.recognize_entities(documents=batch)
-            import re
-            invoice_pattern = re.compile(r"INV-\d+")
-            for idx, result in enumerate(results):
+            print(f"  Processing batch {batch_index + 1} (documents {i+1} to {i+len(batch)})...")
+            if extractor:
+                with registry.time_stage(STAGE_BATCH_BUILD):
+                    plans = [extractor.plan(document) for document in batch]
+                batch_entities = recognize_entities_cached(recognize, [plan.model_text for plan in plans])
+                batch_entities = [_merge_rule_entities(plan, entities) if entities is not None else None
+                                  for plan, entities in zip(plans, batch_entities)]
+            else:
+                batch_entities = recognize_entities_cached(recognize, batch)
+            for idx, entities in enumerate(batch_entities):
                 doc_num = i + idx + 1
+                if entities is None:
+                    # Kept out of the report and the manifest, so the next incremental run retries it
+                    failed_documents.append(i + idx)
+                    batch_counts.append(0)
+                    continue
                 # Track found invoice numbers for this document
                 found_invoice = False
-                for entity in result.entities:
+                for entity in entities:
                     # Check if entity matches invoice number pattern
-                    if invoice_pattern.fullmatch(entity.text):
+                    if invoice_pattern.fullmatch(entity["text"]):
                         found_invoice = True
                         entity_type = "InvoiceNumber"
                     # If misclassified as quantity but matches invoice pattern, fix type
-                    elif entity.category.lower() in ["quantity", "number"] and invoice_pattern.fullmatch(entity.text):
+                    elif entity["category"].lower() in ["quantity", "number"] and invoice_pattern.fullmatch(entity["text"]):
                         entity_type = "InvoiceNumber"
                     else:
-                        entity_type = entity.category
+                        entity_type = entity["category"]
                     
                     # Track detected entity types dynamically
                     detected_entity_types.add(entity_type)
-                    if entity.subcategory:
-                        detected_entity_types.add(entity.subcategory)
+                    if entity["subcategory"]:
+                        detected_entity_types.add(entity["subcategory"])
                     
-                    print(f"    Extracted entity: {entity.text} (Type: {entity_type}, Confidence: {entity.confidence_score * 100:.2f}%)")
+                    confidence_score = entity["confidence_score"]
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Extracted entity: %s (Type: %s, Confidence: %.2f%%)",
+                                     entity['text'], entity_type, confidence_score * 100)
                     tags = [entity_type]
-                    if entity.subcategory:
-                        tags.append(entity.subcategory)
-                    tags_str = ", ".join([f"{tag} ({entity.confidence_score * 100:.0f}%)" for tag in tags])
-                    csv_rows.append({
+                    if entity["subcategory"]:
+                        tags.append(entity["subcategory"])
+                    tags_str = ", ".join([f"{tag} ({confidence_score * 100:.0f}%)" for tag in tags])
+                    sink.write_row({
                         "Document Number": doc_num,
-                        "Entity Text": entity.text,
+                        "Entity Text": entity["text"],
                         "Type": entity_type,
-                        "Offset": entity.offset,
-                        "Length": entity.length,
-                        "Confidence": f"{entity.confidence_score * 100:.2f}%",
+                        "Offset": entity["offset"],
+                        "Length": entity["length"],
+                        "Confidence": f"{confidence_score * 100:.2f}%",
                         "Tags": tags_str,
                     })
                 # If no invoice number was found, try to extract from document text
-                if not found_invoice and invoice_pattern.search(documents[idx]):
-                    inv_num = invoice_pattern.search(documents[idx]).group(0)
+                if not found_invoice and invoice_pattern.search(batch[idx]):
+                    inv_num = invoice_pattern.search(batch[idx]).group(0)
                     print(f"    Post-processed: Found invoice number {inv_num} in document text.")
                     detected_entity_types.add("InvoiceNumber")
-                    csv_rows.append({
+                    sink.write_row({
                         "Document Number": doc_num,
                         "Entity Text": inv_num,
                         "Type": "InvoiceNumber",
-                        "Offset": documents[idx].find(inv_num),
+                        "Offset": batch[idx].find(inv_num),
                         "Length": len(inv_num),
                         "Confidence": "N/A",
                         "Tags": "InvoiceNumber",
                     })
+                batch_counts.append(len(entities) + (0 if found_invoice or not invoice_pattern.search(batch[idx]) else 1))
+            entity_counts.extend(batch_counts)
         except Exception as err:
-            print(f"  Encountered exception in batch {i//batch_size + 1}: {err}")
+            print(f"  Encountered exception in batch {batch_index + 1}: {err}")
+            entity_counts.extend([0] * len(batch))
+            failed_documents.extend(range(i, i + len(batch)))
+    
+    if async_recognizer:
+        async_recognizer.close()
     
     # Update global CUSTOM_ENTITIES with dynamically detected types
     global CUSTOM_ENTITIES
     CUSTOM_ENTITIES = sorted(list(detected_entity_types))
 
-    print("Step 2: Writing extracted entities to CSV and uploading to Azure Storage...")
-    import io
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    csv_file = f"entity_extraction_results_{timestamp}.csv"
-    csv_buffer = io.StringIO()
-    writer = csv.DictWriter(csv_buffer, fieldnames=[
-        "Document Number", "Entity Text", "Type", "Offset", "Length", "Confidence", "Tags"
-    ])
-    writer.writeheader()
-    writer.writerows(csv_rows)
-    csv_data = csv_buffer.getvalue().encode("utf-8")
-    print("Step 3: Uploading CSV report to Azure Storage container 'reports'...")
-    try:
-        blob_service_client = BlobServiceClient.from_connection_string(storage_connection_string)
-        reports_container = "reports"
-        blob_client = blob_service_client.get_blob_client(container=reports_container, blob=csv_file)
-        blob_client.upload_blob(csv_data, overwrite=True)
-        print(f"  CSV report uploaded to Azure Storage container '{reports_container}' as '{csv_file}'")
-    except Exception as err:
-        print(f"  Failed to upload CSV to Azure Storage: {err}")
+    print("Step 2: Committing streamed CSV report to Azure Storage container 'reports'...")
+    committed = sink.close()
+    if blob_service_client is None:
+        print("  CSV report was not uploaded: Azure Storage is unavailable")
+    elif committed:
+        print(f"  CSV report uploaded to Azure Storage container '{reports_container}' as '{csv_file}' "
+              f"({sink.rows_written} rows, {len(sink.block_ids)} block(s))")
+    else:
+        print(f"  Failed to upload CSV to Azure Storage: {sink.upload_error}")
+    print(f"  {format_pool_stats(Config.get_http_session())}")
+    print(format_rate_limit_stats(Config.get_rate_limiters(), indent="  "))
+    if extractor:
+        print(f"  {extractor.format_stats()}")
+    print(registry.format_summary(indent="  "))
+    Config.export_metrics()
+    if Config.get_result_cache() is not None:
+        print(f"  {Config.get_result_cache().format_stats()}")
+    return {
+        "report": csv_file,
+        "uploaded": blob_service_client is not None and committed,
+        "entity_counts": entity_counts,
+        "failed_documents": failed_documents,
+    }
+
+def commit_manifest(manifest, result, file_names):
+    """
+    Record an incremental run in the invoice manifest once its report is uploaded.
+    Failed documents stay pending and are retried by the next run.
+    
+    Returns:
+        int: Number of invoices recorded.
+    """
+    if not result["uploaded"]:
+        print("Invoice manifest not updated: the report did not reach Azure Storage")
+        return 0
+    return manifest.commit(result["report"], dict(zip(file_names, result["entity_counts"])),
+                           failed=[file_names[index] for index in result["failed_documents"]])
 
 if __name__ == "__main__":
     print("=" * 70)
@@ -157,9 +287,31 @@ if __name__ == "__main__":
     print("This uses the standard Azure Language Service NER model")
     print("Entity types will be automatically detected from the API response")
     print("=" * 70)
-    invoices = fetch_invoices_from_local(test_invoices_dir="../data/test_invoices")
-    print(f"\nLoaded {len(invoices)} invoice documents from local filesystem.")
-    entity_recognition_example(client, invoices)
+    parser = argparse.ArgumentParser(description="Extract invoice entities with the standard NER model")
+    parser.add_argument("--invoices", default="../data/test_invoices", help="Invoice directory or blob://<container>/<prefix>")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only process invoices that are new or changed since earlier incremental runs")
+    args = parser.parse_args()
+    
+    Config.configure_observability()
+    Config.validate(strict=True)
+    client = authenticate_client()
+    manifest = Config.get_invoice_manifest(args.invoices, "standard") if args.incremental else None
+    invoices = iter_invoice_source(args.invoices, skip=manifest.is_unchanged if manifest else None)
+    if manifest:
+        invoices = manifest.changed_invoices(invoices)
+    
+    file_names = []
+    def contents():
+        for invoice in invoices:
+            file_names.append(invoice["file_name"])
+            yield invoice["content"]
+    
+    result = entity_recognition_example(client, contents())
+    if manifest:
+        commit_manifest(manifest, result, file_names)
+        print(manifest.format_stats())
+        manifest.close()
     print(f"\n" + "=" * 70)
     print(f"Detected Entity Types (Standard Model): {CUSTOM_ENTITIES}")
     print("=" * 70)
\ No newline at end of file
@@ -0,0 +1,210 @@
+"""
+Compact columnar store for extracted entities.
+Entities are appended document by document into typed arrays (offset, length,
+category code, confidence) with entity texts packed into a single UTF-8 buffer,
+so a run holds tens of bytes per entity instead of a dict of Python objects.
+Confidences stay floats; report formatting such as "87.50%" happens only on
+export. Columns are handed to pandas in bulk for analysis, CSV and Parquet.
+"""
+
+from array import array
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+# Report layout shared with fine_tuned_ner.REPORT_FIELDNAMES
+REPORT_COLUMNS = {
+    "doc": "File Name",
+    "text": "Entity Text",
+    "category": "Category",
+    "subcategory": "Subcategory",
+    "confidence": "Confidence",
+    "offset": "Offset",
+    "length": "Length",
+}
+
+
+def entity_confidence(entity):
+    """Confidence of an entity dict as a float in [0, 1], whichever key the producer used."""
+    for key in ("confidence", "confidenceScore", "confidence_score"):
+        if key in entity:
+            value = entity[key]
+            if isinstance(value, str):
+                value = value.strip()
+                return float(value[:-1]) / 100 if value.endswith("%") else float(value)
+            return float(value)
+    return 1.0
+
+
+def format_confidence(confidences):
+    """Render an array of 0-1 confidences as the "87.50%" strings used in reports."""
+    return np.char.mod("%.2f%%", np.asarray(confidences, dtype=np.float64) * 100).astype(object)
+
+
+class _Labels:
+    """Interning table mapping strings to small integer codes."""
+
+    def __init__(self):
+        self.names = []
+        self._codes = {}
+
+    def code(self, name):
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+
+class EntityStore(Mapping):
+    """
+    Append-only, array-backed entity results keyed by document name.
+
+    Behaves as a read-only mapping of document name -> list of entity dicts, so
+    code written against {file_name: entities} keeps working; the dicts are only
+    built when a document is looked up. Each document is added once, with all of
+    its entities, via add_document.
+    """
+
+    def __init__(self):
+        self._docs = _Labels()
+        self._categories = _Labels()
+        self._subcategories = _Labels()
+        # Rows of document i are doc_bounds[i]:doc_bounds[i + 1]
+        self._doc_bounds = array("q", [0])
+        self._offsets = array("q")
+        self._lengths = array("l")
+        self._category_codes = array("l")
+        self._subcategory_codes = array("l")
+        self._confidences = array("d")
+        # Entity texts as one UTF-8 buffer; text i is text_bounds[i]:text_bounds[i + 1]
+        self._text = bytearray()
+        self._text_bounds = array("q", [0])
+
+    def add_document(self, name, entities):
+        """
+        Append one document's entities.
+
+        Args:
+            name (str): Document (invoice file) name.
+            entities (iterable): Entity dicts with "text", "category", "offset",
+                                 "length" and a confidence under "confidence",
+                                 "confidenceScore" or "confidence_score".
+                                 "subcategory" is optional.
+        """
+        if name in self._docs._codes:
+            raise ValueError(f"Document already recorded: {name}")
+        self._docs.code(name)
+        for entity in entities:
+            text = entity.get("text", "")
+            self._text += text.encode("utf-8")
+            self._text_bounds.append(len(self._text))
+            self._offsets.append(entity.get("offset", -1))
+            self._lengths.append(entity.get("length", len(text)))
+            self._category_codes.append(self._categories.code(entity.get("category", "Unknown")))
+            self._subcategory_codes.append(self._subcategories.code(entity.get("subcategory") or ""))
+            self._confidences.append(entity_confidence(entity))
+        self._doc_bounds.append(len(self._offsets))
+
+    def __getitem__(self, name):
+        doc = self._docs._codes[name]
+        return [self._entity(row) for row in range(self._doc_bounds[doc], self._doc_bounds[doc + 1])]
+
+    def __iter__(self):
+        return iter(self._docs.names)
+
+    def __len__(self):
+        return len(self._docs.names)
+
+    def __contains__(self, name):
+        return name in self._docs._codes
+
+    def _entity(self, row):
+        return {
+            "text": self._text[self._text_bounds[row]:self._text_bounds[row + 1]].decode("utf-8"),
+            "category": self._categories.names[self._category_codes[row]],
+            "subcategory": self._subcategories.names[self._subcategory_codes[row]],
+            "offset": self._offsets[row],
+            "length": self._lengths[row],
+            "confidence": self._confidences[row],
+        }
+
+    @property
+    def entity_count(self):
+        """Total number of entities across all documents."""
+        return len(self._offsets)
+
+    @property
+    def categories(self):
+        """Sorted names of the entity categories seen so far."""
+        return sorted(self._categories.names)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the entity columns."""
+        columns = (self._doc_bounds, self._offsets, self._lengths, self._category_codes,
+                   self._subcategory_codes, self._confidences, self._text_bounds)
+        return len(self._text) + sum(column.itemsize * len(column) for column in columns)
+
+    def document_counts(self):
+        """Entities per document as an int64 Series indexed by document name."""
+        return pd.Series(np.diff(np.asarray(self._doc_bounds, dtype=np.int64)),
+                         index=pd.Index(self._docs.names, dtype=object), dtype="int64")
+
+    def _texts(self):
+        bounds = self._text_bounds.tolist()
+        if self._text.isascii():
+            # Byte and character positions coincide, so slice one decoded string
+            text = self._text.decode("ascii")
+            return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+        text = bytes(self._text)
+        return [text[start:end].decode("utf-8") for start, end in zip(bounds, bounds[1:])]
+
+    def to_frame(self, with_text=True):
+        """
+        Export every entity as a pandas DataFrame with one row per entity.
+
+        Numeric columns are bulk-copied from the arrays and document, category and
+        subcategory become categoricals built from the stored codes.
+
+        Returns:
+            pandas.DataFrame: Columns doc, [text,] category, subcategory, offset,
+                              length, confidence (float, 0-1).
+        """
+        counts = np.diff(np.asarray(self._doc_bounds, dtype=np.int64))
+        columns = {
+            "doc": pd.Categorical.from_codes(np.repeat(np.arange(len(counts)), counts),
+                                             categories=pd.Index(self._docs.names, dtype=object)),
+        }
+        if with_text:
+            columns["text"] = self._texts()
+        columns.update({
+            "category": pd.Categorical.from_codes(np.asarray(self._category_codes, dtype=np.int64),
+                                                  categories=pd.Index(self._categories.names, dtype=object)),
+            "subcategory": pd.Categorical.from_codes(np.asarray(self._subcategory_codes, dtype=np.int64),
+                                                     categories=pd.Index(self._subcategories.names, dtype=object)),
+            "offset": np.asarray(self._offsets, dtype=np.int64),
+            "length": np.asarray(self._lengths, dtype=np.int64),
+            "confidence": np.asarray(self._confidences, dtype=np.float64),
+        })
+        return pd.DataFrame(columns)
+
+    def to_csv(self, path):
+        """
+        Write all entities as a CSV report in the fine-tuned report layout
+        (confidence rendered as "87.50%").
+
+        Args:
+            path (str or file): Destination passed to DataFrame.to_csv.
+        """
+        frame = self.to_frame()
+        frame["confidence"] = format_confidence(frame["confidence"].to_numpy())
+        frame.rename(columns=REPORT_COLUMNS)[list(REPORT_COLUMNS.values())].to_csv(path, index=False)
+
+    def to_parquet(self, path):
+        """
+        Write all entities to a Parquet file with typed columns (float confidence,
+        dictionary-encoded document and category). Requires pyarrow.
+        """
+        self.to_frame().to_parquet(path, index=False)
@@ -0,0 +1,326 @@
+"""
+Entity-level accuracy scoring against ground-truth labels.
+Predicted and gold entities are flattened into pandas frames and matched with
+vectorized joins: exact matching on (document, type, start, end) and overlap
+matching against every intersecting gold span found by a sorted window search,
+both one-to-one with the most confident prediction winning. Per-type precision/recall/F1 and confidence
+threshold curves are computed from the matched frame with group-bys and
+cumulative sums, so millions of entities score in seconds.
+"""
+
+import numpy as np
+import pandas as pd
+
+from entity_store import EntityStore
+
+EXACT = "exact"
+OVERLAP = "overlap"
+MATCH_MODES = (EXACT, OVERLAP)
+
+# Prebuilt (standard) model categories expressed in the fine-tuned label set
+STANDARD_CATEGORY_MAP = {
+    "Organization": "CustomerName",
+    "DateTime": "Date",
+    "Product": "ItemName",
+}
+
+DEFAULT_THRESHOLDS = np.round(np.linspace(0.0, 0.95, 20), 2)
+
+_COLUMNS = ["doc", "category", "start", "end", "confidence"]
+
+
+def entities_to_frame(entities_by_doc, category_map=None, documents=None):
+    """
+    Flatten per-document entities into one row per entity with a known offset.
+
+    Args:
+        entities_by_doc (EntityStore or dict): Document name -> entities with "category",
+                                "offset", "length" and optionally a confidence.
+        category_map (dict): Renames categories, e.g. STANDARD_CATEGORY_MAP.
+        documents (iterable): Only keep these documents.
+
+    Returns:
+        pandas.DataFrame: Columns doc and category (categorical), start, end, confidence.
+    """
+    if not isinstance(entities_by_doc, EntityStore):
+        store = EntityStore()
+        for doc, entities in entities_by_doc.items():
+            store.add_document(doc, entities)
+        entities_by_doc = store
+    entities = entities_by_doc.to_frame(with_text=False)
+
+    categories = entities["category"].array
+    if category_map:
+        # Renaming may merge categories, so recode rather than rename
+        renamed, merged = pd.factorize(
+            np.array([category_map.get(category, category) for category in categories.categories], dtype=object))
+        categories = pd.Categorical.from_codes(renamed[categories.codes], categories=merged)
+
+    frame = pd.DataFrame({
+        "doc": entities["doc"],
+        "category": categories,
+        "start": entities["offset"],
+        "end": entities["offset"] + entities["length"],
+        "confidence": entities["confidence"],
+    })
+    # Entities without an offset cannot be placed in the text
+    keep = frame["start"].to_numpy() >= 0
+    if documents is not None:
+        keep &= frame["doc"].isin(set(documents)).to_numpy()
+    return frame[keep].reset_index(drop=True)
+
+
+def _shared_codes(gold_column, pred_column):
+    """Integer codes for two categorical columns over the union of their categories."""
+    categories = gold_column.cat.categories.union(pred_column.cat.categories)
+
+    def encode(column):
+        mapping = categories.get_indexer(column.cat.categories)
+        return mapping[column.cat.codes.to_numpy()] if len(column) else np.zeros(0, dtype=np.int64)
+
+    return encode(gold_column), encode(pred_column), categories
+
+
+def _with_codes(gold, pred):
+    """Give gold and predicted frames shared integer codes for doc and category."""
+    gold_docs, pred_docs, _ = _shared_codes(gold["doc"], pred["doc"])
+    gold_types, pred_types, category_index = _shared_codes(gold["category"], pred["category"])
+
+    def encode(frame, docs, types):
+        return pd.DataFrame({
+            "doc": docs,
+            "category": types,
+            "start": frame["start"].to_numpy(),
+            "end": frame["end"].to_numpy(),
+            "confidence": frame["confidence"].to_numpy(),
+        })
+
+    return encode(gold, gold_docs, gold_types), encode(pred, pred_docs, pred_types), category_index
+
+
+def match_entities(gold, pred, mode=EXACT):
+    """
+    Match predictions to gold spans one-to-one.
+
+    Exact mode requires identical document, type, start and end. Overlap mode
+    considers every gold span of the same document and type that intersects a
+    prediction (nested spans included); predictions pick in descending confidence
+    order, each taking its unclaimed candidate with the largest overlap. When
+    several predictions claim one gold span, the most confident one keeps it.
+
+    Args:
+        gold (DataFrame): entities_to_frame output for the labels.
+        pred (DataFrame): entities_to_frame output for a model.
+        mode (str): EXACT or OVERLAP.
+
+    Returns:
+        tuple: (pred frame with integer codes, a "matched" column and a "category_name"
+               column, gold counts per category name as a Series)
+    """
+    if mode not in MATCH_MODES:
+        raise ValueError(f"Unknown match mode: {mode}")
+    gold_codes, pred_codes, category_index = _with_codes(gold, pred)
+    n_categories = max(1, len(category_index))
+    gold_group = gold_codes["doc"].to_numpy(np.int64) * n_categories + gold_codes["category"].to_numpy(np.int64)
+    pred_group = pred_codes["doc"].to_numpy(np.int64) * n_categories + pred_codes["category"].to_numpy(np.int64)
+    gold_start, gold_end = gold_codes["start"].to_numpy(), gold_codes["end"].to_numpy()
+    pred_start, pred_end = pred_codes["start"].to_numpy(), pred_codes["end"].to_numpy()
+
+    # Sort gold spans by (doc and type, start, end) and drop duplicate labels
+    order = np.lexsort((gold_end, gold_start, gold_group))
+    gold_group, gold_start, gold_end = gold_group[order], gold_start[order], gold_end[order]
+    keep = np.ones(len(order), dtype=bool)
+    keep[1:] = ((gold_group[1:] != gold_group[:-1]) | (gold_start[1:] != gold_start[:-1])
+                | (gold_end[1:] != gold_end[:-1]))
+    gold_group, gold_start, gold_end = gold_group[keep], gold_start[keep], gold_end[keep]
+    gold_categories = gold_codes["category"].to_numpy(np.int64)[order][keep]
+
+    # Dense rank of each (doc, type) group so positions pack into one sortable int64 key
+    groups, gold_rank = np.unique(gold_group, return_inverse=True)
+    pred_rank = np.searchsorted(groups, pred_group)
+    in_gold = pred_rank < len(groups)
+    in_gold[in_gold] = groups[pred_rank[in_gold]] == pred_group[in_gold]
+    base = int(max(gold_end.max(initial=0), pred_end.max(initial=0))) + 1
+    gold_key = gold_rank * base + gold_start
+
+    confidence = pred_codes["confidence"].to_numpy()
+    if mode == OVERLAP:
+        matched = _match_overlaps(pred_rank, pred_start, pred_end, in_gold, confidence,
+                                  gold_key, gold_rank, gold_start, gold_end, base)
+    elif len(groups) * base * base < 2 ** 62:
+        exact_key = gold_key * base + gold_end
+        candidate = np.searchsorted(exact_key, (pred_rank * base + pred_start) * base + pred_end)
+        hit = in_gold & (candidate < len(exact_key))
+        hit[hit] = exact_key[candidate[hit]] == ((pred_rank[hit] * base + pred_start[hit]) * base + pred_end[hit])
+    else:
+        # Keys too wide to pack (huge documents): fall back to a hash join
+        pairs = pd.DataFrame({"group": pred_group, "start": pred_start, "end": pred_end}).merge(
+            pd.DataFrame({"group": gold_group, "start": gold_start, "end": gold_end,
+                          "gold_id": np.arange(len(gold_group))}),
+            on=["group", "start", "end"], how="left")
+        candidate = pairs["gold_id"].fillna(-1).to_numpy(np.int64)
+        hit = candidate >= 0
+
+    if mode != OVERLAP:
+        # One prediction per gold span: the most confident claimant keeps it
+        claimants = np.flatnonzero(hit)
+        by_confidence = claimants[np.argsort(-confidence[claimants], kind="stable")]
+        _, first = np.unique(candidate[by_confidence], return_index=True)
+        matched = np.zeros(len(pred_codes), dtype=bool)
+        matched[by_confidence[first]] = True
+
+    pred_codes["matched"] = matched
+    pred_codes["category_name"] = pd.Categorical.from_codes(pred_codes["category"].to_numpy(), category_index)
+    gold_counts = pd.Series(np.bincount(gold_categories, minlength=len(category_index)), index=category_index)
+    return pred_codes, gold_counts[gold_counts > 0]
+
+
+def _match_overlaps(pred_rank, pred_start, pred_end, in_gold, confidence,
+                    gold_key, gold_rank, gold_start, gold_end, base):
+    """
+    One-to-one overlap matching for match_entities.
+
+    All intersecting (prediction, gold) pairs are enumerated with two sorted
+    searches per prediction: a gold span can only intersect if it starts before the
+    prediction ends and less than the longest gold span before it starts. Pairs
+    that form an isolated one-to-one component match directly; the contested rest
+    are assigned greedily by descending confidence, then largest overlap.
+
+    Returns:
+        numpy.ndarray: Boolean "matched" flag per prediction.
+    """
+    matched = np.zeros(len(pred_rank), dtype=bool)
+    preds = np.flatnonzero(in_gold)
+    if not len(preds) or not len(gold_key):
+        return matched
+    longest = int((gold_end - gold_start).max())
+    group_base = pred_rank[preds] * base
+    lo = np.searchsorted(gold_key, group_base + np.maximum(pred_start[preds] - longest + 1, 0), side="left")
+    hi = np.searchsorted(gold_key, group_base + np.maximum(pred_end[preds] - 1, 0), side="right")
+    counts = np.maximum(hi - lo, 0)
+    pair_pred = np.repeat(preds, counts)
+    pair_gold = np.repeat(lo, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    valid = ((gold_rank[pair_gold] == pred_rank[pair_pred]) & (gold_start[pair_gold] < pred_end[pair_pred])
+             & (gold_end[pair_gold] > pred_start[pair_pred]))
+    pair_pred, pair_gold = pair_pred[valid], pair_gold[valid]
+
+    # Uncontested pairs: the prediction has one candidate and the gold span one claimant
+    single = ((np.bincount(pair_pred, minlength=len(pred_rank))[pair_pred] == 1)
+              & (np.bincount(pair_gold, minlength=len(gold_key))[pair_gold] == 1))
+    matched[pair_pred[single]] = True
+    pair_pred, pair_gold = pair_pred[~single], pair_gold[~single]
+
+    overlap = (np.minimum(gold_end[pair_gold], pred_end[pair_pred])
+               - np.maximum(gold_start[pair_gold], pred_start[pair_pred]))
+    order = np.lexsort((gold_start[pair_gold], -overlap, pair_pred, -confidence[pair_pred]))
+    taken_preds, taken_gold = set(), set()
+    for pred, gold in zip(pair_pred[order].tolist(), pair_gold[order].tolist()):
+        if pred not in taken_preds and gold not in taken_gold:
+            taken_preds.add(pred)
+            taken_gold.add(gold)
+    matched[list(taken_preds)] = True
+    return matched
+
+
+def _prf(tp, fp, fn):
+    """Vectorized precision, recall and F1 (0 where undefined)."""
+    tp, fp, fn = (np.asarray(values, dtype=np.float64) for values in (tp, fp, fn))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return precision, recall, f1
+
+
+def _score_matches(matched, gold_counts):
+    by_type = matched.groupby("category_name", observed=True)["matched"].agg(tp="sum", predicted="count")
+    by_type.index = by_type.index.astype(object)
+    table = pd.DataFrame(index=by_type.index.union(gold_counts.index.astype(object)))
+    table["tp"] = by_type["tp"].reindex(table.index, fill_value=0).astype(np.int64)
+    table["fp"] = (by_type["predicted"].reindex(table.index, fill_value=0) - table["tp"]).astype(np.int64)
+    table["fn"] = (gold_counts.reindex(table.index, fill_value=0) - table["tp"]).astype(np.int64)
+    table.loc["micro"] = table[["tp", "fp", "fn"]].sum()
+    table["precision"], table["recall"], table["f1"] = _prf(table["tp"], table["fp"], table["fn"])
+    table.index.name = "category"
+    return table
+
+
+def _curve_from_matches(matched, gold_counts, thresholds):
+    order = np.argsort(matched["confidence"].to_numpy(), kind="stable")
+    confidences = matched["confidence"].to_numpy()[order]
+    hits = matched["matched"].to_numpy()[order]
+    # Predictions kept at threshold t are those from the first confidence >= t onwards
+    kept_from = np.searchsorted(confidences, np.asarray(thresholds), side="left")
+    tp_suffix = np.concatenate((np.cumsum(hits[::-1])[::-1], [0]))
+    tp = tp_suffix[kept_from]
+    fp = (len(confidences) - kept_from) - tp
+    fn = int(gold_counts.sum()) - tp
+    precision, recall, f1 = _prf(tp, fp, fn)
+    return pd.DataFrame({"threshold": thresholds, "tp": tp, "fp": fp, "fn": fn,
+                         "precision": precision, "recall": recall, "f1": f1})
+
+
+def score(gold, pred, mode=EXACT):
+    """
+    Per-type and micro-averaged precision, recall and F1.
+
+    Returns:
+        pandas.DataFrame: Indexed by category plus a final "micro" row, with columns
+                          tp, fp, fn, precision, recall, f1.
+    """
+    return _score_matches(*match_entities(gold, pred, mode))
+
+
+def threshold_curve(gold, pred, mode=EXACT, thresholds=DEFAULT_THRESHOLDS):
+    """
+    Micro precision/recall/F1 when predictions below each confidence threshold are dropped.
+
+    Returns:
+        pandas.DataFrame: One row per threshold with tp, fp, fn, precision, recall, f1.
+    """
+    matched, gold_counts = match_entities(gold, pred, mode)
+    return _curve_from_matches(matched, gold_counts, thresholds)
+
+
+def evaluate(labels_by_doc, predictions_by_doc, category_map=None, thresholds=DEFAULT_THRESHOLDS):
+    """
+    Score one model's predictions against ground truth.
+
+    Only documents the model returned results for are scored, so a partial run is
+    not penalised for invoices it never saw.
+
+    Args:
+        labels_by_doc (dict): Document name -> gold entities.
+        predictions_by_doc (dict): Document name -> predicted entities.
+        category_map (dict): Renames predicted categories into the label set.
+
+    Returns:
+        dict: {"exact": score table, "overlap": score table, "curve": exact-match threshold curve}
+    """
+    documents = set(predictions_by_doc)
+    gold = entities_to_frame(labels_by_doc, documents=documents)
+    pred = entities_to_frame(predictions_by_doc, category_map=category_map)
+    exact = match_entities(gold, pred, EXACT)
+    return {
+        EXACT: _score_matches(*exact),
+        OVERLAP: score(gold, pred, OVERLAP),
+        "curve": _curve_from_matches(*exact, thresholds),
+    }
+
+
+def format_scores(table, indent="  "):
+    """Format a score() table as fixed-width text."""
+    lines = [f"{indent}{'Type':<16} {'P':>7} {'R':>7} {'F1':>7} {'TP':>9} {'FP':>9} {'FN':>9}"]
+    for category, row in table.iterrows():
+        lines.append(f"{indent}{str(category):<16} {row['precision']:>7.3f} {row['recall']:>7.3f} "
+                     f"{row['f1']:>7.3f} {int(row['tp']):>9} {int(row['fp']):>9} {int(row['fn']):>9}")
+    return "\n".join(lines)
+
+
+def format_curve(curve, indent="  "):
+    """Format a threshold_curve() table as fixed-width text."""
+    lines = [f"{indent}{'Threshold':>9} {'P':>7} {'R':>7} {'F1':>7}"]
+    for row in curve.itertuples(index=False):
+        lines.append(f"{indent}{row.threshold:>9.2f} {row.precision:>7.3f} {row.recall:>7.3f} {row.f1:>7.3f}")
+    return "\n".join(lines)
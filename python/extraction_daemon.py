@@ -0,0 +1,626 @@
+"""
+Long-running extraction service for the fine-tuned NER model.
+Watches an invoice drop folder (inotify through the optional watchdog package,
+directory polling without it) and accepts invoices POSTed to a local HTTP queue.
+Arrivals are micro-batched until DAEMON_BATCH_MAX_DOCUMENTS invoices are waiting
+or DAEMON_BATCH_WINDOW_SECONDS have passed since the first one, then run through
+the batched fine-tuned pipeline. Secrets, the pooled HTTP session, the blob
+client, the rule extractor and the result cache stay loaded between batches, and
+each batch's results are written as a CSV report as soon as it completes.
+Invoices whose batch fails are retried with exponential backoff; after
+DAEMON_MAX_ATTEMPTS failures they are moved to a dead-letter folder. Processed
+drop-folder files are moved to a processed folder, so the watch folder only
+holds new arrivals and polling scans stay proportional to them.
+/healthz and /metrics expose liveness, queue depth and throughput.
+
+    python extraction_daemon.py --watch ../data/incoming --output /tmp/ner_daemon
+    curl -X POST --data-binary @invoice.txt "http://127.0.0.1:8080/invoices?name=invoice.txt"
+    curl http://127.0.0.1:8080/metrics
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import os
+import queue
+import shutil
+import signal
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from config import Config
+from fine_tuned_ner import REPORT_FIELDNAMES, REQUIRED_SECRETS, extract_entities_batched, report_rows
+from invoice_loader import iter_invoices, resolve_invoices_dir
+from invoice_sharding import shard_invoices
+from metrics import STAGE_END_TO_END, registry
+from report_sink import open_report_sink
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog is optional; the watch folder is polled without it
+    FileSystemEventHandler = object
+    Observer = None
+
+# Completions counted by the docs/sec throughput gauge
+THROUGHPUT_WINDOW_SECONDS = 60.0
+
+
+def next_batch(pending, max_documents, window_seconds, stop, held=None):
+    """
+    Collect one micro-batch from a queue.
+
+    Blocks until the first invoice arrives, then keeps taking invoices until
+    max_documents are collected or window_seconds have passed since the first.
+    Results are keyed by file name, so an invoice whose name is already in the
+    batch is held back in held and goes into a later batch.
+
+    Args:
+        held (deque): Invoices held back by earlier calls; they are taken first.
+
+    Returns:
+        list: Queued invoices with unique file names; empty once stop is set and
+              the queue and held are drained.
+    """
+    held = deque() if held is None else held
+    batch = []
+    names = set()
+
+    def add(invoice):
+        if invoice["file_name"] in names:
+            held.append(invoice)
+        else:
+            names.add(invoice["file_name"])
+            batch.append(invoice)
+
+    for _ in range(len(held)):
+        if len(batch) >= max_documents:
+            break
+        add(held.popleft())
+    while not batch:
+        try:
+            add(pending.get(timeout=0.2))
+        except queue.Empty:
+            if stop.is_set():
+                return []
+    deadline = time.monotonic() + window_seconds
+    while len(batch) < max_documents:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            add(pending.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+
+class _WatchHandler(FileSystemEventHandler):
+    """Queues files once they are closed after writing or moved into the watch folder."""
+
+    def __init__(self, daemon):
+        self.daemon = daemon
+
+    def on_closed(self, event):
+        if not event.is_directory:
+            self.daemon.submit_file(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.daemon.submit_file(event.dest_path)
+
+
+class ExtractionDaemon:
+    """Micro-batching fine-tuned NER service fed by a watch folder and a local queue."""
+
+    def __init__(self, output_dir, watch_dir=None, extension=".txt", manifest=None,
+                 max_documents=None, window_seconds=None, poll_interval=None, processed_dir=None,
+                 dead_letter_dir=None, max_attempts=None, retry_backoff=None):
+        """
+        Args:
+            output_dir (str): Directory receiving one CSV report per batch; reports are
+                              also uploaded to the reports container when Storage is reachable.
+            watch_dir (str): Drop folder to watch, relative to python/ or absolute.
+            extension (str): Only files ending with this suffix are picked up.
+            manifest (InvoiceManifest): Manifest of the watch folder, so files already
+                                        processed unchanged are skipped after a restart.
+            max_documents (int): Largest micro-batch (default DAEMON_BATCH_MAX_DOCUMENTS).
+            window_seconds (float): Longest wait after a batch's first invoice
+                                    (default DAEMON_BATCH_WINDOW_SECONDS).
+            poll_interval (float): Watch folder scan interval without watchdog
+                                   (default DAEMON_POLL_INTERVAL_SECONDS).
+            processed_dir (str): Where drop-folder files are moved once their results are
+                                 reported (default output_dir/processed).
+            dead_letter_dir (str): Where invoices go once they used all their attempts,
+                                   each with a .error.json note (default output_dir/dead_letter).
+            max_attempts (int): Attempts per invoice (default DAEMON_MAX_ATTEMPTS).
+            retry_backoff (float): Delay before the first retry, doubled for each further
+                                   one (default DAEMON_RETRY_BACKOFF_SECONDS).
+        """
+        self.output_dir = output_dir
+        self.watch_dir = resolve_invoices_dir(watch_dir) if watch_dir else None
+        self.extension = extension
+        self.manifest = manifest
+        self.max_documents = max_documents or Config.DAEMON_BATCH_MAX_DOCUMENTS
+        self.window_seconds = Config.DAEMON_BATCH_WINDOW_SECONDS if window_seconds is None else window_seconds
+        self.poll_interval = poll_interval or Config.DAEMON_POLL_INTERVAL_SECONDS
+        self.processed_dir = processed_dir or os.path.join(output_dir, "processed")
+        self.dead_letter_dir = dead_letter_dir or os.path.join(output_dir, "dead_letter")
+        self.max_attempts = max_attempts or Config.DAEMON_MAX_ATTEMPTS
+        self.retry_backoff = Config.DAEMON_RETRY_BACKOFF_SECONDS if retry_backoff is None else retry_backoff
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.started_at = time.monotonic()
+        self.last_batch_at = None
+        self.last_error = None
+
+        self._pending = queue.Queue(maxsize=Config.DAEMON_QUEUE_MAX_DOCUMENTS)
+        # Invoices sharing a file name with one in the current batch, waiting for the next
+        self._held = deque()
+        self._stop = threading.Event()
+        # Set once nothing but the worker can add to the queue; the worker then exits when it is empty
+        self._drain = threading.Event()
+        # Heap of (due monotonic time, sequence, invoice) waiting to be retried
+        self._retries = []
+        self._retry_sequence = itertools.count()
+        self._retry_condition = threading.Condition()
+        self._retries_closed = False
+        # Watched file name -> (size, mtime) from when it was queued until it leaves the watch folder
+        self._queued = {}
+        # Watched file name -> (size, mtime) at the last poll / during the current poll
+        self._polled = {}
+        self._seen = {}
+        self._files_lock = threading.Lock()
+        # Monotonic completion times within THROUGHPUT_WINDOW_SECONDS
+        self._completions = deque()
+        self._blob_service_client = None
+        self._worker = self._watcher = self._retrier = self._observer = self._server = None
+
+        self._invoices = registry.counter("daemon_invoices", "Invoices processed by the daemon.")
+        self._failed = registry.counter("daemon_failed_invoices", "Failed invoice extraction attempts.")
+        self._retried = registry.counter("daemon_retried_invoices", "Failed invoices queued again for a retry.")
+        self._dead_lettered = registry.counter("daemon_dead_letter_invoices",
+                                               "Invoices moved to the dead-letter folder after their last attempt.")
+        self._batches = registry.counter("daemon_batches", "Micro-batches processed by the daemon.")
+
+    def warm_up(self):
+        """Fetch secrets and open the clients every batch reuses, before the first invoice arrives."""
+        Config.prefetch_secrets(REQUIRED_SECRETS)
+        Config.get_http_session()
+        Config.get_rule_extractor()
+        Config.get_result_cache()
+        try:
+            self._blob_service_client = Config.get_blob_service_client()
+        except Exception as err:
+            print(f"Error connecting to Azure Storage, writing reports locally only: {err}")
+
+    def submit(self, file_name, content):
+        """
+        Queue one invoice for extraction (the local queue behind POST /invoices).
+
+        Returns:
+            bool: False if the daemon is stopping or the queue is full.
+        """
+        if self._stop.is_set():
+            return False
+        try:
+            self._pending.put_nowait({"file_name": file_name, "content": content, "received_at": time.monotonic()})
+        except queue.Full:
+            return False
+        return True
+
+    def _claim(self, file_name, size, mtime):
+        """Mark a watched file as queued; False if it already is or the manifest has it unchanged."""
+        with self._files_lock:
+            if self._queued.get(file_name) == (size, mtime):
+                return False
+            self._queued[file_name] = (size, mtime)
+        if self.manifest and self.manifest.is_unchanged(file_name, size, mtime):
+            # Reported before the daemon stopped, but not yet moved out of the folder
+            self._archive(file_name)
+            return False
+        return True
+
+    def _release(self, file_name):
+        """Let a watched file be queued again, e.g. after it could not be read."""
+        with self._files_lock:
+            self._queued.pop(file_name, None)
+
+    def _archive(self, file_name):
+        """Move a reported file from the watch folder to the processed folder and forget it."""
+        target = os.path.join(self.processed_dir, file_name)
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(os.path.join(self.watch_dir, file_name), target)
+        except OSError as err:
+            # Stays claimed, so it is not queued again while it sits in the folder
+            print(f"  [ERROR] Could not move {file_name} to {self.processed_dir}: {err}")
+            return
+        self._release(file_name)
+
+    def _enqueue(self, invoice):
+        invoice["received_at"] = time.monotonic()
+        # Blocks while the queue is full, so a large drop is read no faster than it is processed
+        self._pending.put(invoice)
+
+    def submit_file(self, path):
+        """Queue a file from the watch folder unless it is already queued or processed unchanged."""
+        file_name = os.path.relpath(path, self.watch_dir)
+        if not file_name.endswith(self.extension) or file_name.startswith(".."):
+            return
+        try:
+            stat = os.stat(path)
+            if not self._claim(file_name, stat.st_size, stat.st_mtime):
+                return
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except (OSError, UnicodeDecodeError) as err:
+            print(f"Error loading invoice {path}: {err}")
+            self._release(file_name)
+            return
+        self._enqueue({"file_name": file_name, "path": path, "size": stat.st_size,
+                       "mtime": stat.st_mtime, "content": content})
+
+    def _not_ready(self, file_name, size, mtime, etag=None):
+        """Poller skip check: claim a file once its size and mtime held still for one interval."""
+        self._seen[file_name] = (size, mtime)
+        return self._polled.get(file_name) != (size, mtime) or not self._claim(file_name, size, mtime)
+
+    def _poll(self):
+        self._seen = {}
+        self._scan(self._not_ready)
+        # Files moved out or deleted since the last poll are forgotten
+        self._polled = self._seen
+
+    def _scan(self, skip):
+        for invoice in iter_invoices(self.watch_dir, extension=self.extension, skip=skip, verbose=False):
+            self._enqueue(invoice)
+
+    def _watch(self):
+        # Files already in the folder at startup are taken as complete
+        self._scan(lambda file_name, size, mtime, etag: not self._claim(file_name, size, mtime))
+        if self._observer is not None:
+            return
+        while not self._stop.wait(self.poll_interval):
+            self._poll()
+
+    def _fail(self, invoice, error):
+        """Schedule a failed invoice for a retry, or dead-letter it once its attempts are used up."""
+        self._failed.inc()
+        invoice["attempts"] = invoice.get("attempts", 0) + 1
+        with self._retry_condition:
+            if not self._retries_closed and invoice["attempts"] < self.max_attempts:
+                due = time.monotonic() + self.retry_backoff * 2 ** (invoice["attempts"] - 1)
+                heapq.heappush(self._retries, (due, next(self._retry_sequence), invoice))
+                self._retry_condition.notify()
+                self._retried.inc()
+                return
+        self._dead_letter(invoice, error)
+
+    def _dead_letter(self, invoice, error):
+        """Move a watched file, or write a POSTed invoice, to the dead-letter folder with its error."""
+        file_name = invoice["file_name"]
+        target = os.path.join(self.dead_letter_dir, file_name)
+        if os.path.exists(target):
+            # Another invoice of the same name was dead-lettered before
+            stem, extension = os.path.splitext(target)
+            target = f"{stem}.{time.time_ns()}{extension}"
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if "path" in invoice:
+                shutil.move(invoice["path"], target)
+            else:
+                with open(target, 'w', encoding='utf-8') as f:
+                    f.write(invoice["content"])
+            with open(f"{target}.error.json", 'w', encoding='utf-8') as f:
+                json.dump({"file_name": file_name, "attempts": invoice["attempts"], "error": error,
+                           "failed_at": time.time()}, f, indent=2)
+        except OSError as err:
+            print(f"  [ERROR] Could not dead-letter {file_name}: {err}")
+        else:
+            print(f"  [ERROR] {file_name} failed {invoice['attempts']} time(s), moved to {target}: {error}")
+        self._dead_lettered.inc()
+        if "path" in invoice:
+            self._release(file_name)
+
+    def _retry(self):
+        """Queue failed invoices again once their backoff has passed; all at once when stopping."""
+        while True:
+            with self._retry_condition:
+                while not self._stop.is_set() and not (self._retries and self._retries[0][0] <= time.monotonic()):
+                    self._retry_condition.wait(self._retries[0][0] - time.monotonic() if self._retries else None)
+                stopping = self._stop.is_set()
+                if stopping:
+                    # Failures after this point are dead-lettered instead of retried
+                    self._retries_closed = True
+                due = []
+                while self._retries and (stopping or self._retries[0][0] <= time.monotonic()):
+                    due.append(heapq.heappop(self._retries)[2])
+            for invoice in due:
+                self._pending.put(invoice)
+            if stopping:
+                return
+
+    def _work(self):
+        while True:
+            batch = next_batch(self._pending, self.max_documents, self.window_seconds, self._drain, self._held)
+            if not batch:
+                return
+            try:
+                self._process_batch(batch)
+            except Exception as err:
+                self.last_error = f"{type(err).__name__}: {err}"
+                print(f"  [ERROR] Batch of {len(batch)} invoice(s) failed: {err}")
+                if self.manifest:
+                    self.manifest.discard()
+                for invoice in batch:
+                    self._fail(invoice, self.last_error)
+
+    def _process_batch(self, batch):
+        """Extract one micro-batch and write its report."""
+        unchanged = []
+        if self.manifest:
+            queued = [invoice for invoice in batch if "path" not in invoice]
+            watched = [invoice for invoice in batch if "path" in invoice]
+            changed = list(self.manifest.changed_invoices(watched))
+            unchanged = sorted({invoice["file_name"] for invoice in watched}
+                               - {invoice["file_name"] for invoice in changed})
+            batch = changed + queued
+            if not batch:
+                # Only touched files: store their new metadata
+                self.manifest.commit(None, {})
+                for file_name in unchanged:
+                    self._archive(file_name)
+                return
+
+        sequence = int(self._batches.value) + 1
+        report = f"daemon_{self.run_id}_{sequence:06d}.csv"
+        # next_batch keeps file names unique within a batch
+        invoices = {invoice["file_name"]: invoice for invoice in batch}
+        failed = set()
+        entity_counts = {}
+        sink = open_report_sink(self._blob_service_client, Config.REPORTS_CONTAINER, report, REPORT_FIELDNAMES,
+                                local_path=os.path.join(self.output_dir, report),
+                                block_size=Config.REPORT_BLOCK_SIZE_BYTES)
+        with sink:
+            for file_name, entities in extract_entities_batched(shard_invoices(batch), failed=failed):
+                sink.write_rows(report_rows(file_name, entities))
+                entity_counts[file_name] = entity_counts.get(file_name, 0) + len(entities)
+        if sink.upload_error is not None:
+            raise RuntimeError(f"Error uploading {report}: {sink.upload_error}")
+
+        done = time.monotonic()
+        end_to_end = registry.stage(STAGE_END_TO_END)
+        if self.manifest:
+            self.manifest.commit(report, entity_counts, failed)
+        for file_name in unchanged:
+            self._archive(file_name)
+        for file_name, invoice in invoices.items():
+            if file_name in failed:
+                self._fail(invoice, f"Extraction failed (report {report})")
+                continue
+            if "path" in invoice:
+                self._archive(file_name)
+            end_to_end.record(done - invoice["received_at"])
+            self._completions.append(done)
+        self._invoices.inc(len(invoices) - len(failed))
+        self._batches.inc()
+        self.last_batch_at = time.time()
+        first_arrival = min(invoice["received_at"] for invoice in invoices.values())
+        print(f"✓ batch {sequence}: {len(invoices)} invoice(s), {sink.rows_written} rows -> {report} "
+              f"({done - first_arrival:.1f}s after first arrival)"
+              + (f", {len(failed)} failed" if failed else ""))
+
+    @property
+    def queue_depth(self):
+        """Invoices waiting for a micro-batch."""
+        return self._pending.qsize() + len(self._held)
+
+    def docs_per_second(self):
+        """Invoices completed per second over the last THROUGHPUT_WINDOW_SECONDS."""
+        now = time.monotonic()
+        while self._completions and self._completions[0] < now - THROUGHPUT_WINDOW_SECONDS:
+            self._completions.popleft()
+        elapsed = min(THROUGHPUT_WINDOW_SECONDS, now - self.started_at)
+        return len(self._completions) / elapsed if elapsed > 0 else 0.0
+
+    def health(self):
+        """Liveness and throughput snapshot served on /healthz."""
+        worker_alive = self._worker is not None and self._worker.is_alive()
+        if self.watch_dir is None:
+            watcher_alive = True
+        elif self._observer is not None:
+            watcher_alive = self._observer.is_alive()
+        else:
+            watcher_alive = self._watcher is not None and self._watcher.is_alive()
+        return {
+            "status": "ok" if worker_alive and watcher_alive and not self._stop.is_set() else "unavailable",
+            "uptime_seconds": round(time.monotonic() - self.started_at, 3),
+            "watch_dir": self.watch_dir,
+            "watch_mode": None if self.watch_dir is None else ("inotify" if self._observer else "polling"),
+            "queue_depth": self.queue_depth,
+            "invoices_processed": int(self._invoices.value),
+            "failed_invoices": int(self._failed.value),
+            "retries_pending": len(self._retries),
+            "dead_letter_invoices": int(self._dead_lettered.value),
+            "batches": int(self._batches.value),
+            "docs_per_sec": round(self.docs_per_second(), 3),
+            "last_batch_at": self.last_batch_at,
+            "last_error": self.last_error,
+        }
+
+    def to_prometheus(self, prefix="ner"):
+        """Registry metrics plus the daemon's gauges in the Prometheus text format."""
+        health = self.health()
+        lines = [registry.to_prometheus(prefix).rstrip("\n")]
+        for name, value, description in (
+            ("daemon_up", 1 if health["status"] == "ok" else 0, "Whether the daemon is healthy."),
+            ("daemon_queue_depth", health["queue_depth"], "Invoices waiting for a micro-batch."),
+            ("daemon_docs_per_second", health["docs_per_sec"],
+             f"Invoices completed per second over the last {THROUGHPUT_WINDOW_SECONDS:g}s."),
+            ("daemon_uptime_seconds", health["uptime_seconds"], "Seconds since the daemon started."),
+        ):
+            lines.append(f"# HELP {prefix}_{name} {description}")
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def start(self, host=None, port=None):
+        """
+        Warm up, then start the worker, the watcher and the health/metrics server.
+
+        Returns:
+            tuple: (host, port) the HTTP server is bound to.
+        """
+        if self.watch_dir:
+            if not os.path.isdir(self.watch_dir):
+                raise ValueError(f"Watch folder not found: {self.watch_dir}")
+            for folder in (self.processed_dir, self.dead_letter_dir):
+                if not os.path.relpath(os.path.abspath(folder), self.watch_dir).startswith(".."):
+                    raise ValueError(f"{folder} is inside the watch folder; its files would be picked up again")
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.warm_up()
+
+        self._worker = threading.Thread(target=self._work, name="daemon-worker", daemon=True)
+        self._worker.start()
+        self._retrier = threading.Thread(target=self._retry, name="daemon-retry", daemon=True)
+        self._retrier.start()
+        if self.watch_dir:
+            if Observer is not None:
+                # Watch before the initial scan so no file slips in between
+                self._observer = Observer()
+                self._observer.schedule(_WatchHandler(self), self.watch_dir, recursive=True)
+                self._observer.start()
+            self._watcher = threading.Thread(target=self._watch, name="daemon-watch", daemon=True)
+            self._watcher.start()
+
+        self._server = ThreadingHTTPServer((host or Config.DAEMON_HTTP_HOST,
+                                            Config.DAEMON_HTTP_PORT if port is None else port),
+                                           _make_handler(self))
+        threading.Thread(target=self._server.serve_forever, name="daemon-http", daemon=True).start()
+        return self._server.server_address[:2]
+
+    def stop(self):
+        """
+        Stop taking new invoices, finish the queued ones and shut down. Invoices
+        waiting for a retry get one last attempt; if it fails they are dead-lettered.
+        """
+        self._stop.set()
+        with self._retry_condition:
+            self._retry_condition.notify()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        if self._watcher is not None:
+            self._watcher.join()
+        if self._retrier is not None:
+            self._retrier.join()
+        self._drain.set()
+        if self._worker is not None:
+            self._worker.join()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        if self.manifest:
+            print(self.manifest.format_stats())
+            self.manifest.close()
+        print(registry.format_summary())
+        Config.export_metrics()
+
+
+def _make_handler(daemon):
+    class DaemonHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, data, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_json(self, status, body):
+            self._send(status, json.dumps(body).encode("utf-8"), "application/json")
+
+        def do_GET(self):
+            path = urlparse(self.path).path.rstrip("/")
+            if path == "/healthz":
+                health = daemon.health()
+                self._send_json(200 if health["status"] == "ok" else 503, health)
+            elif path == "/metrics":
+                self._send(200, daemon.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+            else:
+                self._send_json(404, {"error": f"Not found: {path}"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path.rstrip("/") != "/invoices":
+                self._send_json(404, {"error": f"Not found: {url.path}"})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                content = self.rfile.read(length).decode("utf-8")
+            except UnicodeDecodeError:
+                self._send_json(400, {"error": "Invoice body must be UTF-8 text"})
+                return
+            # Only the base name is kept: it names the dead-letter file if the invoice keeps failing
+            name = os.path.basename(parse_qs(url.query).get("name", [""])[0]) or f"queued_{time.time_ns()}.txt"
+            if not daemon.submit(name, content):
+                self._send_json(503, {"error": "Daemon is stopping or its queue is full"})
+                return
+            self._send_json(202, {"queued": name, "queue_depth": daemon.queue_depth})
+
+    return DaemonHandler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the fine-tuned NER model as a micro-batching extraction service")
+    parser.add_argument("--watch", help="Drop folder to watch for new invoices")
+    parser.add_argument("--output", default="/tmp/ner_daemon", help="Directory for the per-batch CSV reports")
+    parser.add_argument("--extension", default=".txt", help="Suffix of invoice files in the drop folder")
+    parser.add_argument("--host", default=Config.DAEMON_HTTP_HOST, help="Health/metrics/queue server address")
+    parser.add_argument("--port", type=int, default=Config.DAEMON_HTTP_PORT)
+    parser.add_argument("--batch-size", type=int, default=Config.DAEMON_BATCH_MAX_DOCUMENTS,
+                        help="Largest micro-batch")
+    parser.add_argument("--batch-window", type=float, default=Config.DAEMON_BATCH_WINDOW_SECONDS,
+                        help="Seconds to wait after a batch's first invoice before running it")
+    parser.add_argument("--processed", help="Folder reported drop-folder files are moved to (default <output>/processed)")
+    parser.add_argument("--dead-letter", help="Folder for invoices that failed every attempt (default <output>/dead_letter)")
+    parser.add_argument("--max-attempts", type=int, default=Config.DAEMON_MAX_ATTEMPTS,
+                        help="Attempts per invoice before it is dead-lettered")
+    parser.add_argument("--no-manifest", action="store_true",
+                        help="Do not record processed drop-folder files (they are processed again after a restart)")
+    args = parser.parse_args()
+
+    Config.configure_observability()
+    Config.validate(strict=True)
+    manifest = Config.get_invoice_manifest(args.watch, "fine-tuned") if args.watch and not args.no_manifest else None
+    daemon = ExtractionDaemon(args.output, watch_dir=args.watch, extension=args.extension, manifest=manifest,
+                              max_documents=args.batch_size, window_seconds=args.batch_window,
+                              processed_dir=args.processed, dead_letter_dir=args.dead_letter,
+                              max_attempts=args.max_attempts)
+    host, port = daemon.start(args.host, args.port)
+
+    print("=" * 60)
+    print("Fine-Tuned NER Extraction Daemon")
+    print("=" * 60)
+    if daemon.watch_dir:
+        print(f"Watching: {daemon.watch_dir} ({daemon.health()['watch_mode']}), processed files -> {daemon.processed_dir}")
+    print(f"Micro-batches: up to {daemon.max_documents} invoice(s) or {daemon.window_seconds:g}s")
+    print(f"Reports: {args.output}  Dead letters: {daemon.dead_letter_dir} (after {daemon.max_attempts} attempt(s))")
+    print(f"Queue: POST http://{host}:{port}/invoices?name=<file name>")
+    print(f"Health: http://{host}:{port}/healthz  Metrics: http://{host}:{port}/metrics")
+    print("=" * 60)
+
+    stopping = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopping.set())
+    while not stopping.wait(1):
+        pass
+    print("\nStopping: finishing queued invoices...")
+    daemon.stop()
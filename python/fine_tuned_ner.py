@@ -1,13 +1,20 @@
-import os
+import argparse
 import json
-import csv
+import logging
 import requests
+from collections import deque
 from datetime import datetime
-from azure.storage.blob import BlobServiceClient
 from config import Config
+from http_client import format_pool_stats
+from invoice_loader import iter_invoice_source
+from invoice_sharding import remap_entities, shard_invoices
+from report_sink import open_report_sink
+from result_cache import ResultCache, split_cached
+from language_jobs import format_job_metrics, run_batched_jobs, submit_job, wait_for_job
+from metrics import registry
+from rate_limiter import JOB_POLL, JOB_SUBMIT, format_rate_limit_stats
 
-# Validate configuration on startup
-Config.validate(strict=True)
+logger = logging.getLogger(__name__)
 
 # Load configuration from centralized config module
 LANGUAGE_SERVICE_ENDPOINT = Config.LANGUAGE_SERVICE_ENDPOINT
@@ -15,56 +22,19 @@ API_VERSION = Config.LANGUAGE_SERVICE_API_VERSION
 PROJECT_NAME = Config.AI_FOUNDRY_PROJECT_NAME
 DEPLOYMENT_NAME = Config.AI_FOUNDRY_DEPLOYMENT_NAME
 
-# Get credentials from Key Vault
-language_service_key = Config.get_language_service_key()
-storage_connection_string = Config.get_storage_connection_string()
-
-def fetch_invoices_from_local(test_invoices_dir="../data/test_invoices"):
-    """Fetch all test invoice files from local filesystem."""
-    try:
-        invoices = []
-        
-        # Get the directory path relative to the script location
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        full_path = os.path.join(script_dir, test_invoices_dir)
-        
-        # List all .txt files in the test_invoices directory
-        if not os.path.exists(full_path):
-            print(f"Error: Test invoices directory not found at {full_path}")
-            return []
-        
-        txt_files = sorted([f for f in os.listdir(full_path) if f.endswith('.txt')])
-        
-        for file_name in txt_files:
-            file_path = os.path.join(full_path, file_name)
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                invoices.append({
-                    "file_name": file_name,
-                    "content": content
-                })
-        
-        print(f"Loaded {len(invoices)} test invoice files from {full_path}")
-        return invoices
-    except Exception as err:
-        print(f"Error loading test invoices from local filesystem: {err}")
-        return []
+# Key Vault secrets this script needs; fetched together before the run starts
+REQUIRED_SECRETS = [Config.LANGUAGE_SERVICE_KEY_SECRET, Config.STORAGE_CONNECTION_STRING_SECRET]
 
 def extract_entities_with_fine_tuned_model(invoice_text, file_name):
     """
     Send invoice text to fine-tuned NER model via async API.
-    Returns extracted entities.
+    Returns the parsed job response (see response_parser.JobResponse), or None on failure.
     """
     import time
     
     # Use async API endpoint for CustomEntityRecognition
     url = f"{LANGUAGE_SERVICE_ENDPOINT}language/analyze-text/jobs?api-version={API_VERSION}"
     
-    headers = {
-        "Ocp-Apim-Subscription-Key": language_service_key,
-        "Content-Type": "application/json"
-    }
-    
     # Async API requires 'tasks' array format
     payload = {
         "displayName": f"Entity extraction for {file_name}",
@@ -90,60 +60,35 @@ def extract_entities_with_fine_tuned_model(invoice_text, file_name):
     }
     
     try:
-        print(f"  [DEBUG] Submitting async job to {url}")
-        response = requests.post(url, headers=headers, json=payload)
-        print(f"  [DEBUG] Response status code: {response.status_code}")
-        
-        if response.status_code != 202:
-            print(f"  [ERROR] API request error for file {file_name}: {response.status_code}")
-            print(f"  [ERROR] Response body: {response.text}")
+        logger.debug("Submitting async job to %s", url)
+        submitted_at = time.monotonic()
+        job_location, retry_after = submit_job(
+            LANGUAGE_SERVICE_ENDPOINT,
+            API_VERSION,
+            Config.get_language_service_key(),
+            payload,
+            session=Config.get_http_session(),
+            limiter=Config.get_rate_limiter(JOB_SUBMIT),
+            max_throttle_retries=Config.RATE_LIMIT_MAX_THROTTLE_RETRIES,
+        )
+        if not job_location:
+            print(f"  [ERROR] API request error for file {file_name}: job was not accepted")
             return None
+        logger.debug("Job submitted, polling location: %s", job_location)
         
-        # Get the job location from the response headers
-        job_location = response.headers.get('operation-location')
-        print(f"  [DEBUG] Job submitted, polling location: {job_location}")
-        
-        # Poll for the job result
-        max_retries = 30
-        retry_count = 0
-        
-        while retry_count < max_retries:
-            time.sleep(2)  # Wait 2 seconds before checking
-            
-            status_response = requests.get(job_location, headers={
-                "Ocp-Apim-Subscription-Key": language_service_key
-            })
-            
-            if status_response.status_code == 200:
-                result = status_response.json()
-                job_status = result.get('status')
-                print(f"  [DEBUG] Job status: {job_status}")
-                print(f"  [DEBUG] Result keys: {result.keys() if isinstance(result, dict) else 'Not a dict'}")
-                
-                if job_status == 'succeeded':
-                    print(f"  [DEBUG] Job succeeded, extracting results")
-                    # Results are in tasks[0] (items array)
-                    tasks = result.get('tasks', {})
-                    items = tasks.get('items', [])
-                    if items:
-                        task_result = items[0]
-                        result_data = task_result.get('results', {})
-                        print(f"  [DEBUG] Extracted result_data with keys: {result_data.keys() if isinstance(result_data, dict) else 'Not a dict'}")
-                        return result_data
-                    else:
-                        print(f"  [DEBUG] No items in tasks")
-                        return None
-                elif job_status == 'failed':
-                    errors = result.get('errors', [])
-                    print(f"  [ERROR] Job failed: {errors}")
-                    return None
-            else:
-                print(f"  [DEBUG] Status check returned {status_response.status_code}")
-            
-            retry_count += 1
-        
-        print(f"  [ERROR] Job polling timed out for {file_name}")
-        return None
+        # Poll for the job result using the configured backoff policy
+        result_data = wait_for_job(
+            job_location,
+            Config.get_language_service_key(),
+            Config.get_polling_policy(),
+            submitted_at=submitted_at,
+            retry_after=retry_after,
+            session=Config.get_http_session(),
+            limiter=Config.get_rate_limiter(JOB_POLL),
+        )
+        if result_data is None:
+            print(f"  [ERROR] Job did not succeed for {file_name}")
+        return result_data
         
     except requests.exceptions.RequestException as err:
         print(f"  [ERROR] API request error for file {file_name}: {err}")
@@ -152,169 +97,305 @@ def extract_entities_with_fine_tuned_model(invoice_text, file_name):
             print(f"  [ERROR] Response body: {err.response.text}")
         return None
 
-def parse_entities_from_response(response_json, file_name=""):
+def _cache_key(invoice_content):
+    """Result cache key for an invoice sent to the configured fine-tuned deployment."""
+    return ResultCache.make_key(
+        invoice_content, "CustomEntityRecognition", f"{PROJECT_NAME}/{DEPLOYMENT_NAME}", API_VERSION
+    )
+
+def _merge_rule_entities(plan, entities):
+    """Combine locally extracted fields with model entities found in the residual text."""
+    rule_entities = [
+        {
+            "text": entity["text"],
+            "category": entity["category"],
+            "confidence": entity["confidenceScore"],
+            "offset": entity["offset"],
+            "length": entity["length"],
+            "subcategory": ""
+        }
+        for entity in plan.entities
+    ]
+    return sorted(rule_entities + plan.remap_model_entities(entities), key=lambda entity: entity["offset"])
+
+def _apply_rules(invoices, extractor, local_only):
     """
-    Parse entities from the fine-tuned CustomEntityRecognition model async API response.
-    Extracts recognized entities and their classifications.
+    Swap each invoice's content for the residual text the model still has to see.
+    Invoices the rules fully cover are appended to local_only as (invoice, []) and
+    None is yielded in their place (see result_cache.split_cached).
     """
-    entities = []
-    
-    if not response_json:
-        print(f"  [DEBUG] No response JSON for {file_name}")
-        return entities
-    
-    # Debug: print the response structure
-    print(f"  [DEBUG] Response keys: {response_json.keys() if isinstance(response_json, dict) else 'Not a dict'}")
-    
-    try:
-        # Async API response structure wraps results in tasks array
-        # Path: tasks[0].results.documents[].entities
-        
-        if "tasks" in response_json:
-            tasks = response_json.get("tasks", [])
-            print(f"  [DEBUG] Found {len(tasks)} tasks")
-            
-            if tasks:
-                task_result = tasks[0]
-                print(f"  [DEBUG] Task result keys: {task_result.keys()}")
-                
-                if "results" in task_result:
-                    results = task_result["results"]
-                    print(f"  [DEBUG] Found results, keys: {results.keys() if isinstance(results, dict) else 'Not a dict'}")
-                    
-                    if "documents" in results:
-                        documents = results["documents"]
-                        print(f"  [DEBUG] Found {len(documents)} documents in results")
-                        
-                        for doc in documents:
-                            print(f"  [DEBUG] Document keys: {doc.keys() if isinstance(doc, dict) else 'Not a dict'}")
-                            
-                            if "entities" in doc:
-                                entities_list = doc["entities"]
-                                print(f"  [DEBUG] Found {len(entities_list)} entities in this document")
-                                
-                                for entity in entities_list:
-                                    entities.append({
-                                        "text": entity.get("text", ""),
-                                        "category": entity.get("category", "Unknown"),
-                                        "confidence": entity.get("confidenceScore", 0),
-                                        "offset": entity.get("offset", -1),
-                                        "length": entity.get("length", 0),
-                                        "subcategory": entity.get("subcategory", "")
-                                    })
-        
-        # Fallback for direct results path (in case API returns differently)
-        elif "documents" in response_json:
-            print(f"  [DEBUG] Found 'documents' at top level")
-            documents = response_json["documents"]
-            
-            for doc in documents:
-                if "entities" in doc:
-                    for entity in doc["entities"]:
-                        entities.append({
-                            "text": entity.get("text", ""),
-                            "category": entity.get("category", "Unknown"),
-                            "confidence": entity.get("confidenceScore", 0),
-                            "offset": entity.get("offset", -1),
-                            "length": entity.get("length", 0),
-                            "subcategory": entity.get("subcategory", "")
-                        })
-        
+    for invoice in invoices:
+        plan = extractor.plan(invoice["content"])
+        if plan.needs_model:
+            yield dict(invoice, content=plan.model_text, rule_plan=plan)
         else:
-            print(f"  [DEBUG] No recognized entity path found. Response preview: {str(response_json)[:300]}")
-            
-    except (KeyError, TypeError) as err:
-        print(f"  [DEBUG] Error parsing response: {err}")
-        print(f"  [DEBUG] Response type: {type(response_json)}")
-    
-    return entities
+            local_only.append((dict(invoice, rule_plan=plan), []))
+            yield None
+
+def _finish_entities(invoice, entities):
+    """Merge rule entities and map offsets back into the invoice's source file."""
+    if "rule_plan" in invoice:
+        entities = _merge_rule_entities(invoice["rule_plan"], entities)
+    return remap_entities(entities, invoice.get("offset", 0))
 
 def extract_custom_entities(invoice_content, file_name):
     """
     Extract specific entities from invoice content using fine-tuned model.
+    Deterministic fields are extracted locally first (see rule_extractor) and
+    only the residual text is sent to the model.
     Returns structured invoice data.
     """
     print(f"Extracting entities from {file_name}...")
     
+    extractor = Config.get_rule_extractor()
+    plan = extractor.plan(invoice_content) if extractor else None
+    model_text = plan.model_text if plan else invoice_content
+    
     # Call the fine-tuned model
-    response = extract_entities_with_fine_tuned_model(invoice_content, file_name)
-    entities = parse_entities_from_response(response, file_name)
+    cache = Config.get_result_cache()
+    cache_key = _cache_key(model_text)
+    entities = cache.get(cache_key) if cache is not None and model_text else None
+    
+    if not model_text:
+        print(f"  All fields extracted locally for {file_name}")
+        entities = []
+    elif entities is not None:
+        print(f"  Using cached entities for {file_name}")
+    else:
+        response = extract_entities_with_fine_tuned_model(model_text, file_name)
+        entities = response.first_entities() if response is not None else []
+        if cache is not None and response is not None:
+            cache.put(cache_key, entities)
+    
+    if plan:
+        entities = _merge_rule_entities(plan, entities)
     
     # Print extracted entities
     if entities:
         print(f"  Found {len(entities)} entities:")
-        for entity in entities:
-            print(f"    - {entity['text']} ({entity['category']}, confidence: {entity['confidence']*100:.2f}%)")
+        if logger.isEnabledFor(logging.DEBUG):
+            for entity in entities:
+                logger.debug("  - %s (%s, confidence: %.2f%%)", entity['text'], entity['category'],
+                             entity['confidence'] * 100)
     else:
         print(f"  No entities extracted or API error.")
     
     return entities
 
-def process_invoices_and_export(invoices):
-    """
-    Process all invoices through the fine-tuned NER model and export results to CSV.
+def _reattach_jobs(ledger):
+    """Finish the jobs an interrupted attempt of this run left in flight and record their results."""
+    jobs = ledger.in_flight_jobs()
+    if not jobs:
+        return
+    print(f"Re-attaching to {len(jobs)} in-flight job(s) from run {ledger.run_id}...")
+    for stand_in, entities in run_batched_jobs(
+        [],
+        endpoint=LANGUAGE_SERVICE_ENDPOINT,
+        api_version=API_VERSION,
+        api_key=Config.get_language_service_key(),
+        project_name=PROJECT_NAME,
+        deployment_name=DEPLOYMENT_NAME,
+        max_documents=Config.CUSTOM_NER_MAX_DOCUMENTS_PER_JOB,
+        max_characters=Config.CUSTOM_NER_MAX_CHARACTERS_PER_JOB,
+        polling_policy=Config.get_polling_policy(),
+        session=Config.get_http_session(),
+        poll_limiter=Config.get_rate_limiter(JOB_POLL),
+        attached_jobs=jobs,
+    ):
+        if entities is None:
+            ledger.mark_failed(stand_in)
+        else:
+            ledger.mark_completed(stand_in, entities)
+
+def extract_entities_batched(invoices, ledger=None, failed=None):
     """
-    print("\nStarting fine-tuned NER extraction workflow...\n")
+    Extract entities from many invoices by packing them into multi-document jobs.
+    Up to Config.CUSTOM_NER_MAX_IN_FLIGHT_JOBS jobs run concurrently and
+    (file_name, entities) pairs are yielded as each job completes. Invoices with
+    cached results are yielded without being sent to the model. Deterministic
+    fields are extracted locally (see rule_extractor) and cut from the text sent
+    to the model. Invoices carrying an "offset" (sub-documents from
+    invoice_sharding) get their entity offsets mapped back into the source file.
     
-    csv_rows = []
+    With a JobLedger, jobs left in flight by an interrupted attempt of the run are
+    re-attached first, documents the run already completed are replayed from the
+    ledger, and every submission and result is recorded as it happens.
     
-    for invoice in invoices:
-        file_name = invoice["file_name"]
-        content = invoice["content"]
-        
-        print(f"\n--- Processing {file_name} ---")
-        
-        # Extract entities using fine-tuned model
-        entities = extract_custom_entities(content, file_name)
+    File names whose extraction failed are added to the failed set, if given.
+    """
+    cache = Config.get_result_cache()
+    # (invoice, entities) pairs that need no model call: cache hits, rule-only and ledger-completed
+    # invoices. The filters below yield None for each one, which run_batched_jobs answers with a
+    # (None, None) pair, so they are emitted as they are split off and the deque stays short.
+    cache_hits = deque()
+    extractor = Config.get_rule_extractor()
+    if extractor:
+        invoices = _apply_rules(invoices, extractor, cache_hits)
+    if ledger:
+        _reattach_jobs(ledger)
+        invoices = ledger.split_completed(invoices, cache_hits)
+    if cache is not None:
+        invoices = split_cached(invoices, cache, lambda invoice: _cache_key(invoice["content"]), cache_hits)
+    
+    for invoice, entities in run_batched_jobs(
+        invoices,
+        endpoint=LANGUAGE_SERVICE_ENDPOINT,
+        api_version=API_VERSION,
+        api_key=Config.get_language_service_key(),
+        project_name=PROJECT_NAME,
+        deployment_name=DEPLOYMENT_NAME,
+        max_documents=Config.CUSTOM_NER_MAX_DOCUMENTS_PER_JOB,
+        max_characters=Config.CUSTOM_NER_MAX_CHARACTERS_PER_JOB,
+        max_in_flight=Config.CUSTOM_NER_MAX_IN_FLIGHT_JOBS,
+        polling_policy=Config.get_polling_policy(),
+        session=Config.get_http_session(),
+        submit_limiter=Config.get_rate_limiter(JOB_SUBMIT),
+        poll_limiter=Config.get_rate_limiter(JOB_POLL),
+        on_submit=ledger.mark_submitted if ledger else None,
+    ):
+        while cache_hits:
+            cached_invoice, entities = cache_hits.popleft()
+            yield cached_invoice["file_name"], _finish_entities(cached_invoice, entities)
+        if invoice is None:
+            continue
         
-        # Add to CSV rows
-        for idx, entity in enumerate(entities):
-            csv_rows.append({
-                "File Name": file_name,
-                "Entity Text": entity.get("text", ""),
-                "Category": entity.get("category", ""),
-                "Subcategory": entity.get("subcategory", ""),
-                "Confidence": f"{entity.get('confidence', 0)*100:.2f}%",
-                "Offset": entity.get("offset", ""),
-                "Length": entity.get("length", ""),
-            })
+        file_name = invoice["file_name"]
+        if entities is None:
+            if ledger:
+                ledger.mark_failed(invoice)
+            if failed is not None:
+                failed.add(file_name)
+            entities = []
+        else:
+            if cache is not None:
+                cache.put(_cache_key(invoice["content"]), entities)
+            if ledger:
+                ledger.mark_completed(invoice, entities)
+        entities = _finish_entities(invoice, entities)
+        print(f"  {file_name}: {len(entities)} entities")
+        yield file_name, entities
     
-    # Write results to CSV file
-    print("\n\n=== Exporting Results ===")
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    csv_file_name = f"fine_tuned_ner_results_{timestamp}.csv"
+    while cache_hits:
+        cached_invoice, entities = cache_hits.popleft()
+        yield cached_invoice["file_name"], _finish_entities(cached_invoice, entities)
+
+REPORT_FIELDNAMES = ["File Name", "Entity Text", "Category", "Subcategory", "Confidence", "Offset", "Length"]
+
+def report_rows(file_name, entities):
+    """Yield the REPORT_FIELDNAMES rows for one invoice's entities."""
+    for entity in entities:
+        yield {
+            "File Name": file_name,
+            "Entity Text": entity.get("text", ""),
+            "Category": entity.get("category", ""),
+            "Subcategory": entity.get("subcategory", ""),
+            "Confidence": f"{entity.get('confidence', 0)*100:.2f}%",
+            "Offset": entity.get("offset", ""),
+            "Length": entity.get("length", ""),
+        }
+
+def process_invoices_and_export(invoices, batched=True, shard=True, run_id=None, manifest=None):
+    """
+    Process all invoices through the fine-tuned NER model and stream results to CSV.
+    
+    Rows are written as each invoice's results arrive, mirrored to /tmp and uploaded
+    to the reports container in staged blocks, so memory does not grow with the
+    number of extracted entities.
+    
+    Args:
+        invoices (iterable): Invoice dicts with "file_name" and "content" keys, e.g.
+                             streamed from invoice_loader.iter_invoice_source.
+        batched (bool): If True, pack invoices into multi-document jobs. If False,
+                        submit one job per invoice.
+        shard (bool): In batched mode, split multi-invoice batch files into one
+                      sub-document per invoice before packing them into jobs.
+                      Reported offsets still point into the original file.
+        run_id (str): Run identifier; defaults to a new timestamp. In batched mode
+                      with JOB_LEDGER_ENABLED, passing the id of an interrupted run
+                      resumes it from the job ledger instead of starting over.
+        manifest (InvoiceManifest): For incremental runs (batched mode): invoices
+                                    is manifest.changed_invoices(...), and once the
+                                    report is uploaded its invoices are recorded, apart
+                                    from failed ones, which the next run retries.
+    
+    Returns:
+        int: Number of entity rows written to the report.
+    """
+    print("\nStarting fine-tuned NER extraction workflow...\n")
+    
+    invoice_count = 0
+    run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+    csv_file_name = f"fine_tuned_ner_results_{run_id}.csv"
     csv_path = f"/tmp/{csv_file_name}"
+    reports_container = Config.REPORTS_CONTAINER
     
     try:
-        with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ["File Name", "Entity Text", "Category", "Subcategory", "Confidence", "Offset", "Length"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(csv_rows)
-        
-        print(f"CSV report created locally: {csv_path}")
-        print(f"Total rows written: {len(csv_rows)}")
-        
-        # Upload to Azure Storage
-        print("\nUploading CSV report to Azure Storage...")
-        blob_service_client = BlobServiceClient.from_connection_string(storage_connection_string)
-        reports_container = "reports"
-        
-        with open(csv_path, 'rb') as data:
-            blob_client = blob_service_client.get_blob_client(
-                container=reports_container,
-                blob=csv_file_name
-            )
-            blob_client.upload_blob(data, overwrite=True)
-        
-        print(f"CSV report uploaded to Azure Storage container '{reports_container}' as '{csv_file_name}'")
-        print(f"Report URL: https://<storage-account>.blob.core.windows.net/{reports_container}/{csv_file_name}")
-        
+        blob_service_client = Config.get_blob_service_client()
     except Exception as err:
-        print(f"Error writing or uploading CSV: {err}")
+        print(f"Error connecting to Azure Storage, writing report locally only: {err}")
+        blob_service_client = None
+    
+    sink = open_report_sink(blob_service_client, reports_container, csv_file_name, REPORT_FIELDNAMES,
+                            local_path=csv_path, block_size=Config.REPORT_BLOCK_SIZE_BYTES)
+    
+    ledger = Config.get_job_ledger(run_id) if batched else None
+    if ledger:
+        print(f"Run id: {run_id} (resume an interrupted run with --resume {run_id})")
+    
+    failed = set()
+    entity_counts = {}
+    if batched:
+        if shard:
+            invoices = shard_invoices(invoices)
+        extracted = extract_entities_batched(invoices, ledger=ledger, failed=failed)
+    else:
+        extracted = (
+            (invoice["file_name"], extract_custom_entities(invoice["content"], invoice["file_name"]))
+            for invoice in invoices
+        )
+    
+    with sink:
+        for file_name, entities in extracted:
+            invoice_count += 1
+            sink.write_rows(report_rows(file_name, entities))
+            if manifest:
+                entity_counts[file_name] = entity_counts.get(file_name, 0) + len(entities)
     
+    print("\n\n=== Exporting Results ===")
+    print(f"Documents processed: {invoice_count}")
+    print(f"CSV report created locally: {csv_path}")
+    print(f"Total rows written: {sink.rows_written}")
+    
+    uploaded = blob_service_client is not None and sink.upload_error is None
+    if uploaded:
+        print(f"CSV report uploaded to Azure Storage container '{reports_container}' as '{csv_file_name}' "
+              f"({len(sink.block_ids)} block(s))")
+        print(f"Report URL: https://<storage-account>.blob.core.windows.net/{reports_container}/{csv_file_name}")
+    elif sink.upload_error is not None:
+        print(f"Error uploading CSV: {sink.upload_error}")
+    
+    print(f"\n{format_job_metrics(Config.get_polling_policy())}")
+    print(format_pool_stats(Config.get_http_session()))
+    print(format_rate_limit_stats(Config.get_rate_limiters()))
+    if Config.get_rule_extractor():
+        print(Config.get_rule_extractor().format_stats())
+    if Config.get_result_cache() is not None:
+        print(Config.get_result_cache().format_stats())
+    if ledger:
+        print(ledger.format_stats())
+        ledger.close()
+    if manifest:
+        # Only an uploaded report counts; otherwise every invoice is processed again next run
+        if uploaded:
+            manifest.commit(csv_file_name, entity_counts, failed)
+        else:
+            print("Invoice manifest not updated: the report did not reach Azure Storage")
+        print(manifest.format_stats())
+        manifest.close()
+    print(registry.format_summary())
+    Config.export_metrics()
     print("\n=== Extraction Complete ===")
-    return csv_rows
+    return sink.rows_written
 
 if __name__ == "__main__":
     print("=" * 60)
@@ -325,12 +406,24 @@ if __name__ == "__main__":
     print(f"Deployment: {DEPLOYMENT_NAME}")
     print("=" * 60)
     
-    # Load test invoices from local filesystem
-    invoices = fetch_invoices_from_local(test_invoices_dir="../data/test_invoices")
+    parser = argparse.ArgumentParser(description="Extract invoice entities with the fine-tuned NER model")
+    parser.add_argument("--invoices", default="../data/test_invoices", help="Invoice directory or blob://<container>/<prefix>")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Resume an interrupted run from the job ledger")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only process invoices that are new or changed since earlier incremental runs")
+    args = parser.parse_args()
     
-    if invoices:
-        # Process invoices through fine-tuned model
-        results = process_invoices_and_export(invoices)
-        print(f"\nFinal Summary: Extracted {len(results)} total entities from {len(invoices)} invoice files.")
+    Config.configure_observability()
+    Config.validate(strict=True)
+    Config.prefetch_secrets(REQUIRED_SECRETS)
+    
+    # Stream invoices from local disk or Blob Storage straight into the batched pipeline
+    manifest = Config.get_invoice_manifest(args.invoices, "fine-tuned") if args.incremental else None
+    if manifest:
+        invoices = manifest.changed_invoices(iter_invoice_source(args.invoices, skip=manifest.is_unchanged))
     else:
-        print("No test invoices found in local filesystem. Exiting.")
+        invoices = iter_invoice_source(args.invoices)
+    
+    # Process invoices through fine-tuned model
+    total_entities = process_invoices_and_export(invoices, run_id=args.resume, manifest=manifest)
+    print(f"\nFinal Summary: Extracted {total_entities} total entities.")
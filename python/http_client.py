@@ -0,0 +1,124 @@
+"""
+Pooled keep-alive HTTP session shared by all Language service and Storage calls.
+Built once through Config.get_http_session() so every status poll reuses an open
+TLS connection instead of paying a new handshake.
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default (connect, read) timeout to every request."""
+
+    def __init__(self, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def create_session(pool_connections=10, pool_maxsize=32, connect_timeout=5.0, read_timeout=30.0,
+                   max_retries=3, retry_backoff=0.5):
+    """
+    Create a requests.Session with a keep-alive connection pool and retry policy.
+
+    Connection errors are retried for every method. Transient 5xx responses are only
+    retried for idempotent methods so a job submission is never sent twice.
+
+    Args:
+        pool_connections (int): Number of per-host pools to cache.
+        pool_maxsize (int): Maximum open connections kept per host.
+        connect_timeout (float): Seconds to wait for a connection.
+        read_timeout (float): Seconds to wait for a response.
+        max_retries (int): Retries for connection errors and transient failures.
+        retry_backoff (float): Backoff factor between retries.
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=retry_backoff,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD", "PUT", "DELETE", "OPTIONS"]),
+        raise_on_status=False,
+    )
+    adapter = TimeoutHTTPAdapter(
+        timeout=(connect_timeout, read_timeout),
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def sdk_session(session):
+    """
+    Create a session for Azure SDK transports that shares session's connection pools.
+
+    The Azure SDK clients run their own RetryPolicy, so the adapters here never
+    retry; stacking urllib3 retries underneath would multiply attempts and the
+    worst-case latency on a failing dependency. Connections stay shared, so
+    pool_stats(session) still counts SDK traffic.
+
+    Args:
+        session (requests.Session): Session created by create_session.
+    """
+    shared = requests.Session()
+    adapters = {}
+    for prefix, adapter in session.adapters.items():
+        if id(adapter) not in adapters:
+            no_retries = TimeoutHTTPAdapter(timeout=adapter.timeout, max_retries=0)
+            no_retries.poolmanager = adapter.poolmanager
+            adapters[id(adapter)] = no_retries
+        shared.mount(prefix, adapters[id(adapter)])
+    return shared
+
+
+def pool_stats(session):
+    """
+    Report connection reuse for a session created by create_session.
+
+    Returns:
+        dict: Requests sent, connections opened and how many requests reused an
+              already open connection, summed over all host pools.
+    """
+    requests_sent = 0
+    connections_opened = 0
+    seen = set()
+
+    for adapter in session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_sent += pool.num_requests
+            connections_opened += pool.num_connections
+
+    return {
+        "requests": requests_sent,
+        "connections_opened": connections_opened,
+        "reused": max(0, requests_sent - connections_opened),
+    }
+
+
+def format_pool_stats(session):
+    """Format pool_stats as a single printable line."""
+    stats = pool_stats(session)
+    reuse = stats["reused"] / stats["requests"] if stats["requests"] else 0
+    return (f"http pool: requests={stats['requests']} connections_opened={stats['connections_opened']} "
+            f"reuse={reuse:.0%}")
@@ -0,0 +1,106 @@
+"""
+Streaming invoice loader shared by all NER pipelines.
+Walks an invoice directory with os.scandir and yields one document at a time,
+so processing starts with the first file and memory stays flat regardless of
+how many invoices the directory holds. iter_invoice_source also accepts
+blob://container/prefix locations, which read from Blob Storage instead.
+"""
+
+import os
+from blob_invoice_source import BLOB_SCHEME
+from metrics import STAGE_LOAD, registry
+
+DEFAULT_INVOICES_DIR = "../data/test_invoices"
+
+
+def resolve_invoices_dir(invoices_dir=DEFAULT_INVOICES_DIR):
+    """Resolve a directory relative to the python/ folder unless it is absolute."""
+    if os.path.isabs(invoices_dir):
+        return invoices_dir
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.normpath(os.path.join(script_dir, invoices_dir))
+
+
+def _walk_files(directory, extension, recursive, sort_entries):
+    """Yield os.DirEntry objects for matching files below directory."""
+    with os.scandir(directory) as iterator:
+        entries = sorted(iterator, key=lambda entry: entry.name) if sort_entries else iterator
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    yield from _walk_files(entry.path, extension, recursive, sort_entries)
+            elif entry.is_file() and entry.name.endswith(extension):
+                yield entry
+
+
+def iter_invoices(invoices_dir=DEFAULT_INVOICES_DIR, extension=".txt", recursive=True, sort_entries=True,
+                  include=None, skip=None, verbose=True):
+    """
+    Lazily yield invoice documents from the local filesystem.
+
+    Args:
+        invoices_dir (str): Directory to scan, relative to python/ or absolute.
+        extension (str): Only files ending with this suffix are loaded.
+        recursive (bool): Descend into sub-directories.
+        sort_entries (bool): Yield files in name order within each directory. Only
+                             the names of one directory are held in memory at a time;
+                             pass False for very large drops to start even sooner.
+        include (callable): Optional predicate on the relative file name; files it
+                            rejects are skipped without being read (e.g. to load
+                            only one shard of a corpus).
+        skip (callable): Optional skip(file_name, size, mtime, etag) check made on
+                         the file's metadata before it is read (etag is None for
+                         local files), e.g. InvoiceManifest.is_unchanged.
+        verbose (bool): Print the loaded/skipped summary once the walk finishes.
+
+    Yields:
+        dict: {"file_name", "path", "size", "mtime", "content"} where file_name is
+              the path relative to invoices_dir.
+    """
+    full_path = resolve_invoices_dir(invoices_dir)
+    if not os.path.isdir(full_path):
+        print(f"Error: Invoices directory not found at {full_path}")
+        return
+
+    loaded = 0
+    skipped = 0
+    bytes_loaded = registry.counter("bytes_loaded", "Invoice bytes read from disk.")
+    for entry in _walk_files(full_path, extension, recursive, sort_entries):
+        file_name = os.path.relpath(entry.path, full_path)
+        if include is not None and not include(file_name):
+            continue
+        try:
+            with registry.time_stage(STAGE_LOAD):
+                stat = entry.stat()
+                if skip is not None and skip(file_name, stat.st_size, stat.st_mtime, None):
+                    skipped += 1
+                    continue
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+        except (OSError, UnicodeDecodeError) as err:
+            print(f"Error loading invoice {entry.path}: {err}")
+            continue
+
+        loaded += 1
+        bytes_loaded.inc(stat.st_size)
+        yield {
+            "file_name": file_name,
+            "path": entry.path,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "content": content,
+        }
+
+    if verbose:
+        print(f"Loaded {loaded} invoice files from {full_path}" + (f" ({skipped} skipped)" if skipped else ""))
+
+
+def iter_invoice_source(location=DEFAULT_INVOICES_DIR, extension=".txt", include=None, skip=None):
+    """
+    Yield invoices from a local directory or, for "blob://container/prefix"
+    locations, straight from Blob Storage (see blob_invoice_source).
+    """
+    if location.startswith(BLOB_SCHEME):
+        from blob_invoice_source import iter_invoices_from_blob
+        return iter_invoices_from_blob(location, extension=extension, include=include, skip=skip)
+    return iter_invoices(location, extension=extension, include=include, skip=skip)
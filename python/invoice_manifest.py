@@ -0,0 +1,168 @@
+"""
+Manifest of processed invoices for incremental runs.
+Every invoice a pipeline has reported on is recorded in a local SQLite file
+with its size, mtime (or blob ETag), content hash and the report holding its
+results. Later runs skip files whose size and mtime/ETag are unchanged without
+reading them. Files whose metadata changed but whose content hash did not are
+skipped as well, so a nightly run over a growing archive only processes, and
+only reports on, the new and changed files.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+NEW = "new"
+CHANGED = "changed"
+
+
+def _content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class InvoiceManifest:
+    """SQLite-backed record of the invoices one pipeline has processed from one source."""
+
+    def __init__(self, path, source, pipeline):
+        """
+        Args:
+            path (str): SQLite file location. Parent directories are created.
+            source (str): Invoice location (directory or blob://container/prefix).
+            pipeline (str): Pipeline name, so each model keeps its own manifest.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.source = source
+        self.pipeline = pipeline
+        self.counts = {NEW: 0, CHANGED: 0, "unchanged": 0, "touched": 0}
+        # file name -> (size, mtime, etag, content hash, status) of invoices handed out this run
+        self._pending = {}
+        # Unchanged content whose mtime/ETag moved: only the metadata is refreshed
+        self._touched = []
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS manifest_files ("
+            " source TEXT NOT NULL,"
+            " pipeline TEXT NOT NULL,"
+            " file_name TEXT NOT NULL,"
+            " size INTEGER,"
+            " mtime REAL,"
+            " etag TEXT,"
+            " content_hash TEXT NOT NULL,"
+            " entity_count INTEGER,"
+            " report TEXT,"
+            " processed_at REAL NOT NULL,"
+            " PRIMARY KEY (source, pipeline, file_name))"
+        )
+        self._conn.commit()
+
+    def _row(self, file_name):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT size, mtime, etag, content_hash FROM manifest_files"
+                " WHERE source = ? AND pipeline = ? AND file_name = ?",
+                (self.source, self.pipeline, file_name),
+            ).fetchone()
+
+    def is_unchanged(self, file_name, size, mtime, etag=None):
+        """
+        Metadata check made before an invoice is read; pass as the loader's skip
+        callback. Blobs compare ETags, local files size and mtime.
+        """
+        row = self._row(file_name)
+        if row is None or row[0] != size:
+            return False
+        unchanged = row[2] == etag if etag else row[1] == mtime
+        if unchanged:
+            self.counts["unchanged"] += 1
+        return unchanged
+
+    def changed_invoices(self, invoices):
+        """
+        Yield only new and changed invoices, remembering them for commit.
+
+        Invoices whose content hash matches the manifest are counted as touched
+        and not yielded; their new mtime/ETag is stored on commit.
+        """
+        for invoice in invoices:
+            content_hash = _content_hash(invoice["content"])
+            row = self._row(invoice["file_name"])
+            metadata = (invoice.get("size"), invoice.get("mtime"), invoice.get("etag"), content_hash)
+            if row is not None and row[3] == content_hash:
+                self.counts["touched"] += 1
+                self._touched.append((invoice["file_name"],) + metadata)
+                continue
+            status = NEW if row is None else CHANGED
+            self.counts[status] += 1
+            self._pending[invoice["file_name"]] = metadata + (status,)
+            yield invoice
+
+    def commit(self, report, entity_counts, failed=()):
+        """
+        Record this run's invoices as processed once their report is written.
+
+        Args:
+            report (str): Name of the report holding their results.
+            entity_counts (dict): File name -> entities written to the report.
+            failed (iterable): File names whose extraction failed; they stay pending
+                               and are retried by the next run.
+
+        Returns:
+            int: Number of invoices recorded.
+        """
+        failed = set(failed)
+        now = time.time()
+        rows = [
+            (self.source, self.pipeline, file_name, size, mtime, etag, content_hash,
+             entity_counts.get(file_name, 0), report, now)
+            for file_name, (size, mtime, etag, content_hash, _) in self._pending.items()
+            if file_name not in failed
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO manifest_files"
+                " (source, pipeline, file_name, size, mtime, etag, content_hash, entity_count, report, processed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.executemany(
+                "UPDATE manifest_files SET size = ?, mtime = ?, etag = ?"
+                " WHERE source = ? AND pipeline = ? AND file_name = ? AND content_hash = ?",
+                [(size, mtime, etag, self.source, self.pipeline, file_name, content_hash)
+                 for file_name, size, mtime, etag, content_hash in self._touched],
+            )
+            self._conn.commit()
+        self._pending.clear()
+        self._touched.clear()
+        return len(rows)
+
+    def discard(self):
+        """Forget the invoices handed out since the last commit; they are processed again later."""
+        self._pending.clear()
+        self._touched.clear()
+
+    def report_set(self):
+        """Return [(report, files, entities)] for every report in this manifest, oldest first."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT report, COUNT(*), SUM(entity_count) FROM manifest_files"
+                " WHERE source = ? AND pipeline = ? GROUP BY report ORDER BY MIN(processed_at)",
+                (self.source, self.pipeline),
+            ).fetchall()
+
+    def format_stats(self):
+        """Format this run's change detection counters and the report set as one line."""
+        reports = self.report_set()
+        return (f"invoice manifest: new={self.counts[NEW]} changed={self.counts[CHANGED]} "
+                f"unchanged={self.counts['unchanged']} touched={self.counts['touched']} "
+                f"report_set={len(reports)} report(s) covering {sum(files for _, files, _ in reports)} file(s)")
+
+    def close(self):
+        """Close the database; uncommitted invoices are simply processed again next run."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,64 @@
+"""
+Split multi-invoice batch files into one sub-document per invoice.
+Files under data/invoices hold "Invoice #1..#N" sections; each section is sent to
+the model as its own document and entity offsets are mapped back into the
+original file afterwards.
+"""
+
+import re
+
+# Start of an invoice section inside a batch file, e.g. "Invoice #3"
+INVOICE_BOUNDARY = re.compile(r"^Invoice #\d+[ \t]*$", re.MULTILINE)
+
+
+def shard_invoice(invoice):
+    """
+    Split one invoice file at invoice boundaries.
+
+    Each sub-document keeps the source file_name and carries "offset", the position
+    of its text inside the original file, "shard", its index within the file, and
+    "shard_count", the number of sub-documents the file was split into.
+    Text before the first boundary (the batch title) is dropped. Files without
+    boundaries are returned as a single sub-document with offset 0.
+
+    Returns:
+        list: Sub-document dicts.
+    """
+    content = invoice["content"]
+    starts = [match.start() for match in INVOICE_BOUNDARY.finditer(content)]
+    if len(starts) < 2:
+        return [dict(invoice, offset=invoice.get("offset", 0), shard=0, shard_count=1)]
+
+    base_offset = invoice.get("offset", 0)
+    ends = starts[1:] + [len(content)]
+    shards = []
+    for start, end in zip(starts, ends):
+        text = content[start:end].rstrip()
+        shards.append(dict(invoice, content=text, offset=base_offset + start, shard=len(shards)))
+    for shard in shards:
+        shard["shard_count"] = len(shards)
+    return shards
+
+
+def shard_invoices(invoices):
+    """Lazily yield the sub-documents of every invoice in an iterable."""
+    for invoice in invoices:
+        yield from shard_invoice(invoice)
+
+
+def remap_entities(entities, base_offset):
+    """
+    Shift entity offsets from sub-document coordinates back into the source file.
+
+    Returns new entity dicts; the inputs (which may be shared with the result
+    cache) are left untouched.
+    """
+    if not base_offset:
+        return entities
+    remapped = []
+    for entity in entities:
+        entity = dict(entity)
+        if entity.get("offset", -1) >= 0:
+            entity["offset"] += base_offset
+        remapped.append(entity)
+    return remapped
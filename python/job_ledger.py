@@ -0,0 +1,210 @@
+"""
+Durable per-run ledger of document states for resumable batch runs.
+Every document of a run is recorded in a local SQLite file as it moves from
+submitted (with its analyze-text job URL) to completed (with its entities) or
+failed. A restarted run with the same run id re-attaches to jobs that were still
+in flight, replays completed documents from the ledger and only sends the
+remainder to the model, so finished work is never paid for twice.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+PENDING = "pending"
+SUBMITTED = "submitted"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Seconds a write waits for another process's write lock (sharded workers share the file)
+BUSY_TIMEOUT_SECONDS = 30.0
+
+
+def document_key(invoice):
+    """Ledger key of an invoice or sub-document: its file name plus shard index."""
+    if "ledger_key" in invoice:
+        return invoice["ledger_key"]
+    if invoice.get("shard_count", 1) > 1:
+        return f"{invoice['file_name']}#{invoice.get('shard', 0)}"
+    return invoice["file_name"]
+
+
+def _content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class JobLedger:
+    """SQLite-backed record of each document's state within one run."""
+
+    # Completed/failed documents buffered in memory between writes; submissions are written immediately
+    COMMIT_INTERVAL = 100
+
+    def __init__(self, path, run_id):
+        """
+        Args:
+            path (str): SQLite file location. Parent directories are created.
+            run_id (str): Identifies the run; pass the same id to resume it.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.run_id = run_id
+        self.reused = 0
+        self.reattached_jobs = 0
+        self._finished = []
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ledger_documents ("
+            " run_id TEXT NOT NULL,"
+            " doc_key TEXT NOT NULL,"
+            " file_name TEXT NOT NULL,"
+            " content_hash TEXT,"
+            " state TEXT NOT NULL,"
+            " job_url TEXT,"
+            " job_doc_id TEXT,"
+            " entities TEXT,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (run_id, doc_key))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ledger_documents_state ON ledger_documents (run_id, state)"
+        )
+        self._conn.commit()
+
+    def _flush(self):
+        """Write buffered completions in one short transaction. Call with the lock held."""
+        if not self._finished:
+            return
+        # Buffering in memory rather than in an open transaction keeps the write lock,
+        # which other shard processes wait on, held only for the duration of this write
+        self._conn.executemany(
+            "INSERT INTO ledger_documents (run_id, doc_key, file_name, content_hash, state, entities, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (run_id, doc_key) DO UPDATE SET"
+            " state = excluded.state, entities = excluded.entities, updated_at = excluded.updated_at,"
+            " content_hash = COALESCE(excluded.content_hash, content_hash)",
+            self._finished,
+        )
+        self._conn.commit()
+        self._finished = []
+
+    def lookup(self, invoice):
+        """
+        Return (state, entities) recorded for invoice, or (PENDING, None) if the
+        document is unknown or its text changed since it was recorded.
+        """
+        with self._lock:
+            self._flush()
+            row = self._conn.execute(
+                "SELECT state, content_hash, entities FROM ledger_documents WHERE run_id = ? AND doc_key = ?",
+                (self.run_id, document_key(invoice)),
+            ).fetchone()
+        if row is None:
+            return PENDING, None
+        state, content_hash, entities = row
+        if content_hash and content_hash != _content_hash(invoice["content"]):
+            return PENDING, None
+        return state, json.loads(entities) if entities is not None else None
+
+    def mark_submitted(self, job_location, id_map):
+        """Record that the documents of a job (id_map: job document id -> invoice) were submitted."""
+        now = time.time()
+        rows = [
+            (self.run_id, document_key(invoice), invoice["file_name"], _content_hash(invoice["content"]),
+             SUBMITTED, job_location, doc_id, now)
+            for doc_id, invoice in id_map.items()
+        ]
+        with self._lock:
+            self._flush()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO ledger_documents"
+                " (run_id, doc_key, file_name, content_hash, state, job_url, job_doc_id, entities, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, NULL, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def _finish(self, invoice, state, entities):
+        content_hash = _content_hash(invoice["content"]) if "content" in invoice else None
+        with self._lock:
+            self._finished.append(
+                (self.run_id, document_key(invoice), invoice["file_name"], content_hash, state,
+                 json.dumps(entities) if entities is not None else None, time.time()))
+            if len(self._finished) >= self.COMMIT_INTERVAL:
+                self._flush()
+
+    def mark_completed(self, invoice, entities):
+        """Record the parsed entities of a finished document."""
+        self._finish(invoice, COMPLETED, entities)
+
+    def mark_failed(self, invoice):
+        """Record that a document's job failed; a resumed run will retry it."""
+        self._finish(invoice, FAILED, None)
+
+    def in_flight_jobs(self):
+        """
+        Jobs submitted by an earlier attempt of this run that never reported back.
+
+        Returns:
+            list: {"location", "id_map"} dicts, where id_map maps job document ids to
+                  stand-in invoices carrying "file_name" and "ledger_key".
+        """
+        with self._lock:
+            self._flush()
+            rows = self._conn.execute(
+                "SELECT job_url, job_doc_id, doc_key, file_name FROM ledger_documents"
+                " WHERE run_id = ? AND state = ? ORDER BY job_url",
+                (self.run_id, SUBMITTED),
+            ).fetchall()
+        jobs = {}
+        for job_url, doc_id, doc_key, file_name in rows:
+            jobs.setdefault(job_url, {})[doc_id] = {"file_name": file_name, "ledger_key": doc_key}
+        self.reattached_jobs += len(jobs)
+        return [{"location": job_url, "id_map": id_map} for job_url, id_map in jobs.items()]
+
+    def split_completed(self, invoices, done):
+        """
+        Filter out documents this run already completed.
+
+        Completed documents are appended to done as (invoice, entities) and None is
+        yielded in their place (see result_cache.split_cached); pending, failed and
+        changed documents are yielded for processing. Incoming Nones are passed on.
+        """
+        for invoice in invoices:
+            if invoice is None:
+                yield None
+                continue
+            state, entities = self.lookup(invoice)
+            if state == COMPLETED:
+                self.reused += 1
+                done.append((invoice, entities))
+                yield None
+            else:
+                yield invoice
+
+    def counts(self):
+        """Return {state: number of documents} for this run."""
+        with self._lock:
+            self._flush()
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM ledger_documents WHERE run_id = ? GROUP BY state", (self.run_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def format_stats(self):
+        """Format ledger counters as a single printable line."""
+        counts = self.counts()
+        return (f"job ledger [{self.run_id}]: completed={counts.get(COMPLETED, 0)} failed={counts.get(FAILED, 0)} "
+                f"in_flight={counts.get(SUBMITTED, 0)} reused={self.reused} reattached_jobs={self.reattached_jobs}")
+
+    def close(self):
+        """Write outstanding completions and close the database."""
+        with self._lock:
+            self._flush()
+            self._conn.close()
@@ -0,0 +1,386 @@
+"""
+Shared helpers for the asynchronous Language service analyze-text jobs API.
+Packs many invoices into a single CustomEntityRecognition job, submits it,
+polls the operation-location and maps per-document results back to file names.
+Job bodies are parsed once by response_parser into per-document entity records.
+"""
+
+import heapq
+import time
+import requests
+from metrics import STAGE_BATCH_BUILD, STAGE_JOB, STAGE_PARSE, STAGE_POLL, STAGE_QUEUE_WAIT, STAGE_SUBMIT, registry
+from polling import PollingPolicy, parse_retry_after
+from response_parser import read_job_response
+
+
+def pack_invoices_into_jobs(invoices, max_documents, max_characters):
+    """
+    Group invoices into batches that fit into a single analyze-text job.
+
+    A batch is closed as soon as adding the next invoice would exceed either the
+    per-job document count or the combined character budget. An invoice that is
+    larger than the character budget on its own is sent as a single-document job.
+    A None item yields an empty batch without closing the current one, handing
+    control back to the consumer (see run_batched_jobs).
+
+    Args:
+        invoices (iterable): Dicts with "file_name" and "content" keys.
+        max_documents (int): Maximum number of documents per job.
+        max_characters (int): Maximum combined text length per job.
+
+    Yields:
+        list: Invoices to submit together in one job.
+    """
+    batch = []
+    batch_characters = 0
+
+    for invoice in invoices:
+        if invoice is None:
+            yield []
+            continue
+        length = len(invoice["content"])
+        if batch and (len(batch) >= max_documents or batch_characters + length > max_characters):
+            yield batch
+            batch = []
+            batch_characters = 0
+        batch.append(invoice)
+        batch_characters += length
+
+    if batch:
+        yield batch
+
+
+def build_job_payload(batch, project_name, deployment_name, language="en"):
+    """
+    Build the analyze-text job payload for a batch of invoices.
+
+    Document ids are positional within the job so they stay unique even when
+    two invoices share the same file name stem.
+
+    Returns:
+        tuple: (payload dict, dict mapping document id -> invoice)
+    """
+    documents = []
+    id_map = {}
+    for index, invoice in enumerate(batch):
+        doc_id = str(index)
+        id_map[doc_id] = invoice
+        documents.append({
+            "id": doc_id,
+            "language": language,
+            "text": invoice["content"]
+        })
+
+    if len(batch) == 1:
+        display_name = f"Entity extraction for {batch[0]['file_name']}"
+    else:
+        display_name = f"Entity extraction for {len(batch)} invoices"
+
+    payload = {
+        "displayName": display_name,
+        "analysisInput": {
+            "documents": documents
+        },
+        "tasks": [
+            {
+                "kind": "CustomEntityRecognition",
+                "taskName": "Entity Recognition",
+                "parameters": {
+                    "projectName": project_name,
+                    "deploymentName": deployment_name
+                }
+            }
+        ]
+    }
+    return payload, id_map
+
+
+# Per-job end-to-end latency (submission to final status), time spent queued on the
+# service (submission to the first poll that no longer reports "notStarted") and job counters
+job_latency = registry.stage(STAGE_JOB, "analyze-text job latency")
+job_queue_wait = registry.stage(STAGE_QUEUE_WAIT, "analyze-text job queue wait")
+jobs_finished = registry.counter("jobs", "Analyze-text jobs that reached a final state.")
+job_polls = registry.counter("job_polls", "Job status requests.")
+job_timeouts = registry.counter("job_timeouts", "Jobs abandoned after the polling deadline.")
+throttled_requests = registry.counter("throttled_requests", "Requests answered with HTTP 429.")
+
+
+def submit_job(endpoint, api_version, api_key, payload, session=None, limiter=None, max_throttle_retries=5):
+    """
+    Submit an analyze-text job through session (the requests module if not given).
+
+    Each attempt first takes a token from limiter. A 429 response is retried up to
+    max_throttle_retries times after Retry-After, slowing the limiter down.
+
+    Returns:
+        tuple: (operation-location URL or None if submission failed,
+                Retry-After seconds requested by the service or None)
+    """
+    url = f"{endpoint}language/analyze-text/jobs?api-version={api_version}"
+    headers = {
+        "Ocp-Apim-Subscription-Key": api_key,
+        "Content-Type": "application/json"
+    }
+
+    throttle_retries = 0
+    while True:
+        if limiter:
+            limiter.acquire()
+        with registry.time_stage(STAGE_SUBMIT):
+            response = (session or requests).post(url, headers=headers, json=payload)
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if response.status_code != 429 or throttle_retries >= max_throttle_retries:
+            break
+        throttle_retries += 1
+        throttled_requests.inc()
+        _record_throttle(limiter, retry_after)
+
+    if response.status_code != 202:
+        print(f"  [ERROR] Job submission failed: {response.status_code}")
+        print(f"  [ERROR] Response body: {response.text}")
+        return None, None
+
+    if limiter:
+        limiter.record_success()
+    return response.headers.get('operation-location'), retry_after
+
+
+def _record_throttle(limiter, retry_after):
+    """Slow the limiter down after a 429, or just wait if no limiter is in use."""
+    if limiter:
+        limiter.record_throttle(retry_after)
+    else:
+        time.sleep(retry_after if retry_after is not None else 1.0)
+
+
+def check_job(job_location, api_key, session=None, limiter=None):
+    """
+    Fetch the current state of an analyze-text job once through session.
+
+    The request takes a token from limiter first; a 429 slows the limiter down and
+    is reported like any other failed status request.
+
+    Returns:
+        tuple: (status, results, retry_after) where status is the service job status
+               (or None if the status request itself failed), results is the parsed
+               response_parser.JobResponse once the job has succeeded and retry_after
+               is the Retry-After header in seconds, if present.
+    """
+    if limiter:
+        limiter.acquire()
+    with registry.time_stage(STAGE_POLL):
+        # Streamed so large result bodies can be parsed straight off the socket
+        status_response = (session or requests).get(job_location, headers={
+            "Ocp-Apim-Subscription-Key": api_key
+        }, stream=True)
+    with status_response:
+        return _read_job_status(status_response, job_location, limiter)
+
+
+def _read_job_status(status_response, job_location, limiter):
+    """Interpret one job status response for check_job."""
+    retry_after = parse_retry_after(status_response.headers.get('Retry-After'))
+
+    if status_response.status_code == 429:
+        throttled_requests.inc()
+        if limiter:
+            limiter.record_throttle(retry_after)
+    if status_response.status_code in (404, 410):
+        # Unknown or expired job (e.g. re-attaching after the service dropped it): it will never finish
+        print(f"  [ERROR] Job not found: {job_location}")
+        return 'failed', None, retry_after
+    if status_response.status_code != 200:
+        return None, None, retry_after
+    if limiter:
+        limiter.record_success()
+
+    with registry.time_stage(STAGE_PARSE):
+        result = read_job_response(status_response)
+    job_status = result.status
+
+    if job_status == 'succeeded':
+        return job_status, result, retry_after
+    elif job_status == 'failed':
+        print(f"  [ERROR] Job failed: {result.job_errors}")
+
+    return job_status, None, retry_after
+
+
+def _record_queue_wait(job_status, submitted_at, started):
+    """
+    Record the queue wait once a job is first seen past "notStarted".
+
+    Returns:
+        bool: Whether the job has been seen started (the new value of started).
+    """
+    if started or job_status in (None, 'notStarted'):
+        return started
+    job_queue_wait.record(time.monotonic() - submitted_at)
+    return True
+
+
+def _finish_job(submitted_at, polls, timed_out=False):
+    """Record latency and poll counters for a job that reached a final state."""
+    job_latency.record(time.monotonic() - submitted_at)
+    jobs_finished.inc()
+    job_polls.inc(polls)
+    if timed_out:
+        job_timeouts.inc()
+
+
+def wait_for_job(job_location, api_key, polling_policy, submitted_at=None, retry_after=None, session=None,
+                 limiter=None):
+    """
+    Block until a single analyze-text job finishes, following the polling policy.
+
+    Returns:
+        JobResponse: Parsed per-document entity records and errors, or None if the
+                     job failed or exceeded the policy deadline.
+    """
+    submitted_at = time.monotonic() if submitted_at is None else submitted_at
+    polls = 0
+    started = False
+
+    while True:
+        time.sleep(polling_policy.next_delay(polls, retry_after))
+        job_status, results, retry_after = check_job(job_location, api_key, session, limiter)
+        polls += 1
+        started = _record_queue_wait(job_status, submitted_at, started)
+
+        if job_status == 'succeeded':
+            _finish_job(submitted_at, polls)
+            return results
+        elif job_status in ('failed', 'cancelled'):
+            _finish_job(submitted_at, polls)
+            return None
+        elif polling_policy.expired(submitted_at):
+            print(f"  [ERROR] Job polling timed out: {job_location}")
+            _finish_job(submitted_at, polls, timed_out=True)
+            return None
+
+
+def format_job_metrics(polling_policy):
+    """Format per-job latency and poll counts together with the polling strategy."""
+    jobs = jobs_finished.value
+    average_polls = job_polls.value / jobs if jobs else 0
+    return (f"{job_latency.format_summary()}\n"
+            f"  polls/job={average_polls:.1f} timeouts={job_timeouts.value}\n"
+            f"  strategy: {polling_policy.describe()}")
+
+
+def _map_job_results(id_map, results):
+    """Yield (invoice, entity records or None) for every document in a finished job."""
+    documents = results.documents if results else {}
+    if results:
+        for doc_id, error in results.errors.items():
+            if doc_id in id_map:
+                print(f"  [ERROR] Document {id_map[doc_id]['file_name']} failed: {error}")
+
+    for doc_id, invoice in id_map.items():
+        yield invoice, documents.get(doc_id)
+
+
+def run_batched_jobs(invoices, endpoint, api_version, api_key, project_name, deployment_name,
+                     max_documents, max_characters, max_in_flight=1, polling_policy=None, session=None,
+                     submit_limiter=None, poll_limiter=None, on_submit=None, attached_jobs=None):
+    """
+    Extract entities for many invoices using as few analyze-text jobs as possible.
+
+    A single scheduler loop keeps up to max_in_flight jobs running on the service,
+    polls whichever job is due next and streams results back as soon as each job
+    finishes, so completions may arrive out of input order. Invoices are pulled
+    from the input iterable only when a job slot frees up. Poll timing follows
+    polling_policy (a default PollingPolicy if not given) and all HTTP calls go
+    through session so connections are reused across jobs. Submissions and status
+    polls are paced by submit_limiter and poll_limiter respectively.
+
+    None items in invoices are not submitted; each is answered right away with a
+    (None, None) pair. A caller that splits off invoices needing no job (cache hits
+    and the like) yields None for each one and emits its result on that pair, so
+    such results stream out instead of piling up until the next job finishes.
+
+    on_submit(job_location, id_map) is called once a job is accepted, and
+    attached_jobs ({"location", "id_map"} dicts) are jobs submitted earlier, e.g. by
+    an interrupted run, that are polled alongside the new ones.
+
+    Yields:
+        tuple: (invoice, entity records or None) for every input invoice, with
+               records as built by response_parser.parse_entities. None means the
+               job or the individual document failed. (None, None) answers a None item.
+    """
+    polling_policy = polling_policy or PollingPolicy()
+    batches = pack_invoices_into_jobs(invoices, max_documents, max_characters)
+    batches_exhausted = False
+    # Heap of (next_poll_at, sequence, job) so the earliest due job is polled first
+    in_flight = []
+    sequence = 0
+    for attached in attached_jobs or ():
+        job = {"location": attached["location"], "id_map": attached["id_map"], "polls": 0,
+               "submitted_at": time.monotonic(), "started": True}
+        heapq.heappush(in_flight, (time.monotonic(), sequence, job))
+        sequence += 1
+
+    while True:
+        while not batches_exhausted and len(in_flight) < max_in_flight:
+            batch = next(batches, None)
+            if batch is None:
+                batches_exhausted = True
+                break
+            if not batch:
+                yield None, None
+                continue
+
+            with registry.time_stage(STAGE_BATCH_BUILD):
+                payload, id_map = build_job_payload(batch, project_name, deployment_name)
+            print(f"  Submitting job with {len(batch)} document(s)...")
+
+            submitted_at = time.monotonic()
+            try:
+                job_location, retry_after = submit_job(endpoint, api_version, api_key, payload, session,
+                                                       limiter=submit_limiter)
+            except requests.exceptions.RequestException as err:
+                print(f"  [ERROR] API request error for job: {err}")
+                job_location, retry_after = None, None
+
+            if not job_location:
+                yield from _map_job_results(id_map, None)
+                continue
+            if on_submit:
+                on_submit(job_location, id_map)
+
+            job = {"location": job_location, "id_map": id_map, "polls": 0, "submitted_at": submitted_at,
+                   "started": False}
+            next_poll_at = time.monotonic() + polling_policy.next_delay(0, retry_after)
+            heapq.heappush(in_flight, (next_poll_at, sequence, job))
+            sequence += 1
+
+        if not in_flight:
+            return
+
+        next_poll_at, _, job = heapq.heappop(in_flight)
+        delay = next_poll_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        try:
+            job_status, results, retry_after = check_job(job["location"], api_key, session, poll_limiter)
+        except requests.exceptions.RequestException as err:
+            print(f"  [ERROR] API request error while polling job: {err}")
+            job_status, results, retry_after = None, None, None
+
+        job["polls"] += 1
+        job["started"] = _record_queue_wait(job_status, job["submitted_at"], job["started"])
+        if job_status == 'succeeded':
+            _finish_job(job["submitted_at"], job["polls"])
+            yield from _map_job_results(job["id_map"], results)
+        elif job_status in ('failed', 'cancelled'):
+            _finish_job(job["submitted_at"], job["polls"])
+            yield from _map_job_results(job["id_map"], None)
+        elif polling_policy.expired(job["submitted_at"]):
+            print(f"  [ERROR] Job polling timed out: {job['location']}")
+            _finish_job(job["submitted_at"], job["polls"], timed_out=True)
+            yield from _map_job_results(job["id_map"], None)
+        else:
+            next_poll_at = time.monotonic() + polling_policy.next_delay(job["polls"], retry_after)
+            heapq.heappush(in_flight, (next_poll_at, sequence, job))
+            sequence += 1
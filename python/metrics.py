@@ -0,0 +1,264 @@
+"""
+Lightweight in-process metrics for the NER pipelines.
+Collects latency samples so runs can report p50/p95/p99 timings, plus per-stage
+timers and counters (load, batch build, submit, queue wait, poll, parse, report
+write, upload) that can be exported as Prometheus text or OpenTelemetry metrics.
+"""
+
+import math
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Pipeline stages timed through registry.time_stage()
+STAGE_LOAD = "load"
+STAGE_BATCH_BUILD = "batch_build"
+STAGE_SUBMIT = "submit"
+STAGE_QUEUE_WAIT = "queue_wait"
+STAGE_JOB = "job"
+STAGE_POLL = "poll"
+STAGE_RECOGNIZE = "recognize"
+STAGE_PARSE = "parse"
+STAGE_REPORT_WRITE = "report_write"
+STAGE_UPLOAD = "upload"
+# Arrival of an invoice to its results being written (extraction_daemon)
+STAGE_END_TO_END = "end_to_end"
+
+# Samples each timer keeps for percentiles; count, sum and max stay exact
+RESERVOIR_SIZE = 4096
+
+
+def _nearest_rank(sorted_samples, percent):
+    """Return the nearest-rank percentile of an already sorted, non-empty list."""
+    rank = max(1, math.ceil(percent / 100 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+class LatencyStats:
+    """
+    Collects latency samples (in seconds) and reports percentiles.
+
+    Percentiles come from a uniform reservoir of at most `capacity` samples, so
+    memory and the cost of a summary stay bounded however long the process runs;
+    count, mean and max are exact.
+    """
+
+    def __init__(self, name, capacity=RESERVOIR_SIZE):
+        self.name = name
+        self.capacity = capacity
+        self.count = 0
+        self.total = 0.0
+        self.max = None
+        self._samples = []
+        self._random = random.Random(0)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        """Record a single latency sample."""
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            if self.max is None or seconds > self.max:
+                self.max = seconds
+            if len(self._samples) < self.capacity:
+                self._samples.append(seconds)
+                return
+            index = self._random.randrange(self.count)
+            if index < self.capacity:
+                self._samples[index] = seconds
+
+    def percentile(self, percent):
+        """Return the nearest-rank percentile, or None if nothing was recorded."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return _nearest_rank(samples, percent)
+
+    def summary(self):
+        """Return count, mean and p50/p95/p99/max latency as a dict."""
+        with self._lock:
+            samples = sorted(self._samples)
+            count, total, maximum = self.count, self.total, self.max
+        if not samples:
+            return {"count": 0}
+        return {
+            "count": count,
+            "mean": total / count,
+            "p50": _nearest_rank(samples, 50),
+            "p95": _nearest_rank(samples, 95),
+            "p99": _nearest_rank(samples, 99),
+            "max": maximum,
+        }
+
+    def reset(self):
+        """Discard all recorded samples."""
+        with self._lock:
+            self._samples = []
+            self.count = 0
+            self.total = 0.0
+            self.max = None
+
+    def format_summary(self):
+        """Format the summary as a single printable line."""
+        summary = self.summary()
+        if not summary["count"]:
+            return f"{self.name}: no samples"
+        return (f"{self.name}: n={summary['count']} mean={summary['mean']:.2f}s "
+                f"p50={summary['p50']:.2f}s p95={summary['p95']:.2f}s "
+                f"p99={summary['p99']:.2f}s max={summary['max']:.2f}s")
+
+
+class Counter:
+    """Monotonic, thread-safe counter."""
+
+    def __init__(self, name, description=""):
+        self.name = name
+        self.description = description
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def reset(self):
+        with self._lock:
+            self.value = 0
+
+
+class MetricsRegistry:
+    """Named stage timers and counters shared by every module in the process."""
+
+    def __init__(self):
+        self._stages = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name, label=None):
+        """Get (or create) the LatencyStats timer for a pipeline stage."""
+        stats = self._stages.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self._stages.setdefault(name, LatencyStats(label or name))
+        return stats
+
+    def counter(self, name, description=""):
+        """Get (or create) a counter."""
+        counter = self._counters.get(name)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(name, Counter(name, description))
+        return counter
+
+    @contextmanager
+    def time_stage(self, name):
+        """Time the enclosed block and record it under stage name."""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage(name).record(time.perf_counter() - started_at)
+
+    def snapshot(self):
+        """Return {"stages": {name: summary}, "counters": {name: value}}."""
+        return {
+            "stages": {name: stats.summary() for name, stats in list(self._stages.items())},
+            "counters": {name: counter.value for name, counter in list(self._counters.items())},
+        }
+
+    def reset(self):
+        """Clear all samples and counters (the metric objects themselves are kept)."""
+        for stats in list(self._stages.values()):
+            stats.reset()
+        for counter in list(self._counters.values()):
+            counter.reset()
+
+    def format_summary(self, indent=""):
+        """Format every stage timer (in milliseconds) and non-zero counter, one per line."""
+        lines = []
+        for name, stats in sorted(self._stages.items()):
+            summary = stats.summary()
+            if not summary["count"]:
+                continue
+            lines.append(f"{indent}{name}: n={summary['count']} total={summary['mean'] * summary['count'] * 1000:.1f}ms "
+                         f"p50={summary['p50'] * 1000:.2f}ms p95={summary['p95'] * 1000:.2f}ms "
+                         f"p99={summary['p99'] * 1000:.2f}ms")
+        counters = " ".join(f"{name}={counter.value:g}" for name, counter in sorted(self._counters.items())
+                            if counter.value)
+        if counters:
+            lines.append(f"{indent}counters: {counters}")
+        return "\n".join(lines)
+
+    def to_prometheus(self, prefix="ner"):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent per pipeline stage.",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for name, stats in sorted(self._stages.items()):
+            summary = stats.summary()
+            if not summary["count"]:
+                continue
+            for key, quantile in (("p50", "0.5"), ("p95", "0.95"), ("p99", "0.99")):
+                lines.append(f'{prefix}_stage_seconds{{stage="{name}",quantile="{quantile}"}} {summary[key]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {summary["mean"] * summary["count"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {summary["count"]}')
+
+        for name, counter in sorted(self._counters.items()):
+            metric = f"{prefix}_{name}_total"
+            if counter.description:
+                lines.append(f"# HELP {metric} {counter.description}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {counter.value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, prefix="ner"):
+        """Write to_prometheus() atomically, e.g. for the node_exporter textfile collector."""
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus(prefix))
+        os.replace(temp_path, path)
+
+    def register_opentelemetry(self, meter=None, prefix="ner"):
+        """
+        Publish stages and counters through OpenTelemetry observable instruments.
+
+        Requires the optional opentelemetry-api package; the SDK and exporter are
+        configured by the application as usual.
+
+        Args:
+            meter: OpenTelemetry Meter; defaults to the global meter provider's.
+        """
+        try:
+            from opentelemetry import metrics as otel_metrics
+        except ImportError:
+            raise RuntimeError("OpenTelemetry export requires the 'opentelemetry-api' package")
+
+        meter = meter or otel_metrics.get_meter("ner_pipeline")
+
+        def observe_counters(options):
+            return [otel_metrics.Observation(counter.value, {"name": name})
+                    for name, counter in list(self._counters.items())]
+
+        def observe_stage_counts(options):
+            return [otel_metrics.Observation(stats.summary()["count"], {"stage": name})
+                    for name, stats in list(self._stages.items())]
+
+        def observe_stage_p95(options):
+            observations = []
+            for name, stats in list(self._stages.items()):
+                p95 = stats.percentile(95)
+                if p95 is not None:
+                    observations.append(otel_metrics.Observation(p95, {"stage": name}))
+            return observations
+
+        meter.create_observable_counter(f"{prefix}.events", callbacks=[observe_counters])
+        meter.create_observable_counter(f"{prefix}.stage.count", callbacks=[observe_stage_counts])
+        meter.create_observable_gauge(f"{prefix}.stage.p95", callbacks=[observe_stage_p95], unit="s")
+
+
+# Process-wide registry used by all pipeline modules
+registry = MetricsRegistry()
@@ -0,0 +1,366 @@
+"""
+Local stand-in for the Azure Language service.
+Lets the NER pipelines run end to end without a live endpoint:
+- analyze-text jobs are accepted with 202 + operation-location, report "running"
+  until their latency has elapsed, then return regex-based CustomEntityRecognition
+  results;
+- synchronous entity recognition (what TextAnalyticsClient.recognize_entities
+  calls) answers immediately after a request latency, enforcing the 5 document
+  per request limit.
+Latencies are drawn from a fixed, uniform, exponential or lognormal distribution.
+It can also enforce a requests-per-second quota or inject random 429 responses
+(with Retry-After) to exercise client-side throttling.
+
+Usage:
+    python3 mock_language_service.py --port 8765 --job-latency 1.5
+    python3 mock_language_service.py --job-latency 1.0 --latency-distribution lognormal --latency-spread 0.6
+    python3 mock_language_service.py --max-rps 5 --throttle-probability 0.05
+    LANGUAGE_SERVICE_ENDPOINT=http://127.0.0.1:8765/ python3 fine_tuned_ner.py
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# Simple patterns standing in for the trained model's entity categories
+ENTITY_PATTERNS = [
+    ("InvoiceNumber", re.compile(r"INV-[\d-]+")),
+    ("Date", re.compile(r"\d{4}-\d{2}-\d{2}")),
+    ("Amount", re.compile(r"\$[\d,]+\.\d{2}")),
+    ("CustomerName", re.compile(r"(?<=Customer: )[^\n]+")),
+]
+
+
+# Categories the prebuilt (standard) model reports for the same patterns: (category, subcategory)
+STANDARD_CATEGORIES = {
+    "Date": ("DateTime", "Date"),
+    "Amount": ("Quantity", "Currency"),
+    "CustomerName": ("Organization", None),
+}
+
+# Service limit for synchronous entity recognition requests
+MAX_DOCUMENTS_PER_REQUEST = 5
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+def make_latency_sampler(mean, distribution="fixed", spread=0.5, rng=None):
+    """
+    Build a function returning latencies (seconds) drawn from a distribution.
+
+    Args:
+        mean (float): Fixed value, centre of the uniform range, mean of the
+                      exponential or median of the lognormal distribution.
+        distribution (str): One of LATENCY_DISTRIBUTIONS.
+        spread (float): Relative half-width for "uniform", sigma for "lognormal".
+        rng (random.Random): Source of randomness, for reproducible runs.
+    """
+    rng = rng or random.Random()
+    if mean <= 0 or distribution == "fixed":
+        return lambda: max(0.0, mean)
+    if distribution == "uniform":
+        return lambda: rng.uniform(mean * (1 - spread), mean * (1 + spread))
+    if distribution == "exponential":
+        return lambda: rng.expovariate(1 / mean)
+    if distribution == "lognormal":
+        return lambda: rng.lognormvariate(math.log(mean), spread)
+    raise ValueError(f"Unknown latency distribution: {distribution}")
+
+
+def recognize_mock_entities(text):
+    """Return service-shaped entity dicts for every pattern match in text."""
+    entities = []
+    for category, pattern in ENTITY_PATTERNS:
+        for match in pattern.finditer(text):
+            entities.append({
+                "text": match.group(0),
+                "category": category,
+                "offset": match.start(),
+                "length": match.end() - match.start(),
+                "confidenceScore": 0.95
+            })
+    entities.sort(key=lambda entity: entity["offset"])
+    return entities
+
+
+def recognize_standard_entities(text):
+    """Return prebuilt-model shaped entities (DateTime, Quantity, Organization)."""
+    entities = []
+    for entity in recognize_mock_entities(text):
+        if entity["category"] not in STANDARD_CATEGORIES:
+            continue
+        category, subcategory = STANDARD_CATEGORIES[entity["category"]]
+        entity = dict(entity, category=category, confidenceScore=0.8)
+        if subcategory:
+            entity["subcategory"] = subcategory
+        entities.append(entity)
+    return entities
+
+
+class MockLanguageService:
+    """In-memory job store shared by all request handler threads."""
+
+    def __init__(self, job_latency=1.0, max_requests_per_second=None, throttle_probability=0.0, retry_after=1.0,
+                 request_latency=0.0, latency_distribution="fixed", latency_spread=0.5, retain_jobs=True,
+                 seed=None):
+        """
+        Args:
+            job_latency (float): Typical seconds before a job reports succeeded.
+            request_latency (float): Typical seconds a synchronous recognition request takes.
+            latency_distribution (str): How job and request latencies vary, see make_latency_sampler.
+            latency_spread (float): Spread parameter of the distribution.
+            retain_jobs (bool): Keep finished jobs queryable. Pass False for long benchmark
+                                runs so memory does not grow with the number of jobs.
+            seed (int): Seed for latency and throttling randomness.
+            max_requests_per_second (float): Quota across all requests; requests over
+                                             it get a 429. None means unlimited.
+            throttle_probability (float): Chance of answering any request with a 429.
+            retry_after (float): Retry-After value sent with injected 429s.
+        """
+        self.job_latency = job_latency
+        self.request_latency = request_latency
+        self.retain_jobs = retain_jobs
+        self._random = random.Random(seed)
+        self._sample_job_latency = make_latency_sampler(job_latency, latency_distribution, latency_spread, self._random)
+        self._sample_request_latency = make_latency_sampler(
+            request_latency, latency_distribution, latency_spread, self._random)
+        self.max_requests_per_second = max_requests_per_second
+        self.throttle_probability = throttle_probability
+        self.retry_after = retry_after
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.submitted_jobs = 0
+        self.status_requests = 0
+        self.recognition_requests = 0
+        self.throttled_requests = 0
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+
+    def should_throttle(self):
+        """Count a request against the quota and decide whether to answer 429."""
+        with self.lock:
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start = now
+                self._window_requests = 0
+            self._window_requests += 1
+            over_quota = (self.max_requests_per_second is not None
+                          and self._window_requests > self.max_requests_per_second)
+            if over_quota or self._random.random() < self.throttle_probability:
+                self.throttled_requests += 1
+                return True
+        return False
+
+    def create_job(self, payload):
+        job_id = str(uuid.uuid4())
+        with self.lock:
+            self.jobs[job_id] = {
+                "payload": payload,
+                "created_at": time.monotonic(),
+                "latency": self._sample_job_latency(),
+                "created_date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
+            self.submitted_jobs += 1
+        return job_id
+
+    def job_state(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            self.status_requests += 1
+        if job is None:
+            return None
+
+        state = {
+            "jobId": job_id,
+            "createdDateTime": job["created_date"],
+            "displayName": job["payload"].get("displayName", ""),
+            "errors": [],
+        }
+        if time.monotonic() - job["created_at"] < job["latency"]:
+            state["status"] = "running"
+            state["tasks"] = {"completed": 0, "failed": 0, "inProgress": 1, "total": 1, "items": []}
+            return state
+
+        documents = [
+            {"id": document["id"], "entities": recognize_mock_entities(document["text"]), "warnings": []}
+            for document in job["payload"].get("analysisInput", {}).get("documents", [])
+        ]
+        if not self.retain_jobs:
+            with self.lock:
+                self.jobs.pop(job_id, None)
+        state["status"] = "succeeded"
+        state["tasks"] = {
+            "completed": 1, "failed": 0, "inProgress": 0, "total": 1,
+            "items": [{
+                "kind": "CustomEntityRecognitionLROResults",
+                "taskName": "Entity Recognition",
+                "status": "succeeded",
+                "results": {
+                    "documents": documents,
+                    "errors": [],
+                    "projectName": "mock",
+                    "deploymentName": "mock"
+                }
+            }]
+        }
+        return state
+
+    def recognize(self, documents):
+        """
+        Answer a synchronous entity recognition request after the request latency.
+
+        Returns:
+            tuple: (HTTP status, list of document results or an error body)
+        """
+        with self.lock:
+            self.recognition_requests += 1
+            latency = self._sample_request_latency()
+        if latency:
+            time.sleep(latency)
+        if len(documents) > MAX_DOCUMENTS_PER_REQUEST:
+            return 400, {"error": {
+                "code": "InvalidArgument",
+                "message": f"Batch request contains too many records. Max {MAX_DOCUMENTS_PER_REQUEST} records are permitted.",
+                "innererror": {"code": "InvalidDocumentBatch",
+                               "message": "Batch request contains too many records."},
+            }}
+        return 200, [
+            {"id": document["id"], "entities": recognize_standard_entities(document.get("text", "")), "warnings": []}
+            for document in documents
+        ]
+
+
+class _MockServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 overflows under the async engine's concurrent
+    # connects, stalling them on SYN retransmits
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def _make_handler(service):
+    class MockLanguageHandler(BaseHTTPRequestHandler):
+        # Keep-alive, so clients reuse pooled connections as they would against Azure
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out as separate writes; without TCP_NODELAY they wait on delayed ACKs
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, body, headers=None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_throttled(self):
+            self._send_json(429, {"error": {"code": "429", "message": "Rate limit is exceeded."}},
+                            headers={"Retry-After": f"{service.retry_after:g}"})
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if service.should_throttle():
+                self._send_throttled()
+                return
+
+            if path.rstrip("/") in ("/language/:analyze-text", "/text/analytics/v3.1/entities/recognition/general"):
+                self._recognize(path, payload)
+                return
+            if path.rstrip("/") != "/language/analyze-text/jobs":
+                self._send_json(404, {"error": {"code": "NotFound", "message": path}})
+                return
+
+            job_id = service.create_job(payload)
+            host = self.headers.get("Host", f"{self.server.server_address[0]}:{self.server.server_address[1]}")
+            location = f"http://{host}/language/analyze-text/jobs/{job_id}?api-version=mock"
+            self._send_json(202, {}, headers={"operation-location": location})
+
+        def _recognize(self, path, payload):
+            """Synchronous entity recognition in the Language API or Text Analytics v3.1 shape."""
+            if path.startswith("/language"):
+                documents = payload.get("analysisInput", {}).get("documents", [])
+            else:
+                documents = payload.get("documents", [])
+            status, body = service.recognize(documents)
+            if status != 200:
+                self._send_json(status, body)
+                return
+            results = {"documents": body, "errors": [], "modelVersion": "mock"}
+            if path.startswith("/language"):
+                self._send_json(200, {"kind": "EntityRecognitionResults", "results": results})
+            else:
+                self._send_json(200, results)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            job_id = path.rsplit("/", 1)[-1]
+            if service.should_throttle():
+                self._send_throttled()
+                return
+            state = service.job_state(job_id)
+            if state is None:
+                self._send_json(404, {"error": {"code": "NotFound", "message": job_id}})
+            else:
+                self._send_json(200, state)
+
+    return MockLanguageHandler
+
+
+def start_mock_language_service(host="127.0.0.1", port=0, job_latency=1.0, max_requests_per_second=None,
+                                throttle_probability=0.0, retry_after=1.0, **options):
+    """
+    Start the stand-in service on a background thread.
+    See MockLanguageService for the throttling arguments and further options
+    (request_latency, latency_distribution, latency_spread, retain_jobs, seed).
+
+    Returns:
+        tuple: (server, service, endpoint) where endpoint ends with "/" like
+               LANGUAGE_SERVICE_ENDPOINT. Call server.shutdown() to stop it.
+    """
+    service = MockLanguageService(job_latency=job_latency, max_requests_per_second=max_requests_per_second,
+                                  throttle_probability=throttle_probability, retry_after=retry_after, **options)
+    server = _MockServer((host, port), _make_handler(service))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    endpoint = f"http://{server.server_address[0]}:{server.server_address[1]}/"
+    return server, service, endpoint
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Language analyze-text jobs API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--job-latency", type=float, default=1.0, help="Seconds before a job reports succeeded")
+    parser.add_argument("--request-latency", type=float, default=0.0,
+                        help="Seconds a synchronous recognize_entities request takes")
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--latency-spread", type=float, default=0.5,
+                        help="Relative half-width (uniform) or sigma (lognormal)")
+    parser.add_argument("--max-rps", type=float, default=None, help="Requests per second before answering 429")
+    parser.add_argument("--throttle-probability", type=float, default=0.0, help="Chance of a random 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+
+    server, service, endpoint = start_mock_language_service(
+        args.host, args.port, args.job_latency, max_requests_per_second=args.max_rps,
+        throttle_probability=args.throttle_probability, retry_after=args.retry_after,
+        request_latency=args.request_latency, latency_distribution=args.latency_distribution,
+        latency_spread=args.latency_spread)
+    print(f"Mock Language service listening on {endpoint}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -4,31 +4,36 @@ This script runs both models on the same test invoices and generates a compariso
 showing the differences in entity extraction between the standard and fine-tuned models.
 """
 
-from dotenv import load_dotenv
 import os
-import csv
-import json
-import requests
+import argparse
+import queue
+import threading
 import time
 from datetime import datetime
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
-from azure.storage.blob import BlobServiceClient
+from itertools import islice
+import pandas as pd
 from azure.ai.textanalytics import TextAnalyticsClient
 from azure.core.credentials import AzureKeyCredential
 from config import Config
+from entity_store import EntityStore
+from evaluation import STANDARD_CATEGORY_MAP, evaluate, format_curve, format_scores
+from http_client import format_pool_stats
+from invoice_loader import iter_invoice_source
+from invoice_sharding import remap_entities, shard_invoices
+from language_jobs import format_job_metrics, run_batched_jobs
+from metrics import registry
+from rate_limiter import JOB_POLL, JOB_SUBMIT, STANDARD, format_rate_limit_stats
+from report_sink import open_report_sink
+from standard_ner import CLIENT_RETRY_OPTIONS, AsyncEntityRecognizer, recognize_entities_batched, use_async_engine
+from synthetic_invoices import load_labels
 
-# Initialize configuration (automatically resolves Key Vault URI)
-Config.validate(strict=True)
-
-credential = DefaultAzureCredential()
-client_kv = Config.get_key_vault_client()
-
-# Get credentials from Key Vault
-language_service_key = client_kv.get_secret("language-service-key").value
-gpt_5_chat_key = client_kv.get_secret("gpt-5-chat-key").value
-gpt_5_chat_endpoint = client_kv.get_secret("gpt-5-chat-endpoint").value
-storage_connection_string = Config.get_storage_connection_string()
+# Key Vault secrets both models need; fetched together before the run starts
+REQUIRED_SECRETS = [
+    Config.LANGUAGE_SERVICE_KEY_SECRET,
+    Config.GPT_5_CHAT_KEY_SECRET,
+    Config.GPT_5_CHAT_ENDPOINT_SECRET,
+    Config.STORAGE_CONNECTION_STRING_SECRET,
+]
 
 # Fine-tuned model configuration
 LANGUAGE_SERVICE_ENDPOINT = Config.LANGUAGE_SERVICE_ENDPOINT
@@ -36,179 +41,336 @@ API_VERSION = Config.LANGUAGE_SERVICE_API_VERSION
 PROJECT_NAME = Config.AI_FOUNDRY_PROJECT_NAME
 DEPLOYMENT_NAME = Config.AI_FOUNDRY_DEPLOYMENT_NAME
 
-def fetch_invoices_from_local(test_invoices_dir="../data/test_invoices"):
-    """Fetch all test invoice files from local filesystem."""
-    try:
-        invoices = []
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        full_path = os.path.join(script_dir, test_invoices_dir)
-        
-        if not os.path.exists(full_path):
-            print(f"Error: Test invoices directory not found at {full_path}")
-            return []
-        
-        txt_files = sorted([f for f in os.listdir(full_path) if f.endswith('.txt')])
+# Per-invoice rows printed in the comparison report before it switches to the largest differences
+MAX_REPORT_ROWS = 50
+
+# Sentinel passed through the per-model invoice queues once the stream is exhausted
+_END_OF_STREAM = object()
+
+def _new_results(model_name):
+    # Entities accumulate in a columnar EntityStore (file name -> entities mapping)
+    return {
+        "model": model_name,
+        "entity_types": [],
+        "entities_by_invoice": EntityStore(),
+        "total_entities": 0
+    }
+
+def _record_entities(results, file_name, entities):
+    """Add one invoice's entities to a model results dict."""
+    results["entities_by_invoice"].add_document(file_name, entities)
+
+def _finalize_results(results):
+    store = results["entities_by_invoice"]
+    results["entity_types"] = store.categories
+    results["total_entities"] = store.entity_count
+    return results
+
+# ==================== STANDARD MODEL ====================
+def iter_standard_model(invoices):
+    """
+    Stream entities from the Azure standard NER model.
+    Yields (file_name, entities) for every invoice, with an empty list for invoices
+    that could not be processed even after bisecting their batch.
+    """
+    batch_size = Config.STANDARD_NER_BATCH_SIZE
+    async_recognizer = None
+    use_async, iterator = use_async_engine(
+        invoices, Config.STANDARD_NER_ENGINE, Config.STANDARD_NER_ASYNC_THRESHOLD)
+    iterator = iter(iterator)
+    
+    if use_async:
+        # Large corpus: run several recognize_entities requests concurrently
+        async_recognizer = AsyncEntityRecognizer(
+            Config.get_gpt_5_chat_endpoint(), Config.get_gpt_5_chat_key(),
+            batch_size=batch_size, concurrency=Config.STANDARD_NER_CONCURRENCY,
+            max_throttle_retries=Config.RATE_LIMIT_MAX_THROTTLE_RETRIES, limiter=Config.get_rate_limiter(STANDARD),
+            batch_sizer=Config.get_batch_sizer())
+        recognize = async_recognizer.recognize
+        batch_size = async_recognizer.window_size
+    else:
+        ta_credential = AzureKeyCredential(Config.get_gpt_5_chat_key())
+        client = TextAnalyticsClient(endpoint=Config.get_gpt_5_chat_endpoint(), credential=ta_credential,
+                                     transport=Config.get_http_transport(), **CLIENT_RETRY_OPTIONS)
+        batch_sizer = Config.get_batch_sizer()
+        recognize = lambda documents: recognize_entities_batched(
+            client, documents, batch_sizer, max_throttle_retries=Config.RATE_LIMIT_MAX_THROTTLE_RETRIES,
+            limiter=Config.get_rate_limiter(STANDARD))
+    
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            if async_recognizer:
+                async_recognizer.close()
+            return
         
-        for file_name in txt_files:
-            file_path = os.path.join(full_path, file_name)
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                invoices.append({
-                    "file_name": file_name,
-                    "content": content
-                })
+        recognition_results = recognize([inv["content"] for inv in batch])
         
-        print(f"Loaded {len(invoices)} test invoice files from {full_path}")
-        return invoices
-    except Exception as err:
-        print(f"Error loading test invoices: {err}")
-        return []
+        for invoice, result in zip(batch, recognition_results):
+            entities = []
+            if result is not None and not result.is_error:
+                for entity in result.entities:
+                    entities.append({
+                        "text": entity.text,
+                        "category": entity.category,
+                        "offset": entity.offset,
+                        "length": entity.length,
+                        "confidence": entity.confidence_score
+                    })
+            yield invoice["file_name"], entities
 
-# ==================== STANDARD MODEL ====================
 def extract_with_standard_model(invoices):
     """Extract entities using Azure standard NER model."""
     print("\n" + "="*70)
     print("STANDARD MODEL - Azure Language Service NER")
     print("="*70)
     
-    ta_credential = AzureKeyCredential(gpt_5_chat_key)
-    client = TextAnalyticsClient(endpoint=gpt_5_chat_endpoint, credential=ta_credential)
-    
-    results = {
-        "model": "Standard",
-        "entity_types": set(),
-        "entities_by_invoice": {},
-        "total_entities": 0
-    }
+    results = _new_results("Standard")
+    for file_name, entities in iter_standard_model(invoices):
+        _record_entities(results, file_name, entities)
+    return _finalize_results(results)
+
+# ==================== FINE-TUNED MODEL ====================
+def iter_fine_tuned_model(invoices, batched=True, shard=True):
+    """
+    Stream entities from the fine-tuned CustomEntityRecognition model.
     
-    batch_size = 5
-    documents = [inv["content"] for inv in invoices]
+    Args:
+        invoices (iterable): Invoice dicts with "file_name" and "content" keys.
+        batched (bool): If True, pack invoices into multi-document jobs. If False,
+                        submit one job per invoice.
+        shard (bool): In batched mode, split multi-invoice batch files into one
+                      sub-document per invoice; their entities are merged back
+                      under the source file name.
     
-    for i in range(0, len(documents), batch_size):
-        try:
-            batch = documents[i:i+batch_size]
-            recognition_results = client.recognize_entities(documents=batch)
-            
-            for idx, result in enumerate(recognition_results):
-                invoice_idx = i + idx
-                invoice_name = invoices[invoice_idx]["file_name"]
-                results["entities_by_invoice"][invoice_name] = []
-                
-                for entity in result.entities:
-                    results["entity_types"].add(entity.category)
-                    results["total_entities"] += 1
-                    
-                    results["entities_by_invoice"][invoice_name].append({
-                        "text": entity.text,
-                        "category": entity.category,
-                        "confidence": f"{entity.confidence_score * 100:.2f}%"
-                    })
-        except Exception as err:
-            print(f"Error processing batch: {err}")
+    Yields:
+        tuple: (file_name, entities) once every sub-document of an invoice is done.
+    """
+    max_documents = Config.CUSTOM_NER_MAX_DOCUMENTS_PER_JOB if batched else 1
+    documents = shard_invoices(invoices) if batched and shard else invoices
+    # Entities collected so far for invoices whose sub-documents are still in flight
+    partial = {}
     
-    results["entity_types"] = sorted(list(results["entity_types"]))
-    return results
+    for invoice, entities in run_batched_jobs(
+        documents,
+        endpoint=LANGUAGE_SERVICE_ENDPOINT,
+        api_version=API_VERSION,
+        api_key=Config.get_language_service_key(),
+        project_name=PROJECT_NAME,
+        deployment_name=DEPLOYMENT_NAME,
+        max_documents=max_documents,
+        max_characters=Config.CUSTOM_NER_MAX_CHARACTERS_PER_JOB,
+        max_in_flight=Config.CUSTOM_NER_MAX_IN_FLIGHT_JOBS,
+        polling_policy=Config.get_polling_policy(),
+        session=Config.get_http_session(),
+        submit_limiter=Config.get_rate_limiter(JOB_SUBMIT),
+        poll_limiter=Config.get_rate_limiter(JOB_POLL),
+    ):
+        file_name = invoice["file_name"]
+        state = partial.setdefault(file_name, {"entities": [], "remaining": invoice.get("shard_count", 1)})
+        
+        if entities is None:
+            print(f"Error for {file_name}: no results returned")
+        else:
+            # Sub-document offsets are mapped back into the source file
+            state["entities"].extend(remap_entities(entities, invoice.get("offset", 0)))
+        
+        state["remaining"] -= 1
+        if state["remaining"] == 0:
+            del partial[file_name]
+            yield file_name, state["entities"]
 
-# ==================== FINE-TUNED MODEL ====================
-def extract_with_fine_tuned_model(invoices):
-    """Extract entities using fine-tuned CustomEntityRecognition model."""
+def extract_with_fine_tuned_model(invoices, batched=True, shard=True):
+    """
+    Extract entities using fine-tuned CustomEntityRecognition model.
+    See iter_fine_tuned_model for the arguments.
+    """
     print("\n" + "="*70)
     print("FINE-TUNED MODEL - CustomEntityRecognition (test-v3)")
     print("="*70)
     
-    results = {
-        "model": "Fine-Tuned",
-        "entity_types": set(),
-        "entities_by_invoice": {},
-        "total_entities": 0
+    results = _new_results("Fine-Tuned")
+    for file_name, entities in iter_fine_tuned_model(invoices, batched=batched, shard=shard):
+        _record_entities(results, file_name, entities)
+    
+    print(f"\n⏱️  {format_job_metrics(Config.get_polling_policy())}")
+    print(f"   {format_pool_stats(Config.get_http_session())}")
+    return _finalize_results(results)
+
+# ==================== PARALLEL COMPARISON ====================
+COMPARISON_FIELDNAMES = ["Invoice", "Standard_Entities", "Fine_Tuned_Entities", "Standard_Types", "Fine_Tuned_Types"]
+
+def _comparison_row(invoice_name, standard_entities, finetuned_entities):
+    return {
+        "Invoice": invoice_name,
+        "Standard_Entities": len(standard_entities),
+        "Fine_Tuned_Entities": len(finetuned_entities),
+        "Standard_Types": ', '.join(sorted(set(e['category'] for e in standard_entities))),
+        "Fine_Tuned_Types": ', '.join(sorted(set(e['category'] for e in finetuned_entities)))
     }
+
+def _run_model_worker(model_name, extractor, invoice_queue, completions):
+    """
+    Feed queued invoices through one model and report each completion.
     
-    for invoice in invoices:
-        file_name = invoice["file_name"]
-        content = invoice["content"]
-        results["entities_by_invoice"][file_name] = []
-        
-        # Call fine-tuned API
-        url = f"{LANGUAGE_SERVICE_ENDPOINT}language/analyze-text/jobs?api-version={API_VERSION}"
-        headers = {
-            "Ocp-Apim-Subscription-Key": language_service_key,
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "displayName": f"Entity extraction for {file_name}",
-            "analysisInput": {
-                "documents": [{
-                    "id": file_name.replace('.txt', ''),
-                    "language": "en",
-                    "text": content
-                }]
-            },
-            "tasks": [{
-                "kind": "CustomEntityRecognition",
-                "taskName": "Entity Recognition",
-                "parameters": {
-                    "projectName": PROJECT_NAME,
-                    "deploymentName": DEPLOYMENT_NAME
-                }
-            }]
-        }
-        
+    A worker whose model fails keeps taking invoices off its queue until the end of
+    the stream, so the producer (and with it the other model) never blocks on a
+    full queue and the failure surfaces as a finished worker.
+    """
+    drained = False
+    
+    def queued_invoices():
+        nonlocal drained
+        yield from iter(invoice_queue.get, _END_OF_STREAM)
+        drained = True
+    
+    try:
+        for file_name, entities in extractor(queued_invoices()):
+            completions.put((model_name, file_name, entities))
+    except Exception as err:
+        print(f"Error in {model_name} model worker: {err}")
+    finally:
+        if not drained:
+            for _ in iter(invoice_queue.get, _END_OF_STREAM):
+                pass
+        completions.put((model_name, None, None))
+
+def run_parallel_comparison(invoices, queue_size=1000):
+    """
+    Run the standard and fine-tuned models concurrently over one invoice stream.
+    
+    The stream is read once and fanned out to one worker thread per model. Results
+    are merged per invoice as soon as both models have finished it and each merged
+    row is appended to the comparison report immediately, so an interrupted run
+    still leaves a partial report (flushed locally, committed to Blob Storage on exit).
+    
+    Returns:
+        tuple: (standard_results, finetuned_results) dicts for generate_comparison_report.
+    """
+    print("\n" + "="*70)
+    print("Running Standard and Fine-Tuned models in parallel")
+    print("="*70)
+    
+    started_at = time.monotonic()
+    standard_queue = queue.Queue(maxsize=queue_size)
+    finetuned_queue = queue.Queue(maxsize=queue_size)
+    completions = queue.Queue()
+    
+    def produce():
         try:
-            response = requests.post(url, headers=headers, json=payload)
-            
-            if response.status_code != 202:
-                print(f"Error for {file_name}: {response.status_code}")
-                continue
-            
-            job_location = response.headers.get('operation-location')
-            max_retries = 30
-            retry_count = 0
-            
-            while retry_count < max_retries:
-                time.sleep(2)
-                status_response = requests.get(job_location, headers={
-                    "Ocp-Apim-Subscription-Key": language_service_key
-                })
-                
-                if status_response.status_code == 200:
-                    result = status_response.json()
-                    job_status = result.get('status')
-                    
-                    if job_status == 'succeeded':
-                        tasks = result.get('tasks', {}).get('items', [])
-                        if tasks:
-                            task_result = tasks[0]
-                            result_data = task_result.get('results', {})
-                            documents = result_data.get('documents', [])
-                            
-                            if documents:
-                                entities_list = documents[0].get('entities', [])
-                                
-                                for entity in entities_list:
-                                    entity_category = entity.get('category', 'Unknown')
-                                    results["entity_types"].add(entity_category)
-                                    results["total_entities"] += 1
-                                    
-                                    results["entities_by_invoice"][file_name].append({
-                                        "text": entity.get("text", ""),
-                                        "category": entity_category,
-                                        "confidence": f"{entity.get('confidenceScore', 0)*100:.2f}%"
-                                    })
-                        break
-                    elif job_status == 'failed':
-                        print(f"Job failed for {file_name}")
-                        break
+            for invoice in invoices:
+                standard_queue.put(invoice)
+                finetuned_queue.put(invoice)
+        finally:
+            standard_queue.put(_END_OF_STREAM)
+            finetuned_queue.put(_END_OF_STREAM)
+    
+    threads = [
+        threading.Thread(target=produce, daemon=True),
+        threading.Thread(target=_run_model_worker, daemon=True,
+                         args=("Standard", iter_standard_model, standard_queue, completions)),
+        threading.Thread(target=_run_model_worker, daemon=True,
+                         args=("Fine-Tuned", iter_fine_tuned_model, finetuned_queue, completions)),
+    ]
+    for thread in threads:
+        thread.start()
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    csv_file = f"model_comparison_{timestamp}.csv"
+    csv_path = f"/tmp/{csv_file}"
+    try:
+        blob_service_client = Config.get_blob_service_client()
+    except Exception as err:
+        print(f"  Error connecting to Azure Storage, writing report locally only: {err}")
+        blob_service_client = None
+    # An interrupted comparison still publishes the invoices compared so far
+    sink = open_report_sink(blob_service_client, Config.REPORTS_CONTAINER, csv_file, COMPARISON_FIELDNAMES,
+                            local_path=csv_path, block_size=Config.REPORT_BLOCK_SIZE_BYTES,
+                            flush_local_rows=True, commit_partial=True)
+    
+    standard_results = _new_results("Standard")
+    finetuned_results = _new_results("Fine-Tuned")
+    results_by_model = {"Standard": standard_results, "Fine-Tuned": finetuned_results}
+    pending = {}
+    running = len(results_by_model)
+    
+    try:
+        with sink:
+            while running:
+                model_name, file_name, entities = completions.get()
+                if file_name is None:
+                    running -= 1
+                    continue
                 
-                retry_count += 1
-        except Exception as err:
-            print(f"Error processing {file_name}: {err}")
+                _record_entities(results_by_model[model_name], file_name, entities)
+                pair = pending.setdefault(file_name, {})
+                pair[model_name] = entities
+                if len(pair) == len(results_by_model):
+                    del pending[file_name]
+                    sink.write_row(_comparison_row(file_name, pair["Standard"], pair["Fine-Tuned"]))
+                    print(f"  ✓ {file_name}: standard={len(pair['Standard'])} fine-tuned={len(pair['Fine-Tuned'])}")
+            
+            # Invoices one model never returned are still reported with what is known
+            for file_name, pair in pending.items():
+                sink.write_row(_comparison_row(file_name, pair.get("Standard", []), pair.get("Fine-Tuned", [])))
+    finally:
+        print(f"\n💾 Comparison report: {sink.rows_written} invoice rows written to {csv_path}")
+        if blob_service_client is not None and sink.committed:
+            print(f"  CSV uploaded to Azure Storage: {csv_file}")
+        elif sink.upload_error is not None:
+            print(f"  Error uploading comparison CSV: {sink.upload_error}")
     
-    results["entity_types"] = sorted(list(results["entity_types"]))
-    return results
+    print(f"\n⏱️  Comparison wall time: {time.monotonic() - started_at:.2f}s")
+    print(f"   {format_job_metrics(Config.get_polling_policy())}")
+    print(f"   {format_pool_stats(Config.get_http_session())}")
+    print(format_rate_limit_stats(Config.get_rate_limiters(), indent="   "))
+    print(registry.format_summary(indent="   "))
+    Config.export_metrics()
+    return _finalize_results(standard_results), _finalize_results(finetuned_results)
+
+def _entity_counts(results):
+    """Entities per invoice of one model as a Series."""
+    return results['entities_by_invoice'].document_counts()
 
-def generate_comparison_report(standard_results, finetuned_results):
-    """Generate a comparison report between the two models."""
+def export_entities(results, directory, file_format="csv"):
+    """
+    Bulk-export one model's entities to <directory>/<model>_entities.<csv|parquet>.
+    
+    Returns:
+        str: Path of the written file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    model_name = results["model"].lower().replace("-", "_")
+    path = os.path.join(directory, f"{model_name}_entities.{file_format}")
+    store = results["entities_by_invoice"]
+    if file_format == "parquet":
+        store.to_parquet(path)
+    else:
+        store.to_csv(path)
+    return path
+
+def _print_accuracy(model_name, scores):
+    """Print exact/overlap scores and the confidence threshold curve of one model."""
+    print(f"\n{model_name} Model - exact span match:")
+    print(format_scores(scores["exact"]))
+    print(f"\n{model_name} Model - overlapping span match:")
+    print(format_scores(scores["overlap"]))
+    print(f"\n{model_name} Model - exact match by confidence threshold:")
+    print(format_curve(scores["curve"].iloc[::2]))
+
+def generate_comparison_report(standard_results, finetuned_results, labels=None):
+    """
+    Print a comparison summary between the two models.
+    
+    Args:
+        labels (dict): Optional ground truth (file name -> entities with offsets, e.g.
+                       from synthetic_invoices.load_labels). When given, both models are
+                       scored with per-type precision, recall and F1.
+    
+    Returns:
+        dict: {"Standard": scores, "Fine-Tuned": scores} from evaluation.evaluate, or
+              None without labels.
+    """
     print("\n" + "="*70)
     print("COMPARISON REPORT: Standard vs Fine-Tuned NER")
     print("="*70)
@@ -239,84 +401,71 @@ def generate_comparison_report(standard_results, finetuned_results):
     print(f"  Difference: {abs(standard_results['total_entities'] - finetuned_results['total_entities'])}")
     
     # Summary per invoice
-    print(f"\n📋 ENTITIES PER INVOICE:")
+    counts = pd.DataFrame({
+        "Standard": _entity_counts(standard_results),
+        "Fine-Tuned": _entity_counts(finetuned_results),
+    }).fillna(0).astype("int64").sort_index()
+    counts["Diff"] = counts["Fine-Tuned"] - counts["Standard"]
+    if len(counts) > MAX_REPORT_ROWS:
+        print(f"\n📋 ENTITIES PER INVOICE ({MAX_REPORT_ROWS} largest differences of {len(counts)} invoices):")
+        counts = counts.loc[counts["Diff"].abs().sort_values(ascending=False, kind="stable").index[:MAX_REPORT_ROWS]]
+    else:
+        print(f"\n📋 ENTITIES PER INVOICE:")
     print(f"\n{'Invoice':<30} {'Standard':<12} {'Fine-Tuned':<12} {'Diff':<8}")
     print("-" * 62)
     
-    for invoice_name in sorted(standard_results['entities_by_invoice'].keys()):
-        standard_count = len(standard_results['entities_by_invoice'].get(invoice_name, []))
-        finetuned_count = len(finetuned_results['entities_by_invoice'].get(invoice_name, []))
-        diff = finetuned_count - standard_count
-        
-        print(f"{invoice_name:<30} {standard_count:<12} {finetuned_count:<12} {diff:<8}")
+    for invoice_name, row in counts.iterrows():
+        print(f"{invoice_name:<30} {row['Standard']:<12} {row['Fine-Tuned']:<12} {row['Diff']:<8}")
     
-    # Export detailed comparison to CSV
-    print(f"\n💾 Exporting detailed comparison to CSV...")
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    csv_file = f"model_comparison_{timestamp}.csv"
-    csv_path = f"/tmp/{csv_file}"
+    if not labels:
+        return None
     
-    try:
-        with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ["Invoice", "Standard_Entities", "Fine_Tuned_Entities", "Standard_Types", "Fine_Tuned_Types"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            
-            for invoice_name in sorted(standard_results['entities_by_invoice'].keys()):
-                standard_entities = standard_results['entities_by_invoice'].get(invoice_name, [])
-                finetuned_entities = finetuned_results['entities_by_invoice'].get(invoice_name, [])
-                
-                standard_types = ', '.join(set(e['category'] for e in standard_entities))
-                finetuned_types = ', '.join(set(e['category'] for e in finetuned_entities))
-                
-                writer.writerow({
-                    "Invoice": invoice_name,
-                    "Standard_Entities": len(standard_entities),
-                    "Fine_Tuned_Entities": len(finetuned_entities),
-                    "Standard_Types": standard_types,
-                    "Fine_Tuned_Types": finetuned_types
-                })
-        
-        print(f"  CSV saved to: {csv_path}")
-        
-        # Upload to Azure Storage
-        blob_service_client = BlobServiceClient.from_connection_string(storage_connection_string)
-        reports_container = "reports"
-        
-        with open(csv_path, 'rb') as data:
-            blob_client = blob_service_client.get_blob_client(
-                container=reports_container,
-                blob=csv_file
-            )
-            blob_client.upload_blob(data, overwrite=True)
-        
-        print(f"  CSV uploaded to Azure Storage: {csv_file}")
-    except Exception as err:
-        print(f"  Error saving comparison CSV: {err}")
+    print(f"\n🎯 ACCURACY AGAINST GROUND TRUTH ({len(labels)} labelled documents):")
+    scores = {
+        "Standard": evaluate(labels, standard_results['entities_by_invoice'], category_map=STANDARD_CATEGORY_MAP),
+        "Fine-Tuned": evaluate(labels, finetuned_results['entities_by_invoice']),
+    }
+    for model_name, model_scores in scores.items():
+        _print_accuracy(model_name, model_scores)
+    return scores
 
 if __name__ == "__main__":
     print("="*70)
     print("NER MODEL COMPARISON: Standard vs Fine-Tuned")
     print("="*70)
     
-    # Load test invoices
-    invoices = fetch_invoices_from_local(test_invoices_dir="../data/test_invoices")
+    parser = argparse.ArgumentParser(description="Compare the standard and fine-tuned NER models")
+    parser.add_argument("--invoices", default="../data/test_invoices", help="Invoice directory or blob://<container>/<prefix>")
+    parser.add_argument("--labels", help="Ground-truth JSON Lines file (see synthetic_invoices.py) to score both models")
+    parser.add_argument("--export-entities", metavar="DIR", help="Write every extracted entity of both models to DIR")
+    parser.add_argument("--export-format", choices=["csv", "parquet"], default="csv",
+                        help="File format for --export-entities (parquet requires pyarrow)")
+    args = parser.parse_args()
     
-    if not invoices:
+    Config.configure_observability()
+    Config.validate(strict=True)
+    Config.prefetch_secrets(REQUIRED_SECRETS)
+    
+    # Stream invoices once; both models consume the same stream in parallel
+    invoices = iter_invoice_source(args.invoices)
+    
+    standard_results, finetuned_results = run_parallel_comparison(invoices)
+    
+    if not standard_results['entities_by_invoice']:
         print("No invoices found. Exiting.")
         exit(1)
     
-    # Run both models
-    print(f"\nLoaded {len(invoices)} test invoices for comparison")
-    
-    standard_results = extract_with_standard_model(invoices)
     print(f"✓ Standard Model: {standard_results['total_entities']} entities in {len(standard_results['entity_types'])} types")
-    
-    finetuned_results = extract_with_fine_tuned_model(invoices)
     print(f"✓ Fine-Tuned Model: {finetuned_results['total_entities']} entities in {len(finetuned_results['entity_types'])} types")
     
     # Generate comparison
-    generate_comparison_report(standard_results, finetuned_results)
+    generate_comparison_report(standard_results, finetuned_results,
+                               labels=load_labels(args.labels) if args.labels else None)
+    
+    if args.export_entities:
+        for results in (standard_results, finetuned_results):
+            print(f"💾 {results['model']} entities exported to "
+                  f"{export_entities(results, args.export_entities, args.export_format)}")
     
     print("\n" + "="*70)
     print("✅ Model comparison complete!")
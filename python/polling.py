@@ -0,0 +1,81 @@
+"""
+Polling strategy for long-running Language service jobs.
+Starts with a short first poll, backs off exponentially with jitter, honours
+Retry-After headers from the service and gives up after an overall deadline.
+"""
+
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header value into seconds.
+
+    Accepts either delta-seconds ("2", "0.5") or an HTTP-date. Returns None if the
+    header is missing or cannot be parsed.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class PollingPolicy:
+    """Exponential backoff with jitter, bounded by an overall per-job deadline."""
+
+    def __init__(self, first_delay=0.5, multiplier=1.6, max_delay=10.0, jitter=0.2, deadline=600.0):
+        """
+        Args:
+            first_delay (float): Seconds to wait before the first status poll.
+            multiplier (float): Growth factor applied to the delay after each poll.
+            max_delay (float): Upper bound for a single computed delay.
+            jitter (float): Relative jitter, e.g. 0.2 spreads each delay by +/-20%.
+            deadline (float): Seconds after submission before a job is abandoned.
+        """
+        self.first_delay = first_delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.deadline = deadline
+
+    def next_delay(self, polls, retry_after=None):
+        """
+        Return the delay before the next poll.
+
+        Args:
+            polls (int): Number of status polls already made for this job.
+            retry_after (float): Seconds requested by the service, if any. It takes
+                                 precedence over the computed backoff.
+        """
+        if retry_after is not None:
+            return retry_after
+
+        delay = min(self.max_delay, self.first_delay * (self.multiplier ** polls))
+        if self.jitter:
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(0.0, delay)
+
+    def expired(self, submitted_at, now=None):
+        """Return True once the job has exceeded the overall deadline."""
+        now = time.monotonic() if now is None else now
+        return now - submitted_at >= self.deadline
+
+    def describe(self):
+        """Short human readable description used in latency reports."""
+        return (f"exponential(first={self.first_delay}s, x{self.multiplier}, max={self.max_delay}s, "
+                f"jitter={self.jitter:.0%}, deadline={self.deadline}s, honours Retry-After)")
+
+    def __repr__(self):
+        return f"PollingPolicy({self.describe()})"
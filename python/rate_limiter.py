@@ -0,0 +1,130 @@
+"""
+Client-side rate limiting for Language service calls.
+Each endpoint class (standard NER requests, job submissions, job status polls)
+gets its own token bucket so a run stays under the service's transactions-per-
+second quota. A 429 from the service pauses the bucket for Retry-After and halves
+its rate; the rate then recovers gradually with every successful call.
+"""
+
+import asyncio
+import threading
+import time
+
+# Endpoint classes used throughout the pipelines
+STANDARD = "standard"
+JOB_SUBMIT = "job_submit"
+JOB_POLL = "job_poll"
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with 429 back-off.
+
+    Callers reserve a token and sleep for the returned wait time, so concurrent
+    callers queue up behind each other instead of all retrying at once.
+    """
+
+    def __init__(self, rate, burst=None, name="", min_rate=None, recovery=0.05):
+        """
+        Args:
+            rate (float): Sustained requests per second. 0 or less disables limiting.
+            burst (float): Bucket capacity; defaults to one second's worth of requests.
+            name (str): Label used in stats output.
+            min_rate (float): Floor for the rate after repeated throttling.
+            recovery (float): Fraction of the configured rate regained per success.
+        """
+        self.name = name
+        self.configured_rate = rate
+        self.rate = rate
+        self.burst = burst if burst else max(1.0, rate)
+        self.min_rate = min_rate if min_rate else max(rate * 0.05, 0.1)
+        self.recovery = recovery
+        self.acquired = 0
+        self.throttled = 0
+        self.waited_seconds = 0.0
+
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.configured_rate > 0
+
+    def _reserve(self, tokens):
+        """Take tokens (possibly going into debt) and return how long to wait."""
+        with self._lock:
+            self.acquired += 1
+            if not self.enabled:
+                return 0.0
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= tokens
+
+            delay = max(0.0, self._blocked_until - now)
+            if self._tokens < 0:
+                delay = max(delay, -self._tokens / self.rate)
+            self.waited_seconds += delay
+            return delay
+
+    def acquire(self, tokens=1):
+        """Block until a request may be sent. Returns the seconds waited."""
+        delay = self._reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self, tokens=1):
+        """Coroutine version of acquire() for the async engines."""
+        delay = self._reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def record_throttle(self, retry_after=None):
+        """
+        React to an HTTP 429: pause every caller and halve the rate.
+
+        Args:
+            retry_after (float): Seconds requested by the service, if any.
+        """
+        with self._lock:
+            self.throttled += 1
+            if not self.enabled:
+                return
+            now = time.monotonic()
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self._blocked_until = max(self._blocked_until, now + pause)
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+            self._updated_at = now
+
+    def record_success(self):
+        """Regain part of the configured rate after a request that was not throttled."""
+        with self._lock:
+            if self.enabled and self.rate < self.configured_rate:
+                self.rate = min(self.configured_rate, self.rate + self.configured_rate * self.recovery)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "rate": self.rate,
+            "configured_rate": self.configured_rate,
+            "acquired": self.acquired,
+            "throttled": self.throttled,
+            "waited_seconds": self.waited_seconds,
+        }
+
+    def format_stats(self):
+        """Format stats() as a single printable line."""
+        if not self.enabled:
+            return f"rate limit [{self.name}]: disabled requests={self.acquired} throttled={self.throttled}"
+        return (f"rate limit [{self.name}]: {self.rate:.1f}/{self.configured_rate:.1f} req/s "
+                f"requests={self.acquired} throttled={self.throttled} waited={self.waited_seconds:.2f}s")
+
+
+def format_rate_limit_stats(limiters, indent=""):
+    """Format several buckets, one per line."""
+    return "\n".join(indent + limiter.format_stats() for limiter in limiters)
@@ -0,0 +1,152 @@
+"""
+Streaming CSV report sink for extraction results.
+Rows are written as results arrive and uploaded to Blob Storage in fixed-size
+staged blocks (stage_block / commit_block_list), optionally mirrored to a local
+file, so peak memory stays at one block no matter how large the report grows.
+Used as a context manager, the blob is only committed if the with block completes,
+so a crashed run never publishes a truncated report under the final name.
+"""
+
+import base64
+import csv
+import io
+from azure.storage.blob import BlobBlock
+from metrics import STAGE_REPORT_WRITE, STAGE_UPLOAD, registry
+
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class CsvReportSink:
+    """Incremental CSV writer that streams to a block blob and/or a local file."""
+
+    def __init__(self, fieldnames, blob_client=None, local_path=None, block_size=DEFAULT_BLOCK_SIZE,
+                 flush_local_rows=False, commit_partial=False):
+        """
+        Args:
+            fieldnames (list): CSV column names, written as the header row.
+            blob_client (BlobClient): Destination block blob, or None for local only.
+            local_path (str): Optional local file that receives the same rows.
+            block_size (int): Bytes buffered before a block is staged.
+            flush_local_rows (bool): Write and flush every row to local_path as soon
+                                     as it arrives, so an interrupted run still
+                                     leaves a complete partial report on disk.
+            commit_partial (bool): Commit the blob even when the with block raises,
+                                   publishing the rows written so far.
+        """
+        self.fieldnames = fieldnames
+        self.blob_client = blob_client
+        self.local_path = local_path
+        self.block_size = block_size
+        self.commit_partial = commit_partial
+        self.committed = False
+        self.rows_written = 0
+        self.bytes_written = 0
+        self.block_ids = []
+        self.upload_error = None
+
+        self._buffer = io.StringIO()
+        self._writer = csv.DictWriter(self._buffer, fieldnames=fieldnames)
+        self._local_file = open(local_path, 'w', newline='', encoding='utf-8') if local_path else None
+        self._local_writer = None
+        if self._local_file and flush_local_rows:
+            self._local_writer = csv.DictWriter(self._local_file, fieldnames=fieldnames)
+            self._local_writer.writeheader()
+            self._local_file.flush()
+        self._writer.writeheader()
+
+    def write_row(self, row):
+        """Append a single row, staging a block once the buffer is full."""
+        self._writer.writerow(row)
+        if self._local_writer:
+            self._local_writer.writerow(row)
+            self._local_file.flush()
+        self.rows_written += 1
+        if self._buffer.tell() >= self.block_size:
+            self._flush()
+
+    def write_rows(self, rows):
+        """Append every row from an iterable."""
+        for row in rows:
+            self.write_row(row)
+
+    def _flush(self):
+        """Hand the buffered text to the local file and stage it as a blob block."""
+        text = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate(0)
+        if not text:
+            return
+
+        if self._local_file and not self._local_writer:
+            with registry.time_stage(STAGE_REPORT_WRITE):
+                self._local_file.write(text)
+
+        data = text.encode("utf-8")
+        self.bytes_written += len(data)
+
+        if self.blob_client is None or self.upload_error:
+            return
+        # Block ids must be base64 strings of equal length within a blob
+        block_id = base64.b64encode(f"block-{len(self.block_ids):08d}".encode("ascii")).decode("ascii")
+        try:
+            with registry.time_stage(STAGE_UPLOAD):
+                self.blob_client.stage_block(block_id=block_id, data=data)
+            self.block_ids.append(block_id)
+        except Exception as err:
+            self.upload_error = err
+            print(f"  Failed to stage report block: {err}")
+
+    def close(self, commit=True):
+        """
+        Flush remaining rows and commit the staged blocks.
+
+        Args:
+            commit (bool): False leaves the staged blocks uncommitted, so nothing is
+                           published under the blob name (the service discards them).
+
+        Returns:
+            bool: True if the blob was committed (or no blob was requested).
+        """
+        self._flush()
+        registry.counter("report_rows", "Report rows written.").inc(self.rows_written)
+        if self._local_file:
+            self._local_file.close()
+            self._local_file = None
+
+        if self.blob_client is None:
+            self.committed = True
+            return True
+        if self.upload_error or not commit:
+            return False
+        try:
+            with registry.time_stage(STAGE_UPLOAD):
+                self.blob_client.commit_block_list([BlobBlock(block_id=block_id) for block_id in self.block_ids])
+            self.committed = True
+            return True
+        except Exception as err:
+            self.upload_error = err
+            print(f"  Failed to commit report blob: {err}")
+            return False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None and not self.commit_partial and self.blob_client is not None:
+            print(f"  Report blob not committed: the run failed after {self.rows_written} rows")
+        self.close(commit=exc_type is None or self.commit_partial)
+        return False
+
+
+def open_report_sink(blob_service_client, container, blob_name, fieldnames, local_path=None,
+                     block_size=DEFAULT_BLOCK_SIZE, flush_local_rows=False, commit_partial=False):
+    """
+    Open a CsvReportSink for container/blob_name.
+
+    If blob_service_client is None the report is only written to local_path.
+    """
+    blob_client = None
+    if blob_service_client is not None:
+        blob_client = blob_service_client.get_blob_client(container=container, blob=blob_name)
+    return CsvReportSink(fieldnames, blob_client=blob_client, local_path=local_path, block_size=block_size,
+                         flush_local_rows=flush_local_rows, commit_partial=commit_partial)
@@ -0,0 +1,181 @@
+"""
+Single-pass parser for analyze-text job responses.
+Reads the first task's results at tasks.items[0].results and turns every
+document of a multi-document job into entity records in one pass, with no
+per-level inspection or debug dumps. orjson is used to decode bodies when it
+is installed, and large bodies can be parsed incrementally straight from the
+HTTP stream with ijson so the raw response is never held in memory.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard library decoder is used without it
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # ijson is optional; streamed bodies are read fully and decoded at once
+    ijson = None
+
+# Bodies at least this large (or of unknown size) are parsed from the stream when ijson is available
+STREAM_THRESHOLD_BYTES = 1024 * 1024
+
+_TASK = "tasks.items.item"
+_DOCUMENT = _TASK + ".results.documents.item"
+_ENTITY = _DOCUMENT + ".entities.item"
+_DOCUMENT_ERROR = _TASK + ".results.errors.item"
+_SCALAR_EVENTS = frozenset(("string", "number", "boolean", "null"))
+
+
+def loads(data):
+    """Decode a JSON body (bytes or str), with orjson if it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def parse_entities(entities):
+    """
+    Convert the service's entity objects into entity records.
+
+    Returns:
+        list: {"text", "category", "subcategory", "confidence", "offset", "length"} dicts.
+    """
+    return [
+        {
+            "text": entity.get("text", ""),
+            "category": entity.get("category", "Unknown"),
+            "subcategory": entity.get("subcategory") or "",
+            "confidence": entity.get("confidenceScore", 0),
+            "offset": entity.get("offset", -1),
+            "length": entity.get("length", len(entity.get("text", ""))),
+        }
+        for entity in entities
+    ]
+
+
+class JobResponse:
+    """Parsed analyze-text job: status plus per-document entity records and errors."""
+
+    __slots__ = ("status", "documents", "errors", "job_errors")
+
+    def __init__(self, status=None, documents=None, errors=None, job_errors=None):
+        self.status = status
+        # Job document id -> entity records
+        self.documents = documents if documents is not None else {}
+        # Job document id -> service error object
+        self.errors = errors if errors is not None else {}
+        self.job_errors = job_errors if job_errors is not None else []
+
+    def first_entities(self):
+        """Entity records of the first document, or [] if none came back (single-document jobs)."""
+        return next(iter(self.documents.values()), [])
+
+
+def parse_job_response(body):
+    """
+    Parse a job status body in one pass.
+
+    Args:
+        body (dict, bytes or str): The job status response. A bare results object
+                                   ({"documents": [...], "errors": [...]}) is accepted too.
+
+    Returns:
+        JobResponse
+    """
+    if not isinstance(body, dict):
+        body = loads(body)
+    items = body.get("tasks", {}).get("items")
+    if items:
+        results = items[0].get("results") or {}
+    else:
+        results = body if "documents" in body else {}
+    return JobResponse(
+        status=body.get("status"),
+        documents={document.get("id"): parse_entities(document.get("entities", ()))
+                   for document in results.get("documents", ())},
+        errors={error.get("id"): error.get("error") for error in results.get("errors", ())},
+        job_errors=body.get("errors", []),
+    )
+
+
+def parse_job_stream(stream):
+    """
+    Parse a job status body incrementally from a binary file-like object.
+
+    With ijson installed, entity records are built directly from parser events
+    while the body is read, so neither the raw bytes nor the service's nested
+    objects are kept. Without it the body is read and decoded at once.
+
+    Returns:
+        JobResponse
+    """
+    if ijson is None:
+        return parse_job_response(stream.read())
+
+    response = JobResponse()
+    task_index = -1
+    document_id = entities = entity = error_id = error = None
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        if prefix == _TASK:
+            if event == "start_map":
+                task_index += 1
+            continue
+        if task_index > 0:
+            # Only the first task's results are reported, as in parse_job_response
+            continue
+        if prefix == _ENTITY:
+            if event == "start_map":
+                entity = {}
+            elif event == "end_map":
+                entities.extend(parse_entities((entity,)))
+                entity = None
+        elif entity is not None and event in _SCALAR_EVENTS and prefix.startswith(_ENTITY):
+            key = prefix[len(_ENTITY) + 1:]
+            if "." not in key:
+                entity[key] = value
+        elif prefix == _DOCUMENT:
+            if event == "start_map":
+                document_id, entities = None, []
+            elif event == "end_map":
+                response.documents[document_id] = entities
+        elif prefix == _DOCUMENT + ".id":
+            document_id = value
+        elif prefix == _DOCUMENT_ERROR:
+            if event == "start_map":
+                error_id, error = None, {}
+            elif event == "end_map":
+                response.errors[error_id] = error
+        elif prefix == _DOCUMENT_ERROR + ".id":
+            error_id = value
+        elif prefix in (_DOCUMENT_ERROR + ".error.code", _DOCUMENT_ERROR + ".error.message"):
+            error[prefix.rsplit(".", 1)[1]] = value
+        elif prefix == "status":
+            response.status = value
+        elif prefix == "errors.item" and event == "start_map":
+            response.job_errors.append({})
+        elif prefix in ("errors.item.code", "errors.item.message"):
+            response.job_errors[-1][prefix.rsplit(".", 1)[1]] = value
+    return response
+
+
+def read_job_response(http_response, stream_threshold=None):
+    """
+    Parse a requests response opened with stream=True.
+
+    Bodies of at least stream_threshold bytes (default STREAM_THRESHOLD_BYTES), or
+    without a Content-Length, are parsed from the socket with parse_job_stream when
+    ijson is available; smaller ones are read and decoded in one go.
+
+    Returns:
+        JobResponse
+    """
+    if stream_threshold is None:
+        stream_threshold = STREAM_THRESHOLD_BYTES
+    length = http_response.headers.get("Content-Length")
+    if ijson is not None and (length is None or int(length) >= stream_threshold):
+        http_response.raw.decode_content = True
+        return parse_job_stream(http_response.raw)
+    return parse_job_response(http_response.content)
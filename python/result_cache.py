@@ -0,0 +1,176 @@
+"""
+Content-addressed cache of parsed entity lists backed by a local SQLite file.
+Entries are keyed by a hash of the invoice text and the model that produced them,
+expire after a TTL and are evicted least-recently-used beyond a size bound, so
+re-running a pipeline over unchanged invoices never calls the model again.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Seconds a write waits for another process's write lock (sharded workers share the file)
+BUSY_TIMEOUT_SECONDS = 30.0
+
+
+class ResultCache:
+    """Persistent LRU cache mapping (text, model) hashes to entity lists."""
+
+    # How many writes to accept between eviction passes
+    EVICTION_INTERVAL = 100
+
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_entries=100000):
+        """
+        Args:
+            path (str): SQLite file location. Parent directories are created.
+            ttl_seconds (float): Age after which an entry is treated as a miss.
+            max_entries (int): Upper bound on stored entries before LRU eviction.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._writes_since_eviction = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entity_cache ("
+            " key TEXT PRIMARY KEY,"
+            " entities TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entity_cache_last_access ON entity_cache (last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(text, model_kind, model_name, api_version):
+        """
+        Build the content address for an invoice and model combination.
+
+        Args:
+            text (str): Invoice text sent to the model.
+            model_kind (str): Task kind, e.g. "CustomEntityRecognition".
+            model_name (str): Project/deployment name or endpoint identifying the model.
+            api_version (str): API or SDK version used for the call.
+        """
+        digest = hashlib.sha256()
+        for part in (model_kind, model_name, api_version):
+            digest.update(str(part).encode("utf-8"))
+            digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached entity list for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT entities, created_at FROM entity_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            entities, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM entity_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE entity_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(entities)
+
+    def put(self, key, entities):
+        """Store an entity list (JSON-serializable) under key."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entity_cache (key, entities, created_at, last_access)"
+                " VALUES (?, ?, ?, ?)",
+                (key, json.dumps(entities), now, now),
+            )
+            self._writes_since_eviction += 1
+            if self._writes_since_eviction >= self.EVICTION_INTERVAL:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop expired entries and the least recently used ones above max_entries."""
+        cutoff = time.time() - self.ttl_seconds
+        cursor = self._conn.execute("DELETE FROM entity_cache WHERE created_at < ?", (cutoff,))
+        self.evictions += cursor.rowcount
+        cursor = self._conn.execute(
+            "DELETE FROM entity_cache WHERE key IN ("
+            " SELECT key FROM entity_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self.evictions += cursor.rowcount
+        self._writes_since_eviction = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entity_cache").fetchone()[0]
+
+    def stats(self):
+        """Return hit/miss/eviction counters and the current entry count."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "entries": len(self),
+        }
+
+    def format_stats(self):
+        """Format stats() as a single printable line."""
+        stats = self.stats()
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = stats["hits"] / lookups if lookups else 0
+        return (f"result cache: hits={stats['hits']} misses={stats['misses']} hit_rate={hit_rate:.0%} "
+                f"expired={stats['expired']} evictions={stats['evictions']} entries={stats['entries']}")
+
+    def close(self):
+        """Run a final eviction pass and close the database."""
+        with self._lock:
+            self._evict()
+            self._conn.commit()
+            self._conn.close()
+
+
+def split_cached(items, cache, key_for, hits):
+    """
+    Filter out items that already have cached entities.
+
+    Items whose key_for(item) is cached are appended to hits as (item, entities)
+    and None is yielded in their place, so a lazy consumer can emit hits as they
+    appear; every other item is yielded for processing. Incoming Nones are passed on.
+    """
+    for item in items:
+        if item is None:
+            yield None
+            continue
+        entities = cache.get(key_for(item))
+        if entities is None:
+            yield item
+        else:
+            hits.append((item, entities))
+            yield None
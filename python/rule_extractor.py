@@ -0,0 +1,180 @@
+"""
+Local rule-based pre-extractor for deterministic invoice fields.
+Invoice number, dates, amounts, quantities and unit prices follow rigid
+"Label: value" layouts, so a single compiled regex finds them with offsets in
+process. Those fields are cut from the text sent to the remote model (lines left
+empty are dropped), so the model only sees the residual fields (customer, item names).
+Documents where required fields are missing are sent to the model unchanged.
+"""
+
+import re
+from bisect import bisect_right
+
+CURRENCY = r"\$[\d,]*\d(?:\.\d{2})?"
+
+# entity type -> (label pattern, value pattern)
+DEFAULT_RULES = {
+    "InvoiceNumber": (r"Invoice (?:Number|No\.?)", r"[A-Z]{2,}-[\d-]*\d"),
+    "Date": (r"(?:Invoice |Due )?Date", r"\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{2,4}"),
+    "Amount": (r"Amount|Subtotal|Total|Tax(?: \(\d+(?:\.\d+)?%\))?", CURRENCY),
+    "Quantity": (r"Quantity|Qty", r"\d+(?:\.\d+)?"),
+    "UnitPrice": (r"Unit Price", CURRENCY),
+}
+
+# Characters that may remain on a line once its fields are removed for it to be dropped
+_SEPARATORS = " \t\r\n-|,;."
+
+
+class RulePlan:
+    """Rule entities for one document plus the residual text to send to the model."""
+
+    def __init__(self, entities, model_text, complete, line_map=None):
+        """
+        Args:
+            entities (list): Service-shaped entity dicts found by the rules.
+            model_text (str): Text to send to the model ("" if nothing is left).
+            complete (bool): True if every required entity type was found.
+            line_map (list): (residual offset, original offset) pairs, one per kept text segment.
+        """
+        self.entities = entities
+        self.model_text = model_text
+        self.complete = complete
+        self._line_map = line_map or [(0, 0)]
+        self._residual_starts = [residual for residual, _ in self._line_map]
+
+    @property
+    def needs_model(self):
+        return bool(self.model_text.strip())
+
+    def to_original_offset(self, offset):
+        """Map an offset in model_text back to the original document."""
+        index = max(0, bisect_right(self._residual_starts, offset) - 1)
+        residual_start, original_start = self._line_map[index]
+        return original_start + offset - residual_start
+
+    def remap_model_entities(self, entities):
+        """
+        Map model entity offsets into the original document and drop entities that
+        overlap a field the rules already extracted. Returns new dicts.
+        """
+        spans = [(entity["offset"], entity["offset"] + entity["length"]) for entity in self.entities]
+        remapped = []
+        for entity in entities:
+            entity = dict(entity)
+            if entity.get("offset", -1) >= 0:
+                entity["offset"] = self.to_original_offset(entity["offset"])
+                end = entity["offset"] + entity.get("length", 0)
+                if any(start < end and entity["offset"] < stop for start, stop in spans):
+                    continue
+            remapped.append(entity)
+        return remapped
+
+
+class RuleExtractor:
+    """Compiled "Label: value" rules for the entity types handled locally."""
+
+    def __init__(self, entity_types=None, required_types=None, rules=None):
+        """
+        Args:
+            entity_types (list): Entity types to extract locally; defaults to every rule.
+                                 Types left out are extracted by the model as before.
+            required_types (list): Types a document must contain for its fields to be
+                                   trusted; otherwise the whole document goes to the model.
+            rules (dict): entity type -> (label pattern, value pattern).
+        """
+        rules = rules or DEFAULT_RULES
+        self.entity_types = [entity_type for entity_type in (entity_types or rules) if entity_type in rules]
+        self.required_types = set(required_types or ()) & set(self.entity_types)
+        alternatives = [
+            rf"\b(?:{rules[entity_type][0]})[ \t]*:[ \t]*(?P<{entity_type}>{rules[entity_type][1]})"
+            for entity_type in self.entity_types
+        ]
+        self._pattern = re.compile("|".join(alternatives)) if alternatives else None
+        self.documents = 0
+        self.documents_skipped = 0
+        self.entities_found = 0
+        self.characters_in = 0
+        self.characters_to_model = 0
+
+    def _matches(self, text):
+        if self._pattern is None:
+            return []
+        return list(self._pattern.finditer(text))
+
+    def extract(self, text):
+        """Return service-shaped entity dicts for every rule match in text."""
+        return [self._to_entity(match) for match in self._matches(text)]
+
+    @staticmethod
+    def _to_entity(match):
+        entity_type = match.lastgroup
+        start, end = match.span(entity_type)
+        return {
+            "text": match.group(entity_type),
+            "category": entity_type,
+            "offset": start,
+            "length": end - start,
+            "confidenceScore": 1.0,
+        }
+
+    def plan(self, text):
+        """
+        Extract the local fields of a document and build the residual model input.
+
+        Returns:
+            RulePlan: Rule entities, residual text and the offset map back into text.
+        """
+        matches = self._matches(text)
+        entities = [self._to_entity(match) for match in matches]
+        complete = self.required_types <= {entity["category"] for entity in entities}
+
+        self.documents += 1
+        self.entities_found += len(entities)
+        self.characters_in += len(text)
+
+        if not complete or not matches:
+            self.characters_to_model += len(text)
+            return RulePlan(entities, text, complete)
+
+        kept = []
+        line_map = []
+        residual_length = 0
+        match_index = 0
+        position = 0
+        for line in text.splitlines(keepends=True):
+            line_end = position + len(line)
+            # (original start, text) pieces of the line left over between rule matches
+            pieces = []
+            cursor = position
+            matched = False
+            while match_index < len(matches) and matches[match_index].start() < line_end:
+                match = matches[match_index]
+                if match.start() > cursor:
+                    pieces.append((cursor, text[cursor:match.start()]))
+                cursor = match.end()
+                matched = True
+                match_index += 1
+            if line_end > cursor:
+                pieces.append((cursor, text[cursor:line_end]))
+
+            if matched and not "".join(piece for _, piece in pieces).strip(_SEPARATORS):
+                position = line_end
+                continue
+            for start, piece in pieces:
+                line_map.append((residual_length, start))
+                kept.append(piece)
+                residual_length += len(piece)
+            position = line_end
+
+        model_text = "".join(kept)
+        if not model_text.strip():
+            model_text = ""
+            self.documents_skipped += 1
+        self.characters_to_model += len(model_text)
+        return RulePlan(entities, model_text, complete, line_map)
+
+    def format_stats(self):
+        """Format extraction counters as a single printable line."""
+        saved = 1 - self.characters_to_model / self.characters_in if self.characters_in else 0
+        return (f"rule extractor: documents={self.documents} local_entities={self.entities_found} "
+                f"model_text_saved={saved:.0%} skipped_model={self.documents_skipped}")
@@ -0,0 +1,91 @@
+"""
+Optional encrypted on-disk cache for Key Vault secrets.
+Short-lived worker processes read secrets from this file instead of calling
+Key Vault, so they start without any network round trips. Entries are encrypted
+with a Fernet key (SECRET_CACHE_KEY) and expire after a TTL.
+Requires the optional `cryptography` package.
+"""
+
+import json
+import os
+import time
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # cryptography is optional; the cache is simply unavailable without it
+    Fernet = None
+    InvalidToken = ValueError
+
+
+class EncryptedSecretCache:
+    """Fernet-encrypted JSON file mapping secret names to values with an expiry."""
+
+    def __init__(self, path, key, ttl_seconds=900):
+        """
+        Args:
+            path (str): Cache file location. Parent directories are created.
+            key (str): Fernet key, e.g. from EncryptedSecretCache.generate_key().
+            ttl_seconds (float): Seconds a cached secret stays valid.
+
+        Raises:
+            RuntimeError: If the cryptography package is not installed.
+            ValueError: If key is not a valid Fernet key.
+        """
+        if Fernet is None:
+            raise RuntimeError("the encrypted secret cache requires the 'cryptography' package")
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._fernet = Fernet(key.encode("ascii") if isinstance(key, str) else key)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    @staticmethod
+    def generate_key():
+        """Create a new random key for SECRET_CACHE_KEY."""
+        if Fernet is None:
+            raise RuntimeError("the encrypted secret cache requires the 'cryptography' package")
+        return Fernet.generate_key().decode("ascii")
+
+    def _load(self):
+        """Read and decrypt the cache file; unreadable or tampered files count as empty."""
+        try:
+            with open(self.path, 'rb') as f:
+                token = f.read()
+            return json.loads(self._fernet.decrypt(token))
+        except (OSError, InvalidToken, ValueError):
+            return {}
+
+    def get_many(self, names):
+        """Return {name: value} for every requested secret that is cached and not expired."""
+        entries = self._load()
+        now = time.time()
+        found = {}
+        for name in names:
+            entry = entries.get(name)
+            if entry and entry.get("expires_at", 0) > now:
+                found[name] = entry["value"]
+        return found
+
+    def put_many(self, secrets):
+        """Store secret values, dropping expired entries and replacing the file atomically."""
+        now = time.time()
+        entries = {name: entry for name, entry in self._load().items() if entry.get("expires_at", 0) > now}
+        for name, value in secrets.items():
+            entries[name] = {"value": value, "expires_at": now + self.ttl_seconds}
+
+        token = self._fernet.encrypt(json.dumps(entries).encode("utf-8"))
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(token)
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        """Delete the cache file."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+if __name__ == "__main__":
+    print(f"SECRET_CACHE_KEY={EncryptedSecretCache.generate_key()}")
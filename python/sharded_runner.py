@@ -0,0 +1,257 @@
+"""
+Multi-process, multi-node runner for very large invoice corpora.
+The corpus is partitioned by a stable hash of each file name into
+node_count x workers shards. Every node runs its shards in a process pool, each
+worker loading only its own files and running its own batched (fine-tuned) or
+async (standard) model pipeline into a partial CSV report. Once all shards are
+done the partial reports are merged into one report in the reports container.
+
+Single machine:
+    python sharded_runner.py --invoices ../data/invoices --workers 8
+
+Several machines sharing an output directory:
+    python sharded_runner.py --invoices DIR --output /shared/run --run-id R --workers 8 --node-index 0 --node-count 4
+    ... (same on nodes 1-3) ...
+    python sharded_runner.py --merge --output /shared/run --run-id R
+"""
+
+import argparse
+import contextlib
+import csv
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from config import Config
+from fine_tuned_ner import REPORT_FIELDNAMES, REQUIRED_SECRETS, report_rows
+from invoice_loader import DEFAULT_INVOICES_DIR, iter_invoice_source
+from report_sink import open_report_sink
+
+FINE_TUNED = "fine-tuned"
+STANDARD = "standard"
+PIPELINES = (FINE_TUNED, STANDARD)
+
+STANDARD_SECRETS = [
+    Config.GPT_5_CHAT_KEY_SECRET,
+    Config.GPT_5_CHAT_ENDPOINT_SECRET,
+    Config.STORAGE_CONNECTION_STRING_SECRET,
+]
+
+
+def shard_of(file_name, shard_count):
+    """
+    Stable shard index of a file, identical across processes, machines and runs
+    (unlike the salted built-in hash).
+    """
+    key = file_name.replace(os.sep, "/").encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big") % shard_count
+
+
+def _part_path(output_dir, shard_index, suffix):
+    return os.path.join(output_dir, f"part-{shard_index:05d}{suffix}")
+
+
+def _pipeline_results(pipeline, invoices, ledger):
+    """(file_name, entities) pairs from the requested model pipeline."""
+    if pipeline == FINE_TUNED:
+        from fine_tuned_ner import extract_entities_batched
+        from invoice_sharding import shard_invoices
+        return extract_entities_batched(shard_invoices(invoices), ledger=ledger)
+    from model_comparison import iter_standard_model
+    return iter_standard_model(invoices)
+
+
+def run_shard(shard_index, shard_count, invoices_dir, output_dir, pipeline, run_id, secrets):
+    """
+    Process one shard of the corpus. Meant to run in a fresh worker process.
+
+    The worker's console output goes to part-NNNNN.log, its rows to part-NNNNN.csv
+    and, once the shard is complete, a summary to part-NNNNN.json.
+
+    Args:
+        shard_index (int): Shard processed by this worker.
+        shard_count (int): Total shards across all nodes.
+        invoices_dir (str): Invoice directory or blob://container/prefix (see
+                            invoice_loader.iter_invoice_source).
+        output_dir (str): Directory receiving the partial report.
+        pipeline (str): One of PIPELINES.
+        run_id (str): Run identifier; the shard's job ledger run id derives from it.
+        secrets (dict): Secret values resolved by the parent process.
+
+    Returns:
+        dict: shard, shard_count, pipeline, documents, rows, seconds, docs_per_sec.
+    """
+    Config.set_secrets(secrets)
+    # Every shard talks to the same service, so they split its quota
+    Config.share_rate_limits(shard_count)
+
+    from metrics import registry
+
+    # A summary left by an earlier attempt would mark this shard complete too early
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(_part_path(output_dir, shard_index, ".json"))
+    started_at = time.perf_counter()
+    documents = 0
+    with open(_part_path(output_dir, shard_index, ".log"), 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log):
+        Config.configure_observability()
+        invoices = iter_invoice_source(invoices_dir, include=lambda name: shard_of(name, shard_count) == shard_index)
+        ledger = Config.get_job_ledger(f"{run_id}-{shard_index}-of-{shard_count}") if pipeline == FINE_TUNED else None
+        sink = open_report_sink(None, None, None, REPORT_FIELDNAMES,
+                                local_path=_part_path(output_dir, shard_index, ".csv"),
+                                block_size=Config.REPORT_BLOCK_SIZE_BYTES)
+        with sink:
+            for file_name, entities in _pipeline_results(pipeline, invoices, ledger):
+                documents += 1
+                sink.write_rows(report_rows(file_name, entities))
+        if ledger:
+            print(ledger.format_stats())
+            ledger.close()
+        print(registry.format_summary())
+    seconds = time.perf_counter() - started_at
+
+    summary = {
+        "shard": shard_index,
+        "shard_count": shard_count,
+        "pipeline": pipeline,
+        "documents": documents,
+        "rows": sink.rows_written,
+        "seconds": seconds,
+        "docs_per_sec": documents / seconds if seconds else 0.0,
+    }
+    # Written last: its presence marks the partial report as complete
+    with open(_part_path(output_dir, shard_index, ".json"), 'w', encoding='utf-8') as f:
+        json.dump(summary, f)
+    return summary
+
+
+def run_node(invoices_dir, output_dir, pipeline, run_id, workers, node_index=0, node_count=1):
+    """
+    Run this node's shards (node_index * workers ... + workers - 1) in a process pool.
+
+    Returns:
+        list: run_shard summaries of the shards that completed.
+    """
+    shard_count = workers * node_count
+    shards = range(node_index * workers, (node_index + 1) * workers)
+    secrets = Config.get_secrets(REQUIRED_SECRETS if pipeline == FINE_TUNED else STANDARD_SECRETS)
+    os.makedirs(output_dir, exist_ok=True)
+
+    print(f"Node {node_index + 1}/{node_count}: shards {shards.start}-{shards.stop - 1} of {shard_count} "
+          f"({pipeline}, {workers} worker process(es))")
+    summaries = []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {
+            executor.submit(run_shard, shard, shard_count, invoices_dir, output_dir, pipeline, run_id, secrets): shard
+            for shard in shards
+        }
+        for future in as_completed(futures):
+            shard = futures[future]
+            try:
+                summary = future.result()
+            except Exception as err:
+                print(f"  [ERROR] Shard {shard} failed: {err} (see {_part_path(output_dir, shard, '.log')})")
+                continue
+            summaries.append(summary)
+            print(f"  ✓ shard {shard}: {summary['documents']} documents, {summary['rows']} rows "
+                  f"in {summary['seconds']:.1f}s ({summary['docs_per_sec']:.1f} docs/sec)")
+    return sorted(summaries, key=lambda summary: summary["shard"])
+
+
+def merge_reports(output_dir, run_id, pipeline=None):
+    """
+    Merge the completed partial reports in output_dir into a single CSV report,
+    written to output_dir and uploaded to the reports container.
+
+    Returns:
+        dict: shard_count, missing (shard indexes without a completed part),
+              documents, rows, report (local path) and uploaded (bool).
+    """
+    summaries = []
+    for path in sorted(glob.glob(os.path.join(output_dir, "part-*.json"))):
+        with open(path, encoding='utf-8') as f:
+            summaries.append(json.load(f))
+    if not summaries:
+        raise ValueError(f"No completed partial reports in {output_dir}")
+    shard_count = summaries[0]["shard_count"]
+    pipeline = pipeline or summaries[0]["pipeline"]
+    missing = sorted(set(range(shard_count)) - {summary["shard"] for summary in summaries})
+
+    csv_file_name = f"sharded_{pipeline.replace('-', '_')}_results_{run_id}.csv"
+    csv_path = os.path.join(output_dir, csv_file_name)
+    try:
+        blob_service_client = Config.get_blob_service_client()
+    except Exception as err:
+        print(f"Error connecting to Azure Storage, writing merged report locally only: {err}")
+        blob_service_client = None
+
+    sink = open_report_sink(blob_service_client, Config.REPORTS_CONTAINER, csv_file_name, REPORT_FIELDNAMES,
+                            local_path=csv_path, block_size=Config.REPORT_BLOCK_SIZE_BYTES)
+    with sink:
+        for summary in summaries:
+            with open(_part_path(output_dir, summary["shard"], ".csv"), newline='', encoding='utf-8') as f:
+                sink.write_rows(csv.DictReader(f))
+
+    return {
+        "shard_count": shard_count,
+        "missing": missing,
+        "documents": sum(summary["documents"] for summary in summaries),
+        "rows": sink.rows_written,
+        "report": csv_path,
+        "uploaded": blob_service_client is not None and sink.upload_error is None,
+    }
+
+
+def _print_merge(merged, wall_seconds=None):
+    print(f"\n💾 Merged report: {merged['rows']} rows for {merged['documents']} documents -> {merged['report']}")
+    if merged["uploaded"]:
+        print(f"  Uploaded to Azure Storage container '{Config.REPORTS_CONTAINER}'")
+    if merged["missing"]:
+        print(f"  [ERROR] {len(merged['missing'])} of {merged['shard_count']} shard(s) have no completed "
+              f"partial report: {merged['missing']}")
+    if wall_seconds:
+        print(f"⏱️  {merged['documents'] / wall_seconds:.1f} docs/sec over {wall_seconds:.1f}s wall time")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run an NER pipeline over a corpus sharded across processes and nodes")
+    parser.add_argument("--invoices", default=DEFAULT_INVOICES_DIR, help="Invoice directory or blob://<container>/<prefix>")
+    parser.add_argument("--pipeline", choices=PIPELINES, default=FINE_TUNED)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes per node (must match on every node)")
+    parser.add_argument("--node-index", type=int, default=0, help="Index of this node (0-based)")
+    parser.add_argument("--node-count", type=int, default=1, help="Number of nodes sharing the corpus")
+    parser.add_argument("--run-id", help="Run identifier shared by all nodes; re-use it to resume")
+    parser.add_argument("--output", help="Directory for partial reports (shared between nodes)")
+    parser.add_argument("--merge", action="store_true", help="Only merge the partial reports in --output")
+    args = parser.parse_args()
+    if not 0 <= args.node_index < args.node_count:
+        parser.error("--node-index must be between 0 and --node-count - 1")
+
+    run_id = args.run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_dir = args.output or f"/tmp/sharded_run_{run_id}"
+    Config.configure_observability()
+
+    if args.merge:
+        merged = merge_reports(output_dir, run_id)
+        _print_merge(merged)
+        sys.exit(1 if merged["missing"] else 0)
+
+    Config.validate(strict=True)
+    started_at = time.perf_counter()
+    run_node(args.invoices, output_dir, args.pipeline, run_id, args.workers, args.node_index, args.node_count)
+    if args.node_count == 1:
+        merged = merge_reports(output_dir, run_id, args.pipeline)
+        _print_merge(merged, time.perf_counter() - started_at)
+        if merged["missing"]:
+            sys.exit(1)
+    else:
+        print(f"\nNode {args.node_index} done. Once every node has finished, merge with:\n"
+              f"  python sharded_runner.py --merge --output {output_dir} --run-id {run_id}")
@@ -0,0 +1,311 @@
+"""
+Batch sizing, fault isolation and concurrency for the standard NER model.
+Requests are sized by an adaptive batch sizer that reacts to latency, throttling
+(HTTP 429) and payload-size rejections, and a failing batch is bisected and retried
+so one bad document no longer drops its whole batch. Large corpora go through the
+async TextAnalyticsClient with several batches in flight at once.
+"""
+
+import asyncio
+import time
+from itertools import chain, islice
+from azure.ai.textanalytics.aio import TextAnalyticsClient as AsyncTextAnalyticsClient
+from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import HttpResponseError
+from metrics import STAGE_RECOGNIZE, registry
+
+# Service limit for synchronous recognize_entities calls
+SERVICE_MAX_BATCH_SIZE = 5
+
+# TextAnalyticsClient options: no SDK retries on error statuses, so 429s reach the loops
+# below (Retry-After pause and rate halving through the limiter, batch shrinking) and
+# other failing requests are bisected instead of resent whole
+CLIENT_RETRY_OPTIONS = {"retry_status": 0}
+
+
+class AdaptiveBatchSizer:
+    """
+    Additive-increase / multiplicative-decrease controller for the batch size.
+
+    Grows by one document after a fast successful request, halves after a slow
+    request, a 429 or a payload-size rejection, and never leaves [minimum, maximum].
+    With adaptive=False the size stays fixed at the initial value.
+    """
+
+    def __init__(self, initial=SERVICE_MAX_BATCH_SIZE, minimum=1, maximum=SERVICE_MAX_BATCH_SIZE,
+                 target_latency=2.0, max_characters=None, adaptive=True):
+        """
+        Args:
+            initial (int): Starting batch size.
+            minimum (int): Smallest batch size the controller will use.
+            maximum (int): Largest batch size, capped at the service maximum.
+            target_latency (float): Request latency (seconds) above which the size shrinks.
+            max_characters (int): Optional combined text budget for a single request.
+            adaptive (bool): If False, always use the initial size.
+        """
+        self.maximum = max(1, min(maximum, SERVICE_MAX_BATCH_SIZE))
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.size = max(self.minimum, min(initial, self.maximum))
+        self.target_latency = target_latency
+        self.max_characters = max_characters
+        self.adaptive = adaptive
+        self.throttled = 0
+
+    def take(self, documents):
+        """Return how many leading documents fit into the next request."""
+        count = min(self.size, len(documents))
+        if self.max_characters:
+            total = 0
+            for index in range(count):
+                total += len(documents[index])
+                if total > self.max_characters and index > 0:
+                    return index
+        return count
+
+    def record_success(self, latency):
+        if not self.adaptive:
+            return
+        if latency > self.target_latency:
+            self.size = max(self.minimum, self.size // 2)
+        else:
+            self.size = min(self.maximum, self.size + 1)
+
+    def record_throttle(self):
+        self.throttled += 1
+        if self.adaptive:
+            self.size = max(self.minimum, self.size // 2)
+
+    def record_too_large(self):
+        if self.adaptive:
+            self.size = max(self.minimum, self.size // 2)
+
+
+def _retry_after_seconds(err, default=1.0):
+    """Read Retry-After from an HttpResponseError, falling back to default."""
+    response = getattr(err, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _is_payload_error(err):
+    """True if the service rejected the request for its size or document count."""
+    if getattr(err, "status_code", None) == 413:
+        return True
+    error = getattr(err, "error", None)
+    # The service answers InvalidArgument and puts the specific code in innererror
+    inner_error = getattr(error, "innererror", None) or {}
+    error_codes = {getattr(error, "code", None), inner_error.get("code")}
+    return bool(error_codes & {"InvalidDocumentBatch", "InvalidDocument"})
+
+
+def recognize_entities_batched(client, documents, batch_sizer, max_throttle_retries=3, limiter=None):
+    """
+    Run recognize_entities over documents in adaptively sized requests.
+
+    A request that fails is split in half and each half retried, down to single
+    documents. Throttled requests are retried after Retry-After up to
+    max_throttle_retries times before being bisected like any other failure.
+
+    Args:
+        client (TextAnalyticsClient): Standard NER client.
+        documents (list): Document texts.
+        batch_sizer (AdaptiveBatchSizer): Controls the request size.
+        limiter (TokenBucket): Optional rate limiter every request waits on.
+
+    Returns:
+        list: One RecognizeEntitiesResult (or DocumentError) per document in input
+              order, or None for documents that could not be processed.
+    """
+    results = [None] * len(documents)
+
+    def send(start, batch):
+        throttle_retries = 0
+        while True:
+            if limiter:
+                limiter.acquire()
+            started_at = time.monotonic()
+            try:
+                batch_results = list(client.recognize_entities(documents=batch))
+            except HttpResponseError as err:
+                if err.status_code == 429 and throttle_retries < max_throttle_retries:
+                    registry.counter("throttled_requests").inc()
+                    batch_sizer.record_throttle()
+                    throttle_retries += 1
+                    if limiter:
+                        limiter.record_throttle(_retry_after_seconds(err))
+                    else:
+                        time.sleep(_retry_after_seconds(err))
+                    continue
+                if _is_payload_error(err):
+                    batch_sizer.record_too_large()
+                failure = err
+            except Exception as err:
+                failure = err
+            else:
+                latency = time.monotonic() - started_at
+                registry.stage(STAGE_RECOGNIZE).record(latency)
+                batch_sizer.record_success(latency)
+                if limiter:
+                    limiter.record_success()
+                results[start:start + len(batch)] = batch_results
+                return
+
+            if len(batch) == 1:
+                print(f"    Document {start + 1} failed and was skipped: {failure}")
+                return
+            middle = len(batch) // 2
+            print(f"    Batch of {len(batch)} failed ({failure}); retrying as {middle} + {len(batch) - middle}")
+            send(start, batch[:middle])
+            send(start + middle, batch[middle:])
+            return
+
+    position = 0
+    while position < len(documents):
+        count = batch_sizer.take(documents[position:])
+        send(position, documents[position:position + count])
+        position += count
+
+    return results
+
+
+class AsyncEntityRecognizer:
+    """
+    Concurrent standard NER engine built on the async TextAnalyticsClient.
+
+    Keeps one event loop and client open for its lifetime and runs up to
+    `concurrency` recognize_entities requests at once, each paced by the optional
+    rate limiter. Requests are sized by the same AdaptiveBatchSizer and character
+    budget as recognize_entities_batched, with each request sized when it is sent
+    so the sizer's reaction to latency, 429s and payload rejections applies to the
+    next ones. Call close() when done.
+    """
+
+    def __init__(self, endpoint, api_key, batch_size=SERVICE_MAX_BATCH_SIZE, concurrency=8,
+                 max_throttle_retries=3, limiter=None, batch_sizer=None):
+        """
+        Args:
+            batch_size (int): Fixed request size, used when no batch_sizer is given.
+            batch_sizer (AdaptiveBatchSizer): Sizes every request (e.g. Config.get_batch_sizer()).
+        """
+        self.batch_sizer = batch_sizer or AdaptiveBatchSizer(initial=batch_size, maximum=batch_size,
+                                                             adaptive=False)
+        self.concurrency = concurrency
+        self.max_throttle_retries = max_throttle_retries
+        self.limiter = limiter
+        self._loop = asyncio.new_event_loop()
+        self._client = AsyncTextAnalyticsClient(endpoint=endpoint, credential=AzureKeyCredential(api_key),
+                                                **CLIENT_RETRY_OPTIONS)
+
+    @property
+    def window_size(self):
+        """Documents to hand to recognize() at once: enough for several full rounds of requests."""
+        return self.batch_sizer.maximum * self.concurrency * 4
+
+    def recognize(self, documents):
+        """
+        Recognize entities in documents concurrently.
+
+        Returns:
+            list: One result per document in input order, or None for documents
+                  that could not be processed even after bisecting their batch.
+        """
+        return self._loop.run_until_complete(self._recognize_all(list(documents)))
+
+    async def _recognize_all(self, documents):
+        results = [None] * len(documents)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        batch_sizer = self.batch_sizer
+
+        async def send(start, batch):
+            throttle_retries = 0
+            while True:
+                try:
+                    async with semaphore:
+                        if self.limiter:
+                            await self.limiter.acquire_async()
+                        started_at = time.perf_counter()
+                        batch_results = await self._client.recognize_entities(documents=batch)
+                        latency = time.perf_counter() - started_at
+                        registry.stage(STAGE_RECOGNIZE).record(latency)
+                except HttpResponseError as err:
+                    if err.status_code == 429 and throttle_retries < self.max_throttle_retries:
+                        registry.counter("throttled_requests").inc()
+                        batch_sizer.record_throttle()
+                        throttle_retries += 1
+                        if self.limiter:
+                            self.limiter.record_throttle(_retry_after_seconds(err))
+                        else:
+                            await asyncio.sleep(_retry_after_seconds(err))
+                        continue
+                    if _is_payload_error(err):
+                        batch_sizer.record_too_large()
+                    failure = err
+                except Exception as err:
+                    failure = err
+                else:
+                    batch_sizer.record_success(latency)
+                    if self.limiter:
+                        self.limiter.record_success()
+                    results[start:start + len(batch)] = batch_results
+                    return
+
+                if len(batch) == 1:
+                    print(f"    Document {start + 1} failed and was skipped: {failure}")
+                    return
+                middle = len(batch) // 2
+                await asyncio.gather(send(start, batch[:middle]), send(start + middle, batch[middle:]))
+                return
+
+        # Size each request only when a slot frees up, so it reflects the latest feedback
+        position = 0
+        in_flight = set()
+        while position < len(documents) or in_flight:
+            while position < len(documents) and len(in_flight) < self.concurrency:
+                count = batch_sizer.take(documents[position:position + batch_sizer.maximum])
+                in_flight.add(asyncio.ensure_future(send(position, documents[position:position + count])))
+                position += count
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        return results
+
+    def close(self):
+        """Close the async client and its event loop."""
+        self._loop.run_until_complete(self._client.close())
+        self._loop.close()
+
+
+def is_large_corpus(documents, threshold):
+    """
+    Peek at a document stream to decide whether it holds more than threshold items.
+
+    Returns:
+        tuple: (is_large, iterator) where iterator still yields every document.
+    """
+    iterator = iter(documents)
+    head = list(islice(iterator, threshold + 1))
+    return len(head) > threshold, chain(head, iterator)
+
+
+def use_async_engine(documents, engine="auto", threshold=50):
+    """
+    Decide between the sync and async standard NER engines.
+
+    Args:
+        documents (iterable): Document stream; it is peeked, not consumed.
+        engine (str): "sync", "async" or "auto" (async when the stream holds more
+                      than threshold documents).
+
+    Returns:
+        tuple: (use_async, iterator over all documents)
+    """
+    if engine == "async":
+        return True, documents
+    if engine == "sync":
+        return False, documents
+    return is_large_corpus(documents, threshold)
@@ -0,0 +1,354 @@
+"""
+Synthetic invoice corpus generator for load, scaling and accuracy tests.
+Produces arbitrarily many invoices in both repository layouts: "batch" files
+like data/invoices (several "Invoice #N" sections per file) and "single"
+invoices with line items like data/test_invoices. Customers, items, quantities,
+prices and dates are drawn with NumPy a chunk at a time, and every document
+carries its ground-truth entity spans. Documents are generated lazily and can be
+streamed to a directory, a blob container (or the in-memory MockBlobContainer)
+plus a JSON Lines label file.
+
+Usage:
+    python3 synthetic_invoices.py --count 100000 --layout single --output ../data/synthetic
+    python3 synthetic_invoices.py --count 50000 --layout batch --invoices-per-file 5 --output /tmp/corpus
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+LAYOUTS = ("single", "batch")
+
+# Entity categories emitted in the ground truth, matching the fine-tuned model's labels
+INVOICE_NUMBER = "InvoiceNumber"
+DATE = "Date"
+CUSTOMER_NAME = "CustomerName"
+ITEM_NAME = "ItemName"
+QUANTITY = "Quantity"
+UNIT_PRICE = "UnitPrice"
+AMOUNT = "Amount"
+
+_CUSTOMER_PREFIXES = np.array([
+    "TechCore", "CloudSync", "DataFlow", "SecureNet", "InnovateTech", "Quantum", "BlueRiver", "NextGen",
+    "Apex", "Silverline", "Redwood", "Northwind", "Fabrikam", "Contoso", "Litware", "Proseware",
+    "Adatum", "Tailspin", "Woodgrove", "Fourth Coffee", "Lakeshore", "Summit", "Ironclad", "BrightPath",
+])
+_CUSTOMER_SUFFIXES = np.array([
+    "Solutions", "Inc", "Systems", "Corp", "Labs", "Systems Inc", "Technologies", "Group", "LLC", "Partners",
+])
+_ITEMS = np.array([
+    "USB-C Cables", "SSD 1TB NVMe", "Network Switch 48-Port", "Wireless Mouse", "Mechanical Keyboard RGB",
+    "High-Performance Graphics Card", "DDR5 Memory Module", "NVMe Storage Drive", "Liquid Cooling System",
+    "27-inch 4K Monitor", "Docking Station", "Laptop Stand", "Webcam 1080p", "Noise-Cancelling Headset",
+    "Rack Server 2U", "UPS Battery Backup", "Cat6 Patch Cable", "Wi-Fi 6 Access Point", "External HDD 4TB",
+    "Thunderbolt Dock",
+])
+_STATUSES = np.array(["Paid", "Pending", "Overdue"])
+_TAX_RATES = np.array([0, 5, 8, 10])
+
+
+def _money(cents, thousands=True):
+    """Format integer cents as a dollar amount, e.g. $1,987.50."""
+    return f"${cents / 100:,.2f}" if thousands else f"${cents / 100:.2f}"
+
+
+class _DocumentBuilder:
+    """Appends text pieces while recording the offsets of entity values."""
+
+    def __init__(self):
+        self.parts = []
+        self.length = 0
+        self.entities = []
+
+    def text(self, value):
+        self.parts.append(value)
+        self.length += len(value)
+
+    def entity(self, category, value):
+        self.entities.append({"text": value, "category": category, "offset": self.length, "length": len(value)})
+        self.text(value)
+
+    def field(self, label, category, value):
+        """Append a "Label: value" line whose value is an entity."""
+        self.text(f"{label}: ")
+        self.entity(category, value)
+        self.text("\n")
+
+    def build(self):
+        return "".join(self.parts)
+
+
+class InvoiceGenerator:
+    """
+    Seeded generator of synthetic invoices with ground-truth entity spans.
+    The same seed and arguments always produce the same corpus.
+    """
+
+    def __init__(self, seed=0, chunk_size=10_000, max_line_items=5, start_date="2024-01-01", date_range_days=730):
+        """
+        Args:
+            seed (int): Seed for numpy.random.default_rng.
+            chunk_size (int): Invoices whose fields are drawn in one vectorized step.
+            max_line_items (int): Upper bound of line items per "single" invoice.
+            start_date (str): Earliest invoice date (ISO format).
+            date_range_days (int): Dates fall within this many days of start_date.
+        """
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.max_line_items = max_line_items
+        self.start_date = np.datetime64(start_date, "D")
+        self.date_range_days = date_range_days
+        self._rng = np.random.default_rng(seed)
+
+    def _draw_invoices(self, count, line_item_counts):
+        """Draw the fields of count invoices with the given number of line items each."""
+        rng = self._rng
+        lines = int(line_item_counts.sum())
+        customers = np.char.add(
+            np.char.add(rng.choice(_CUSTOMER_PREFIXES, count), " "), rng.choice(_CUSTOMER_SUFFIXES, count))
+        dates = (self.start_date + rng.integers(0, self.date_range_days, count)).astype(str)
+        quantities = rng.integers(1, 101, lines)
+        # Unit prices skew low like real hardware invoices: lognormal around ~$50
+        unit_prices = np.clip(np.round(rng.lognormal(np.log(5000), 1.0, lines)), 99, 500_000).astype(np.int64)
+        line_amounts = quantities * unit_prices
+        starts = np.concatenate(([0], np.cumsum(line_item_counts)[:-1]))
+        subtotals = np.add.reduceat(line_amounts, starts)
+        tax_rates = rng.choice(_TAX_RATES, count)
+        taxes = np.round(subtotals * tax_rates / 100).astype(np.int64)
+        # Plain Python lists: much faster to index per document than NumPy scalars
+        columns = {
+            "customers": customers,
+            "dates": dates,
+            "statuses": rng.choice(_STATUSES, count),
+            "items": rng.choice(_ITEMS, lines),
+            "quantities": quantities,
+            "unit_prices": unit_prices,
+            "line_amounts": line_amounts,
+            "line_starts": starts,
+            "line_counts": line_item_counts,
+            "subtotals": subtotals,
+            "tax_rates": tax_rates,
+            "taxes": taxes,
+            "totals": subtotals + taxes,
+        }
+        return {name: values.tolist() for name, values in columns.items()}
+
+    def iter_single(self, count, with_labels=True):
+        """
+        Lazily yield count single-invoice documents with line items (data/test_invoices layout).
+
+        Yields:
+            dict: invoice_loader-shaped {"file_name", "path", "size", "mtime", "content"} plus
+                  "labels", the ground-truth entity list (omitted if with_labels is False).
+        """
+        for chunk_start in range(0, count, self.chunk_size):
+            size = min(self.chunk_size, count - chunk_start)
+            fields = self._draw_invoices(size, self._rng.integers(1, self.max_line_items + 1, size))
+            for row in range(size):
+                index = chunk_start + row
+                doc = _DocumentBuilder()
+                doc.text("INVOICE\n")
+                doc.field("Invoice Number", INVOICE_NUMBER, f"INV-{200001 + index}")
+                doc.field("Date", DATE, fields["dates"][row])
+                doc.field("Customer", CUSTOMER_NAME, fields["customers"][row])
+                doc.text("\nLine Items:\n")
+                first = fields["line_starts"][row]
+                for number, line in enumerate(range(first, first + fields["line_counts"][row]), start=1):
+                    doc.text(f"{number}. ")
+                    doc.entity(ITEM_NAME, fields["items"][line])
+                    doc.text(" - Qty: ")
+                    doc.entity(QUANTITY, str(fields["quantities"][line]))
+                    doc.text(" - Unit Price: ")
+                    doc.entity(UNIT_PRICE, _money(fields["unit_prices"][line], thousands=False))
+                    doc.text(" - Amount: ")
+                    doc.entity(AMOUNT, _money(fields["line_amounts"][line], thousands=False))
+                    doc.text("\n")
+                doc.text("\n")
+                doc.field("Subtotal", AMOUNT, _money(fields["subtotals"][row], thousands=False))
+                doc.field(f"Tax ({fields['tax_rates'][row]}%)", AMOUNT, _money(fields["taxes"][row], thousands=False))
+                doc.field("Total", AMOUNT, _money(fields["totals"][row], thousands=False))
+                yield self._document(f"synthetic_invoice_{index + 1:07d}.txt", doc, with_labels)
+
+    def iter_batches(self, count, invoices_per_file=5, with_labels=True):
+        """
+        Lazily yield batch files holding count invoices in total (data/invoices layout).
+        Each "Invoice #N" section has one item, so the files also exercise invoice_sharding.
+
+        Yields:
+            dict: Same shape as iter_single.
+        """
+        files = -(-count // invoices_per_file)
+        chunk_files = max(1, self.chunk_size // invoices_per_file)
+        for chunk_start in range(0, files, chunk_files):
+            chunk_end = min(files, chunk_start + chunk_files)
+            first_invoice = chunk_start * invoices_per_file
+            size = min(count, chunk_end * invoices_per_file) - first_invoice
+            fields = self._draw_invoices(size, np.ones(size, dtype=np.int64))
+            for file_index in range(chunk_start, chunk_end):
+                doc = _DocumentBuilder()
+                title = f"INVOICE BATCH {file_index + 1:03d}"
+                doc.text(f"{title}\n{'=' * len(title)}\n")
+                first = file_index * invoices_per_file
+                for index in range(first, min(count, first + invoices_per_file)):
+                    row = index - first_invoice
+                    year = str(fields["dates"][row])[:4]
+                    doc.text(f"\nInvoice #{index - first + 1}\n----------\n")
+                    doc.field("Invoice Number", INVOICE_NUMBER, f"INV-{year}-{index + 1:06d}")
+                    doc.field("Date", DATE, fields["dates"][row])
+                    doc.field("Customer", CUSTOMER_NAME, fields["customers"][row])
+                    doc.field("Amount", AMOUNT, _money(fields["line_amounts"][row]))
+                    doc.field("Quantity", QUANTITY, str(fields["quantities"][row]))
+                    doc.field("Item", ITEM_NAME, fields["items"][row])
+                    doc.field("Unit Price", UNIT_PRICE, _money(fields["unit_prices"][row]))
+                    doc.text(f"Status: {fields['statuses'][row]}\n")
+                yield self._document(f"synthetic_batch_{file_index + 1:06d}.txt", doc, with_labels)
+
+    @staticmethod
+    def _document(file_name, doc, with_labels):
+        content = doc.build()
+        document = {"file_name": file_name, "path": None, "size": len(content), "mtime": 0, "content": content}
+        if with_labels:
+            document["labels"] = doc.entities
+        return document
+
+
+def generate_invoices(count, layout="single", seed=0, invoices_per_file=5, with_labels=True, **options):
+    """
+    Lazily generate a synthetic corpus.
+
+    Args:
+        count (int): Number of invoices (for "batch", spread over files of invoices_per_file).
+        layout (str): "single" or "batch".
+        seed (int): Corpus seed.
+        with_labels (bool): Attach ground-truth "labels" to every document.
+        **options: Further InvoiceGenerator arguments.
+
+    Yields:
+        dict: Documents in the invoice_loader shape.
+    """
+    generator = InvoiceGenerator(seed=seed, **options)
+    if layout == "single":
+        return generator.iter_single(count, with_labels=with_labels)
+    if layout == "batch":
+        return generator.iter_batches(count, invoices_per_file=invoices_per_file, with_labels=with_labels)
+    raise ValueError(f"Unknown layout: {layout}")
+
+
+class MockBlobContainer:
+    """
+    In-memory stand-in for azure.storage.blob.ContainerClient, holding just the
+    calls the corpus writer and loaders use (upload_blob, list_blobs, download_blob).
+    Like the real service, every upload gives the blob a new ETag and last-modified time.
+    """
+
+    class _Properties:
+        def __init__(self, name, size, etag=None, last_modified=None):
+            self.name = name
+            self.size = size
+            self.etag = etag
+            self.last_modified = last_modified
+
+    class _Downloader:
+        def __init__(self, data, offset=None, length=None):
+            start = offset or 0
+            self._data = data[start:start + length] if length is not None else data[start:]
+
+        def readall(self):
+            return self._data
+
+    def __init__(self, container_name="mock"):
+        self.container_name = container_name
+        self.blobs = {}
+        # Blob name -> (etag, last_modified)
+        self.properties = {}
+        self._uploads = 0
+
+    def upload_blob(self, name, data, overwrite=False, **kwargs):
+        if name in self.blobs and not overwrite:
+            raise ValueError(f"Blob already exists: {name}")
+        self.blobs[name] = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+        self._uploads += 1
+        self.properties[name] = (f'"0x{self._uploads:016X}"', datetime.now(timezone.utc))
+
+    def list_blobs(self, name_starts_with=None, **kwargs):
+        for name, data in self.blobs.items():
+            if name_starts_with is None or name.startswith(name_starts_with):
+                yield self._Properties(name, len(data), *self.properties[name])
+
+    def download_blob(self, name, offset=None, length=None, **kwargs):
+        return self._Downloader(self.blobs[name], offset, length)
+
+
+def write_corpus(documents, output_dir=None, container=None, labels_path=None, prefix=""):
+    """
+    Stream generated documents to a directory and/or a blob container.
+
+    Args:
+        documents (iterable): Output of generate_invoices.
+        output_dir (str): Local directory for the .txt files (created if missing).
+        container: ContainerClient or MockBlobContainer receiving prefix + file_name.
+        labels_path (str): JSON Lines file receiving {"file_name", "entities"} per document.
+        prefix (str): Blob name prefix, e.g. "synthetic/".
+
+    Returns:
+        dict: {"documents", "bytes", "entities"} written.
+    """
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    labels_file = open(labels_path, 'w', encoding='utf-8') if labels_path else None
+    totals = {"documents": 0, "bytes": 0, "entities": 0}
+    try:
+        for document in documents:
+            data = document["content"].encode("utf-8")
+            if output_dir:
+                with open(os.path.join(output_dir, document["file_name"]), 'wb') as f:
+                    f.write(data)
+            if container is not None:
+                container.upload_blob(prefix + document["file_name"], data, overwrite=True)
+            labels = document.get("labels", [])
+            if labels_file:
+                labels_file.write(json.dumps({"file_name": document["file_name"], "entities": labels}) + "\n")
+            totals["documents"] += 1
+            totals["bytes"] += len(data)
+            totals["entities"] += len(labels)
+    finally:
+        if labels_file:
+            labels_file.close()
+    return totals
+
+
+def load_labels(labels_path):
+    """Read a JSON Lines label file written by write_corpus into {file_name: entities}."""
+    labels = {}
+    with open(labels_path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                labels[record["file_name"]] = record["entities"]
+    return labels
+
+
+if __name__ == "__main__":
+    import time
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic invoice corpus with ground-truth labels")
+    parser.add_argument("--count", type=int, default=1000, help="Number of invoices")
+    parser.add_argument("--layout", choices=LAYOUTS, default="single")
+    parser.add_argument("--invoices-per-file", type=int, default=5, help="Invoices per batch file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="Directory for the invoice files")
+    parser.add_argument("--labels", help="Ground-truth JSON Lines file (default: <output>/labels.jsonl)")
+    args = parser.parse_args()
+
+    started_at = time.perf_counter()
+    totals = write_corpus(
+        generate_invoices(args.count, layout=args.layout, seed=args.seed, invoices_per_file=args.invoices_per_file),
+        output_dir=args.output,
+        labels_path=args.labels or os.path.join(args.output, "labels.jsonl"),
+    )
+    elapsed = time.perf_counter() - started_at
+    print(f"✅ Wrote {totals['documents']} documents ({totals['bytes'] / 1e6:.1f} MB, "
+          f"{totals['entities']} labelled entities) to {args.output} in {elapsed:.2f}s")
@@ -0,0 +1,36 @@
+"""
+Shared pytest fixtures. The modules under test live flat in python/, so that
+folder is put on sys.path; the Language service is the local mock from
+mock_language_service.py.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_language_service import start_mock_language_service  # noqa: E402
+
+
+@pytest.fixture
+def mock_service():
+    """
+    Factory starting mock Language services, all shut down after the test.
+
+    Returns:
+        callable: Takes start_mock_language_service's arguments and returns
+                  (service, endpoint).
+    """
+    servers = []
+
+    def start(**options):
+        server, service, endpoint = start_mock_language_service(**options)
+        servers.append(server)
+        return service, endpoint
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
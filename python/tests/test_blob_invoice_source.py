@@ -0,0 +1,147 @@
+"""Blob invoice source tests against synthetic_invoices.MockBlobContainer."""
+
+import threading
+import time
+
+import pytest
+
+from blob_invoice_source import iter_blob_invoices
+from config import Config
+from invoice_loader import iter_invoice_source
+from invoice_manifest import CHANGED, NEW, InvoiceManifest
+from synthetic_invoices import MockBlobContainer
+
+
+class RecordingContainer(MockBlobContainer):
+    """MockBlobContainer that logs download calls and how many overlap."""
+
+    def __init__(self, container_name="invoices", download_latency=0.0):
+        super().__init__(container_name)
+        self.download_latency = download_latency
+        self.downloads = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def download_blob(self, name, offset=None, length=None, **kwargs):
+        with self._lock:
+            self.downloads.append((name, offset, length))
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            time.sleep(self.download_latency)
+            return super().download_blob(name, offset, length)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class _FakeBlobServiceClient:
+    def __init__(self, containers):
+        self.containers = containers
+
+    def get_container_client(self, container):
+        return self.containers[container]
+
+
+def upload_invoices(container, count, prefix=""):
+    for index in range(count):
+        container.upload_blob(f"{prefix}invoice_{index:03d}.txt", f"Invoice INV-{index:05d} total ${index}.00")
+
+
+def test_large_blobs_download_as_parallel_ranges():
+    container = RecordingContainer(download_latency=0.02)
+    # Multi-byte characters straddle the range boundaries
+    content = "Facture n° 42, café crème – " * 200
+    container.upload_blob("in/large.txt", content)
+    container.upload_blob("in/small.txt", "Invoice INV-00001")
+    size = len(content.encode("utf-8"))
+
+    invoices = list(iter_blob_invoices(container, prefix="in/", range_size=1000, max_concurrency=4))
+
+    assert [invoice["content"] for invoice in invoices] == [content, "Invoice INV-00001"]
+    ranges = sorted((offset, length) for name, offset, length in container.downloads if name == "in/large.txt")
+    assert ranges == [(offset, min(1000, size - offset)) for offset in range(0, size, 1000)]
+    assert ("in/small.txt", None, None) in container.downloads
+    assert 1 < container.peak_in_flight <= 4
+
+
+def test_downloads_stay_within_the_window():
+    container = RecordingContainer(download_latency=0.01)
+    upload_invoices(container, 40)
+
+    invoices = iter_blob_invoices(container, max_concurrency=3)
+    first = next(invoices)
+    time.sleep(0.1)
+    started = len(container.downloads)
+    invoices.close()
+
+    assert first["file_name"] == "invoice_000.txt"
+    # The consumed blob plus one window ahead, not the whole listing
+    assert started <= 1 + 3
+    assert container.peak_in_flight <= 3
+
+
+def test_etag_and_metadata_are_captured():
+    container = RecordingContainer()
+    upload_invoices(container, 3, prefix="2024/")
+
+    invoices = list(iter_blob_invoices(container, prefix="2024/"))
+
+    for invoice in invoices:
+        blob_name = "2024/" + invoice["file_name"]
+        etag, last_modified = container.properties[blob_name]
+        assert invoice["etag"] == etag
+        assert invoice["mtime"] == last_modified.timestamp()
+        assert invoice["size"] == len(container.blobs[blob_name])
+        assert invoice["path"] == f"blob://invoices/{blob_name}"
+    assert len({invoice["etag"] for invoice in invoices}) == 3
+
+
+@pytest.fixture
+def blob_source(monkeypatch):
+    container = RecordingContainer()
+    monkeypatch.setattr(Config, "get_blob_service_client",
+                        classmethod(lambda cls: _FakeBlobServiceClient({"invoices": container})))
+    monkeypatch.setattr(Config, "BLOB_DOWNLOAD_CONCURRENCY", 4)
+    monkeypatch.setattr(Config, "BLOB_DOWNLOAD_RANGE_BYTES", 16)
+    return container
+
+
+def run_incremental(location, manifest):
+    """One incremental pass the way the pipelines make it."""
+    invoices = list(manifest.changed_invoices(iter_invoice_source(location, skip=manifest.is_unchanged)))
+    manifest.commit("report.csv", {invoice["file_name"]: 1 for invoice in invoices})
+    return sorted(invoice["file_name"] for invoice in invoices)
+
+
+def test_manifest_skips_unchanged_blobs_without_downloading(blob_source, tmp_path):
+    location = "blob://invoices/incoming/"
+    upload_invoices(blob_source, 5, prefix="incoming/")
+    upload_invoices(blob_source, 2, prefix="archive/")
+    manifest = InvoiceManifest(str(tmp_path / "manifest.sqlite"), location, "test")
+
+    assert run_incremental(location, manifest) == [f"invoice_{index:03d}.txt" for index in range(5)]
+    assert manifest.counts[NEW] == 5
+    assert not any(name.startswith("archive/") for name, _, _ in blob_source.downloads)
+
+    blob_source.downloads.clear()
+    assert run_incremental(location, manifest) == []
+    assert blob_source.downloads == []
+    assert manifest.counts["unchanged"] == 5
+
+    # New content and a re-upload of the same content both get a new ETag
+    blob_source.upload_blob("incoming/invoice_001.txt", "Invoice INV-99999 total $5.00", overwrite=True)
+    blob_source.upload_blob("incoming/invoice_002.txt", blob_source.blobs["incoming/invoice_002.txt"], overwrite=True)
+    blob_source.downloads.clear()
+
+    assert run_incremental(location, manifest) == ["invoice_001.txt"]
+    assert {name for name, _, _ in blob_source.downloads} == {"incoming/invoice_001.txt", "incoming/invoice_002.txt"}
+    assert manifest.counts[CHANGED] == 1
+    assert manifest.counts["touched"] == 1
+
+    # The touched blob's new ETag was stored, so it is not downloaded again
+    blob_source.downloads.clear()
+    assert run_incremental(location, manifest) == []
+    assert blob_source.downloads == []
+    manifest.close()
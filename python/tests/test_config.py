@@ -0,0 +1,52 @@
+"""Config secret resolution tests with a stand-in Key Vault client."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from config import Config
+
+
+class FakeSecretClient:
+    """SecretClient stand-in that records which secrets were requested."""
+
+    def __init__(self):
+        self.requested = []
+
+    def get_secret(self, name):
+        # Key Vault round trips must not hold the secrets lock
+        assert not Config._secrets_lock.locked()
+        self.requested.append(name)
+        return SimpleNamespace(value=f"vault:{name}")
+
+
+@pytest.fixture
+def key_vault(monkeypatch):
+    client = FakeSecretClient()
+    monkeypatch.setattr(Config, "_secrets", {})
+    monkeypatch.setattr(Config, "SECRET_CACHE_ENABLED", False)
+    monkeypatch.setattr(Config, "get_key_vault_client", classmethod(lambda cls: client))
+    return client
+
+
+def test_overridden_secret_is_not_fetched(key_vault, monkeypatch):
+    monkeypatch.setattr(Config, "STORAGE_CONNECTION_STRING", "UseDevelopmentStorage=true")
+    names = [Config.LANGUAGE_SERVICE_KEY_SECRET, Config.STORAGE_CONNECTION_STRING_SECRET]
+
+    secrets = Config.get_secrets(names)
+
+    assert key_vault.requested == [Config.LANGUAGE_SERVICE_KEY_SECRET]
+    assert secrets == {Config.LANGUAGE_SERVICE_KEY_SECRET: f"vault:{Config.LANGUAGE_SERVICE_KEY_SECRET}",
+                       Config.STORAGE_CONNECTION_STRING_SECRET: "UseDevelopmentStorage=true"}
+    assert Config.get_storage_connection_string() == "UseDevelopmentStorage=true"
+    assert key_vault.requested == [Config.LANGUAGE_SERVICE_KEY_SECRET]
+
+
+def test_secret_without_override_is_fetched_once(key_vault, monkeypatch):
+    monkeypatch.setattr(Config, "STORAGE_CONNECTION_STRING", None)
+
+    Config.prefetch_secrets([Config.STORAGE_CONNECTION_STRING_SECRET])
+    connection_string = Config.get_storage_connection_string()
+
+    assert connection_string == f"vault:{Config.STORAGE_CONNECTION_STRING_SECRET}"
+    assert key_vault.requested == [Config.STORAGE_CONNECTION_STRING_SECRET]
@@ -0,0 +1,100 @@
+"""Standard NER pipeline tests: per-document failures stay out of the cache and the manifest."""
+
+from types import SimpleNamespace
+
+import pytest
+from azure.core.exceptions import HttpResponseError
+
+import custom_ner
+from config import Config
+from invoice_manifest import InvoiceManifest
+from result_cache import ResultCache
+
+
+class FakeTextAnalyticsClient:
+    """recognize_entities stand-in: "BROKEN" documents fail their request, "REJECTED" ones get a DocumentError."""
+
+    def recognize_entities(self, documents):
+        if any("BROKEN" in document for document in documents):
+            raise HttpResponseError(message="Internal server error")
+        return [
+            SimpleNamespace(is_error=True, error="InvalidDocument") if "REJECTED" in document
+            else SimpleNamespace(is_error=False, entities=[SimpleNamespace(
+                text="Contoso", category="Organization", subcategory=None,
+                offset=document.find("Contoso"), length=7, confidence_score=0.9)])
+            for document in documents
+        ]
+
+
+class FakeBlobServiceClient:
+    def __init__(self):
+        self.committed = {}
+
+    def get_blob_client(self, container, blob):
+        service = self
+
+        class BlobClient:
+            def stage_block(self, block_id, data):
+                pass
+
+            def commit_block_list(self, blocks):
+                service.committed[blob] = len(blocks)
+
+        return BlobClient()
+
+
+@pytest.fixture
+def standard_pipeline(monkeypatch, tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(Config, "RESULT_CACHE_ENABLED", True)
+    monkeypatch.setattr(Config, "_result_cache", cache)
+    monkeypatch.setattr(Config, "RULE_EXTRACTOR_ENABLED", False)
+    monkeypatch.setattr(Config, "STANDARD_NER_ENGINE", "sync")
+    monkeypatch.setattr(Config, "RATE_LIMIT_STANDARD_RPS", 0)
+    monkeypatch.setattr(Config, "_rate_limiters", {})
+    monkeypatch.setattr(Config, "get_blob_service_client", classmethod(lambda cls: FakeBlobServiceClient()))
+    Config.set_secrets({Config.GPT_5_CHAT_ENDPOINT_SECRET: "https://mock/", Config.GPT_5_CHAT_KEY_SECRET: "key"})
+    return cache
+
+
+INVOICES = [
+    {"file_name": "good_1.txt", "content": "Invoice from Contoso Ltd"},
+    {"file_name": "broken.txt", "content": "Invoice from Contoso Ltd BROKEN"},
+    {"file_name": "good_2.txt", "content": "Second invoice from Contoso Ltd"},
+    {"file_name": "rejected.txt", "content": "Invoice from Contoso Ltd REJECTED"},
+]
+
+
+def test_failed_documents_are_reported_and_not_cached(standard_pipeline):
+    result = custom_ner.entity_recognition_example(
+        FakeTextAnalyticsClient(), [invoice["content"] for invoice in INVOICES])
+
+    assert result["uploaded"]
+    assert result["failed_documents"] == [1, 3]
+    assert result["entity_counts"] == [1, 0, 1, 0]
+    cached = [standard_pipeline.get(custom_ner._cache_key(invoice["content"])) for invoice in INVOICES]
+    assert [entities is not None for entities in cached] == [True, False, True, False]
+
+
+def test_failed_documents_are_not_committed_to_the_manifest(standard_pipeline, tmp_path):
+    manifest = InvoiceManifest(str(tmp_path / "manifest.sqlite"), "invoices", "standard")
+    file_names = [invoice["file_name"] for invoice in manifest.changed_invoices(INVOICES)]
+
+    result = custom_ner.entity_recognition_example(
+        FakeTextAnalyticsClient(), [invoice["content"] for invoice in INVOICES])
+    assert custom_ner.commit_manifest(manifest, result, file_names) == 2
+
+    # The next incremental run hands the failed invoices out again
+    retried = [invoice["file_name"] for invoice in manifest.changed_invoices(INVOICES)]
+    assert retried == ["broken.txt", "rejected.txt"]
+    manifest.close()
+
+
+def test_manifest_is_not_committed_without_an_uploaded_report(tmp_path):
+    manifest = InvoiceManifest(str(tmp_path / "manifest.sqlite"), "invoices", "standard")
+    file_names = [invoice["file_name"] for invoice in manifest.changed_invoices(INVOICES[:1])]
+    result = {"report": "report.csv", "uploaded": False, "entity_counts": [1], "failed_documents": []}
+
+    assert custom_ner.commit_manifest(manifest, result, file_names) == 0
+    assert manifest.report_set() == []
+    manifest.close()
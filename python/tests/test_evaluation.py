@@ -0,0 +1,120 @@
+"""Scoring tests: hand-checked cases plus a plain-Python reference for the vectorized matching."""
+
+import random
+
+import numpy as np
+import pytest
+
+from evaluation import (EXACT, OVERLAP, STANDARD_CATEGORY_MAP, entities_to_frame, evaluate, match_entities, score,
+                        threshold_curve)
+
+
+def entity(category, offset, length, confidence=1.0):
+    return {"text": "x" * length, "category": category, "offset": offset, "length": length, "confidence": confidence}
+
+
+def reference_matches(gold, pred, mode):
+    """Greedy one-to-one matching written out pair by pair: most confident prediction, then largest overlap."""
+    gold_spans = sorted({(doc, category, start, end) for doc, spans in gold.items()
+                         for category, start, end in ((e["category"], e["offset"], e["offset"] + e["length"])
+                                                      for e in spans)})
+    pairs = []
+    for doc, spans in pred.items():
+        for index, e in enumerate(spans):
+            start, end = e["offset"], e["offset"] + e["length"]
+            for gold_doc, category, gold_start, gold_end in gold_spans:
+                if gold_doc != doc or category != e["category"]:
+                    continue
+                if mode == EXACT and (gold_start, gold_end) != (start, end):
+                    continue
+                if mode == OVERLAP and not (gold_start < end and start < gold_end):
+                    continue
+                overlap = min(end, gold_end) - max(start, gold_start)
+                pairs.append(((-e["confidence"], doc, index, -overlap, gold_start),
+                              (doc, index), (gold_doc, category, gold_start, gold_end)))
+    matched, taken = set(), set()
+    for _, prediction, gold_span in sorted(pairs):
+        if prediction not in matched and gold_span not in taken:
+            matched.add(prediction)
+            taken.add(gold_span)
+    return matched, len(gold_spans)
+
+
+def test_exact_scores_per_type_and_micro():
+    gold = {"a.txt": [entity("Date", 0, 10), entity("Amount", 20, 5), entity("Amount", 40, 5)],
+            "b.txt": [entity("Date", 3, 10)]}
+    pred = {"a.txt": [entity("Date", 0, 10), entity("Amount", 20, 6), entity("Amount", 40, 5)],
+            "b.txt": [entity("Date", 3, 10), entity("CustomerName", 15, 4)]}
+
+    table = score(entities_to_frame(gold), entities_to_frame(pred), EXACT)
+
+    assert table.loc["Date", ["tp", "fp", "fn"]].tolist() == [2, 0, 0]
+    assert table.loc["Amount", ["tp", "fp", "fn"]].tolist() == [1, 1, 1]
+    assert table.loc["CustomerName", ["tp", "fp", "fn"]].tolist() == [0, 1, 0]
+    assert table.loc["micro", ["tp", "fp", "fn"]].tolist() == [3, 2, 1]
+    assert table.loc["micro", "precision"] == pytest.approx(3 / 5)
+    assert table.loc["micro", "recall"] == pytest.approx(3 / 4)
+    assert table.loc["micro", "f1"] == pytest.approx(2 * 0.6 * 0.75 / 1.35)
+
+
+def test_overlap_matching_is_one_to_one_and_most_confident_first():
+    gold = {"a.txt": [entity("Item", 0, 10), entity("Item", 2, 3), entity("Item", 30, 10)]}
+    pred = {"a.txt": [
+        entity("Item", 1, 3, confidence=0.6),    # intersects both nested gold spans
+        entity("Item", 0, 9, confidence=0.9),    # most confident: takes the outer span
+        entity("Item", 31, 2, confidence=0.8),
+        entity("Item", 35, 10, confidence=0.7),  # loses the third span to the more confident prediction
+        entity("Item", 50, 5, confidence=0.9),
+    ]}
+
+    matched, _ = match_entities(entities_to_frame(gold), entities_to_frame(pred), OVERLAP)
+
+    assert matched["matched"].tolist() == [True, True, True, False, False]
+
+
+def test_duplicate_labels_and_category_map():
+    labels = {"a.txt": [entity("CustomerName", 0, 7), entity("CustomerName", 0, 7), entity("Date", 10, 10)]}
+    predictions = {"a.txt": [entity("Organization", 0, 7, 0.9), entity("DateTime", 10, 10, 0.4)],
+                   "unlabelled.txt": []}
+
+    results = evaluate(labels, predictions, category_map=STANDARD_CATEGORY_MAP, thresholds=[0.0, 0.5, 0.95])
+
+    assert results[EXACT].loc["micro", ["tp", "fp", "fn"]].tolist() == [2, 0, 0]
+    curve = results["curve"]
+    assert curve["tp"].tolist() == [2, 1, 0]
+    assert curve["fn"].tolist() == [0, 1, 2]
+    assert curve["precision"].tolist() == [1.0, 1.0, 0.0]
+
+
+def test_documents_without_predictions_are_not_scored():
+    labels = {"a.txt": [entity("Date", 0, 10)], "never_run.txt": [entity("Date", 0, 10)]}
+    results = evaluate(labels, {"a.txt": [entity("Date", 0, 10)]})
+    assert results[EXACT].loc["micro", ["tp", "fp", "fn"]].tolist() == [1, 0, 0]
+
+
+@pytest.mark.parametrize("mode", [EXACT, OVERLAP])
+# Offsets near 2**31 are too wide for packed keys and take the hash-join path
+@pytest.mark.parametrize("offset_base", [0, 2 ** 31])
+def test_vectorized_matching_agrees_with_the_reference(mode, offset_base):
+    rng = random.Random(42)
+    categories = ["Date", "Amount", "Item"]
+
+    def random_entities():
+        return {f"{doc}.txt": [entity(rng.choice(categories), offset_base + rng.randrange(60), rng.randint(1, 12),
+                                      round(rng.random(), 2))
+                               for _ in range(rng.randint(0, 25))]
+                for doc in range(30)}
+
+    gold, pred = random_entities(), random_entities()
+    # Some predictions copy a gold span exactly
+    for doc, spans in gold.items():
+        pred[doc].extend(dict(span, confidence=round(rng.random(), 2)) for span in spans[::3])
+
+    matched, gold_counts = match_entities(entities_to_frame(gold), entities_to_frame(pred), mode)
+    expected, gold_total = reference_matches(gold, pred, mode)
+
+    predictions = [(doc, index) for doc, spans in pred.items() for index in range(len(spans))]
+    assert {prediction for prediction, hit in zip(predictions, matched["matched"]) if hit} == expected
+    assert int(gold_counts.sum()) == gold_total
+    curve = threshold_curve(entities_to_frame(gold), entities_to_frame(pred), mode, thresholds=np.array([0.0, 0.5]))
+    assert curve["tp"].iloc[0] == len(expected)
@@ -0,0 +1,100 @@
+"""Extraction daemon tests with the fine-tuned pipeline stubbed out."""
+
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+import pytest
+
+import extraction_daemon
+from extraction_daemon import ExtractionDaemon, next_batch
+
+
+def queued(*names):
+    pending = queue.Queue()
+    for index, name in enumerate(names):
+        pending.put({"file_name": name, "content": f"Invoice {index}"})
+    return pending
+
+
+def test_next_batch_holds_back_duplicate_names():
+    pending = queued("a.txt", "b.txt", "a.txt", "c.txt", "a.txt")
+    held = deque()
+    stop = threading.Event()
+
+    first = next_batch(pending, 10, 0.05, stop, held)
+    second = next_batch(pending, 10, 0.05, stop, held)
+    third = next_batch(pending, 10, 0.05, stop, held)
+    stop.set()
+
+    assert [invoice["content"] for invoice in first] == ["Invoice 0", "Invoice 1", "Invoice 3"]
+    assert [invoice["content"] for invoice in second] == ["Invoice 2"]
+    assert [invoice["content"] for invoice in third] == ["Invoice 4"]
+    assert next_batch(pending, 10, 0.05, stop, held) == []
+
+
+def test_next_batch_takes_held_invoices_first_up_to_the_batch_size():
+    held = deque({"file_name": f"{index}.txt", "content": ""} for index in range(5))
+    batch = next_batch(queued("new.txt"), 3, 0.05, threading.Event(), held)
+    assert [invoice["file_name"] for invoice in batch] == ["0.txt", "1.txt", "2.txt"]
+    assert [invoice["file_name"] for invoice in held] == ["3.txt", "4.txt"]
+
+
+@pytest.fixture
+def daemon_factory(monkeypatch, tmp_path):
+    """Starts daemons whose pipeline fails every invoice whose content contains "FAIL"."""
+    batches = []
+
+    def extract(invoices, failed=None):
+        invoices = list(invoices)
+        batches.append([invoice["file_name"] for invoice in invoices])
+        for invoice in invoices:
+            if "FAIL" in invoice["content"]:
+                failed.add(invoice["file_name"])
+                continue
+            yield invoice["file_name"], [{"category": "Organization", "text": "Contoso", "confidence_score": 0.9,
+                                          "offset": 0, "length": 7}]
+
+    monkeypatch.setattr(extraction_daemon, "extract_entities_batched", extract)
+    monkeypatch.setattr(ExtractionDaemon, "warm_up", lambda self: None)
+    daemons = []
+
+    def start(**options):
+        options = dict({"window_seconds": 0.1, "retry_backoff": 0.05}, **options)
+        daemon = ExtractionDaemon(str(tmp_path / "out"), **options)
+        daemon.start("127.0.0.1", 0)
+        daemons.append(daemon)
+        return daemon
+
+    start.batches = batches
+    yield start
+    for daemon in daemons:
+        if not daemon._stop.is_set():
+            daemon.stop()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_same_name_submissions_are_processed_separately(daemon_factory):
+    daemon = daemon_factory(max_documents=10)
+    assert daemon.submit("invoice.txt", "first")
+    assert daemon.submit("invoice.txt", "second FAIL")
+    assert daemon.submit("other.txt", "third")
+
+    wait_for(lambda: daemon.health()["dead_letter_invoices"] == 1)
+    daemon.stop()
+
+    assert all(len(set(batch)) == len(batch) for batch in daemon_factory.batches)
+    assert daemon.health()["invoices_processed"] == 2
+    # Only the failing submission was retried and dead-lettered
+    with open(f"{daemon.dead_letter_dir}/invoice.txt.error.json", encoding="utf-8") as f:
+        assert json.load(f)["attempts"] == daemon.max_attempts
+    with open(f"{daemon.dead_letter_dir}/invoice.txt", encoding="utf-8") as f:
+        assert f.read() == "second FAIL"
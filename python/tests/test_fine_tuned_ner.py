@@ -0,0 +1,110 @@
+"""Fine-tuned pipeline tests against the mock Language service."""
+
+from pathlib import Path
+
+import pytest
+
+import fine_tuned_ner
+from config import Config
+from invoice_sharding import shard_invoices
+from job_ledger import COMPLETED, JobLedger
+
+INVOICES = [{"file_name": f"invoice_{index:03d}.txt",
+             "content": f"Invoice INV-{index:05d} from Contoso Ltd, total $1{index}.00"}
+            for index in range(10)]
+DOCUMENTS_PER_JOB = 2
+DATA_DIR = Path(__file__).resolve().parents[2] / "data" / "invoices"
+
+
+@pytest.fixture
+def fine_tuned_pipeline(mock_service, monkeypatch):
+    service, endpoint = mock_service(job_latency=0.2)
+    monkeypatch.setattr(fine_tuned_ner, "LANGUAGE_SERVICE_ENDPOINT", endpoint)
+    monkeypatch.setattr(Config, "RESULT_CACHE_ENABLED", False)
+    monkeypatch.setattr(Config, "RULE_EXTRACTOR_ENABLED", False)
+    monkeypatch.setattr(Config, "CUSTOM_NER_MAX_DOCUMENTS_PER_JOB", DOCUMENTS_PER_JOB)
+    monkeypatch.setattr(Config, "CUSTOM_NER_MAX_IN_FLIGHT_JOBS", 2)
+    monkeypatch.setattr(Config, "CUSTOM_NER_POLL_FIRST_DELAY", 0.05)
+    monkeypatch.setattr(Config, "CUSTOM_NER_POLL_MAX_DELAY", 0.05)
+    monkeypatch.setattr(Config, "CUSTOM_NER_POLL_JITTER", 0)
+    monkeypatch.setattr(Config, "RATE_LIMIT_JOB_SUBMIT_RPS", 0)
+    monkeypatch.setattr(Config, "RATE_LIMIT_JOB_POLL_RPS", 0)
+    monkeypatch.setattr(Config, "_rate_limiters", {})
+    Config.set_secrets({Config.LANGUAGE_SERVICE_KEY_SECRET: "key"})
+    return service
+
+
+def test_resumed_run_reattaches_jobs_instead_of_resubmitting(fine_tuned_pipeline, tmp_path):
+    service = fine_tuned_pipeline
+    ledger_path = str(tmp_path / "ledger.sqlite")
+
+    # The first attempt dies once the first result is in, with jobs still running on the service
+    crashed = fine_tuned_ner.extract_entities_batched(INVOICES, ledger=JobLedger(ledger_path, "run-1"))
+    first_file_name, _ = next(crashed)
+    crashed.close()
+    submitted_before_crash = service.submitted_jobs
+    assert submitted_before_crash < len(INVOICES) // DOCUMENTS_PER_JOB
+
+    ledger = JobLedger(ledger_path, "run-1")
+    resumed = dict(fine_tuned_ner.extract_entities_batched(INVOICES, ledger=ledger))
+
+    assert sorted(resumed) == [invoice["file_name"] for invoice in INVOICES]
+    assert first_file_name in resumed
+    # Jobs from the first attempt were picked up again; only the rest was submitted
+    assert ledger.reattached_jobs > 0
+    assert service.submitted_jobs == len(INVOICES) // DOCUMENTS_PER_JOB
+    assert ledger.counts() == {COMPLETED: len(INVOICES)}
+    ledger.close()
+
+
+def test_completed_run_is_replayed_from_the_ledger(fine_tuned_pipeline, tmp_path):
+    service = fine_tuned_pipeline
+    ledger_path = str(tmp_path / "ledger.sqlite")
+    ledger = JobLedger(ledger_path, "run-2")
+    first = dict(fine_tuned_ner.extract_entities_batched(INVOICES, ledger=ledger))
+    ledger.close()
+    submitted = service.submitted_jobs
+
+    ledger = JobLedger(ledger_path, "run-2")
+    again = dict(fine_tuned_ner.extract_entities_batched(INVOICES, ledger=ledger))
+
+    assert again == first
+    assert service.submitted_jobs == submitted
+    assert ledger.reused == len(INVOICES)
+    ledger.close()
+
+
+def test_entities_of_sharded_batch_files_point_into_the_source_file(fine_tuned_pipeline):
+    service = fine_tuned_pipeline
+    sources = {path.name: path.read_text(encoding="utf-8") for path in sorted(DATA_DIR.glob("*.txt"))[:2]}
+    invoices = [{"file_name": name, "content": content} for name, content in sources.items()]
+    shards = list(shard_invoices(invoices))
+
+    results = list(fine_tuned_ner.extract_entities_batched(shards))
+
+    # One result per sub-document, packed into jobs of DOCUMENTS_PER_JOB
+    assert len(results) == len(shards)
+    assert service.submitted_jobs == -(-len(shards) // DOCUMENTS_PER_JOB)
+    numbers = set()
+    for file_name, entities in results:
+        for entity in entities:
+            assert sources[file_name][entity["offset"]:entity["offset"] + entity["length"]] == entity["text"]
+        numbers.update((file_name, entity["offset"]) for entity in entities if entity["category"] == "InvoiceNumber")
+    # Each sub-document's invoice number lands at a distinct position in its file
+    assert len(numbers) == len(shards)
+
+
+def test_rule_and_model_entities_point_into_the_source_file(fine_tuned_pipeline, monkeypatch):
+    monkeypatch.setattr(Config, "RULE_EXTRACTOR_ENABLED", True)
+    monkeypatch.setattr(Config, "_rule_extractor", None)
+    source = (DATA_DIR / "invoice_001.txt").read_text(encoding="utf-8")
+    shards = list(shard_invoices([{"file_name": "invoice_001.txt", "content": source}]))
+
+    entities = [entity for _, found in fine_tuned_ner.extract_entities_batched(shards) for entity in found]
+
+    for entity in entities:
+        assert source[entity["offset"]:entity["offset"] + entity["length"]] == entity["text"]
+    categories = [entity["category"] for entity in entities]
+    # Invoice numbers come from the rules only; customers from the model's residual text
+    assert categories.count("InvoiceNumber") == len(shards)
+    assert categories.count("CustomerName") == len(shards)
@@ -0,0 +1,62 @@
+"""Pooled session tests against a local server that always answers 503."""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from azure.core.exceptions import HttpResponseError
+from azure.core.pipeline import Pipeline
+from azure.core.pipeline.policies import RetryPolicy
+from azure.core.pipeline.transport import RequestsTransport
+from azure.core.rest import HttpRequest
+
+from http_client import create_session, pool_stats, sdk_session
+
+
+class _UnavailableHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests += 1
+        self.send_response(503)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def unavailable_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _UnavailableHandler)
+    server.requests = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_plain_session_retries_transient_failures(unavailable_server):
+    server, url = unavailable_server
+    session = create_session(max_retries=2, retry_backoff=0)
+
+    assert session.get(url).status_code == 503
+    assert server.requests == 3
+
+
+def test_sdk_requests_are_retried_by_the_sdk_only(unavailable_server):
+    server, url = unavailable_server
+    session = create_session(max_retries=2, retry_backoff=0)
+    transport = RequestsTransport(session=sdk_session(session), session_owner=False)
+    pipeline = Pipeline(transport, policies=[RetryPolicy(retry_total=2, retry_backoff_factor=0)])
+
+    with pipeline:
+        response = pipeline.run(HttpRequest("GET", url)).http_response
+    with pytest.raises(HttpResponseError):
+        response.raise_for_status()
+
+    # Three SDK attempts, not three times three
+    assert server.requests == 3
+    # Sent over the shared pool
+    assert pool_stats(session)["requests"] == 3
@@ -0,0 +1,54 @@
+"""Batch file sharding tests on the bundled data/invoices files."""
+
+from pathlib import Path
+
+from invoice_sharding import remap_entities, shard_invoice, shard_invoices
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "data" / "invoices"
+
+
+def load_invoice(name):
+    return {"file_name": name, "content": (DATA_DIR / name).read_text(encoding="utf-8")}
+
+
+def find_entity(text, value, category="Test"):
+    return {"text": value, "category": category, "offset": text.index(value), "length": len(value)}
+
+
+def test_batch_file_is_split_at_invoice_boundaries():
+    invoice = load_invoice("invoice_001.txt")
+
+    shards = shard_invoice(invoice)
+
+    assert len(shards) == invoice["content"].count("\nInvoice #")
+    assert [shard["shard"] for shard in shards] == list(range(len(shards)))
+    assert all(shard["shard_count"] == len(shards) and shard["file_name"] == "invoice_001.txt" for shard in shards)
+    for shard in shards:
+        assert shard["content"].startswith("Invoice #")
+        # Every sub-document is a verbatim slice of the file at its offset
+        assert invoice["content"][shard["offset"]:shard["offset"] + len(shard["content"])] == shard["content"]
+    # The batch title is not sent to the model
+    assert not any("INVOICE BATCH" in shard["content"] for shard in shards)
+
+
+def test_file_without_boundaries_is_a_single_shard():
+    invoice = {"file_name": "single.txt", "content": "Invoice Number: INV-2025-900\nAmount: $10.00"}
+    assert shard_invoice(invoice) == [dict(invoice, offset=0, shard=0, shard_count=1)]
+
+
+def test_remapped_offsets_point_into_the_source_file():
+    invoices = [load_invoice("invoice_001.txt"), load_invoice("invoice_002.txt")]
+
+    for shard in shard_invoices(invoices):
+        source = next(invoice["content"] for invoice in invoices if invoice["file_name"] == shard["file_name"])
+        number = shard["content"].split("Invoice Number: ")[1].split("\n")[0]
+        entities = [find_entity(shard["content"], number, "InvoiceNumber"),
+                    {"text": "Unknown", "category": "Test", "offset": -1, "length": 7}]
+
+        remapped = remap_entities(entities, shard["offset"])
+
+        start = remapped[0]["offset"]
+        assert source[start:start + remapped[0]["length"]] == number
+        # Entities without a position keep it, and the inputs are left untouched
+        assert remapped[1]["offset"] == -1
+        assert entities[0]["offset"] == shard["content"].index(number)
@@ -0,0 +1,156 @@
+"""Scheduler tests for language_jobs.run_batched_jobs against the mock Language service."""
+
+import pytest
+
+from language_jobs import build_job_payload, pack_invoices_into_jobs, run_batched_jobs, submit_job
+from polling import PollingPolicy
+
+API_VERSION = "2023-04-01"
+# Poll every 50ms so jobs finish promptly
+FAST_POLLING = PollingPolicy(first_delay=0.05, multiplier=1.0, max_delay=0.05, jitter=0)
+
+
+def make_invoices(count):
+    return [{"file_name": f"invoice_{index:03d}.txt",
+             "content": f"Invoice INV-{index:05d} from Contoso Ltd, total $1{index}.00"}
+            for index in range(count)]
+
+
+def run_jobs(endpoint, invoices, **options):
+    return list(run_batched_jobs(invoices, endpoint, API_VERSION, "key", "project", "deployment",
+                                 polling_policy=FAST_POLLING, **options))
+
+
+class _GoneResponse:
+    """Job status response for a job the service no longer knows."""
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+        self.text = ""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class _GoneSession:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.gets = 0
+
+    def get(self, url, **kwargs):
+        self.gets += 1
+        return _GoneResponse(self.status_code)
+
+
+def test_packing_respects_document_and_character_limits():
+    invoices = [{"file_name": f"{index}.txt", "content": "x" * length}
+                for index, length in enumerate([40, 40, 40, 10, 150, 5, 5, 5, 5])]
+
+    batches = list(pack_invoices_into_jobs(invoices, max_documents=3, max_characters=100))
+
+    assert [[invoice["file_name"] for invoice in batch] for batch in batches] == [
+        ["0.txt", "1.txt"], ["2.txt", "3.txt"], ["4.txt"], ["5.txt", "6.txt", "7.txt"], ["8.txt"]]
+    # The oversized invoice travels alone instead of being dropped
+    assert all(sum(len(invoice["content"]) for invoice in batch) <= 100 for batch in batches if len(batch) > 1)
+
+
+def test_none_items_yield_empty_batches_without_closing_the_current_one():
+    invoices = make_invoices(3)
+    batches = list(pack_invoices_into_jobs([invoices[0], None, invoices[1], None, invoices[2]],
+                                           max_documents=25, max_characters=10000))
+    assert batches == [[], [], invoices]
+
+
+def test_results_are_mapped_back_by_document_id(mock_service):
+    service, endpoint = mock_service(job_latency=0.05)
+    # Same file name from different folders, packed into the same job
+    invoices = [{"file_name": "invoice.txt", "path": f"{folder}/invoice.txt",
+                 "content": f"Invoice INV-{index:05d} dated 2024-02-{index + 1:02d}, total ${index}00.00"}
+                for index, folder in enumerate(["north", "south", "east", "west", "central"])]
+
+    results = run_jobs(endpoint, invoices, max_documents=25, max_characters=10000)
+
+    assert service.submitted_jobs == 1
+    assert sorted(invoice["path"] for invoice, _ in results) == sorted(invoice["path"] for invoice in invoices)
+    for invoice, entities in results:
+        assert entities
+        for entity in entities:
+            assert invoice["content"][entity["offset"]:entity["offset"] + entity["length"]] == entity["text"]
+        number = next(entity["text"] for entity in entities if entity["category"] == "InvoiceNumber")
+        assert number in invoice["content"]
+
+
+def test_max_in_flight_is_respected(mock_service):
+    service, endpoint = mock_service(job_latency=0.2)
+    invoices = make_invoices(24)
+    in_flight = {}
+    peak = 0
+
+    def on_submit(job_location, id_map):
+        nonlocal peak
+        in_flight[job_location] = {invoice["file_name"] for invoice in id_map.values()}
+        peak = max(peak, len(in_flight))
+
+    results = []
+    for invoice, entities in run_batched_jobs(invoices, endpoint, API_VERSION, "key", "project", "deployment",
+                                              max_documents=2, max_characters=10000, max_in_flight=3,
+                                              polling_policy=FAST_POLLING, on_submit=on_submit):
+        results.append((invoice, entities))
+        for location, pending in list(in_flight.items()):
+            pending.discard(invoice["file_name"])
+            if not pending:
+                del in_flight[location]
+
+    assert peak == 3
+    assert service.submitted_jobs == 12
+    assert sorted(invoice["file_name"] for invoice, _ in results) == [invoice["file_name"] for invoice in invoices]
+    assert all(entities is not None for _, entities in results)
+
+
+def test_attached_jobs_are_reattached_not_resubmitted(mock_service):
+    service, endpoint = mock_service(job_latency=0.1)
+    earlier = make_invoices(3)
+    payload, id_map = build_job_payload(earlier, "project", "deployment")
+    location, _ = submit_job(endpoint, API_VERSION, "key", payload)
+    assert location
+
+    new = make_invoices(5)[3:]
+    results = run_jobs(endpoint, new, max_documents=25, max_characters=10000, max_in_flight=2,
+                       attached_jobs=[{"location": location, "id_map": id_map}])
+
+    # One job from before the "restart" plus one for the new invoices
+    assert service.submitted_jobs == 2
+    assert sorted(invoice["file_name"] for invoice, _ in results) == [invoice["file_name"] for invoice in earlier + new]
+    assert all(entities is not None for _, entities in results)
+
+
+def test_unknown_job_on_the_service_fails_its_invoices(mock_service):
+    _, endpoint = mock_service(job_latency=0.1)
+    invoices = make_invoices(2)
+    _, id_map = build_job_payload(invoices, "project", "deployment")
+    location = f"{endpoint}language/analyze-text/jobs/no-such-job?api-version={API_VERSION}"
+
+    results = run_jobs(endpoint, [], max_documents=25, max_characters=10000,
+                       attached_jobs=[{"location": location, "id_map": id_map}])
+
+    assert [(invoice["file_name"], entities) for invoice, entities in results] == [
+        ("invoice_000.txt", None), ("invoice_001.txt", None)]
+
+
+@pytest.mark.parametrize("status_code", [404, 410])
+def test_gone_job_fails_after_one_poll(status_code):
+    invoices = make_invoices(3)
+    _, id_map = build_job_payload(invoices, "project", "deployment")
+    session = _GoneSession(status_code)
+
+    results = run_jobs("http://127.0.0.1:1/", [], max_documents=25, max_characters=10000, session=session,
+                       attached_jobs=[{"location": "http://127.0.0.1:1/language/analyze-text/jobs/gone",
+                                       "id_map": id_map}])
+
+    # Failed right away instead of being polled until the deadline
+    assert session.gets == 1
+    assert [entities for _, entities in results] == [None, None, None]
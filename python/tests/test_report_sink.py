@@ -0,0 +1,61 @@
+"""CsvReportSink tests: staged blocks are only committed once the report is complete."""
+
+import csv
+
+import pytest
+
+from report_sink import CsvReportSink
+
+FIELDNAMES = ["File", "Entity"]
+
+
+class FakeBlobClient:
+    def __init__(self):
+        self.staged = {}
+        self.committed = None
+
+    def stage_block(self, block_id, data):
+        self.staged[block_id] = data
+
+    def commit_block_list(self, blocks):
+        self.committed = b"".join(self.staged[block.id] for block in blocks)
+
+
+def rows(count):
+    return [{"File": f"invoice_{index}.txt", "Entity": "Contoso"} for index in range(count)]
+
+
+def test_completed_report_is_committed(tmp_path):
+    blob = FakeBlobClient()
+    with CsvReportSink(FIELDNAMES, blob_client=blob, local_path=str(tmp_path / "report.csv"), block_size=64) as sink:
+        sink.write_rows(rows(10))
+
+    assert sink.committed
+    assert len(sink.block_ids) > 1
+    committed = list(csv.DictReader(blob.committed.decode("utf-8").splitlines()))
+    assert committed == rows(10)
+    with open(tmp_path / "report.csv", newline="", encoding="utf-8") as f:
+        assert list(csv.DictReader(f)) == rows(10)
+
+
+def test_failed_run_does_not_publish_a_truncated_report():
+    blob = FakeBlobClient()
+    with pytest.raises(RuntimeError):
+        with CsvReportSink(FIELDNAMES, blob_client=blob, block_size=64) as sink:
+            sink.write_rows(rows(10))
+            raise RuntimeError("crashed mid-corpus")
+
+    assert blob.staged
+    assert blob.committed is None
+    assert not sink.committed
+
+
+def test_partial_report_is_committed_when_asked_for():
+    blob = FakeBlobClient()
+    with pytest.raises(RuntimeError):
+        with CsvReportSink(FIELDNAMES, blob_client=blob, block_size=64, commit_partial=True) as sink:
+            sink.write_rows(rows(4))
+            raise RuntimeError("interrupted")
+
+    assert sink.committed
+    assert list(csv.DictReader(blob.committed.decode("utf-8").splitlines())) == rows(4)
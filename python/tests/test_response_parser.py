@@ -0,0 +1,103 @@
+"""Job response parser tests: decoded, streamed and live bodies give the same records."""
+
+import io
+import json
+
+import pytest
+import requests
+
+import response_parser
+from language_jobs import build_job_payload, submit_job
+from response_parser import parse_entities, parse_job_response, parse_job_stream, read_job_response
+
+API_VERSION = "2023-04-01"
+
+BODY = {
+    "jobId": "job-1",
+    "status": "succeeded",
+    "errors": [],
+    "tasks": {"items": [
+        {"kind": "CustomEntityRecognitionLROResults", "results": {
+            "documents": [
+                {"id": "0", "entities": [
+                    {"text": "INV-2025-001", "category": "InvoiceNumber", "offset": 16, "length": 12,
+                     "confidenceScore": 0.98},
+                    {"text": "TechCore Solutions", "category": "CustomerName", "subcategory": "Company",
+                     "offset": 58, "length": 18, "confidenceScore": 0.87,
+                     "resolutions": [{"resolutionKind": "Unknown", "value": "nested"}]},
+                ], "warnings": []},
+                {"id": "2", "entities": [], "warnings": []},
+            ],
+            "errors": [{"id": "1", "error": {"code": "InvalidDocument", "message": "Document text is empty."}}],
+        }},
+        # Only the first task is reported
+        {"kind": "CustomEntityRecognitionLROResults", "results": {
+            "documents": [{"id": "9", "entities": [{"text": "ignored", "category": "Item"}]}], "errors": []}},
+    ]},
+}
+
+
+def assert_parsed(response):
+    assert response.status == "succeeded"
+    assert response.documents == {
+        "0": [{"text": "INV-2025-001", "category": "InvoiceNumber", "subcategory": "", "confidence": 0.98,
+               "offset": 16, "length": 12},
+              {"text": "TechCore Solutions", "category": "CustomerName", "subcategory": "Company",
+               "confidence": 0.87, "offset": 58, "length": 18}],
+        "2": [],
+    }
+    assert response.errors == {"1": {"code": "InvalidDocument", "message": "Document text is empty."}}
+    assert response.job_errors == []
+    assert response.first_entities()[0]["text"] == "INV-2025-001"
+
+
+@pytest.mark.parametrize("encode", [lambda body: body, json.dumps, lambda body: json.dumps(body).encode("utf-8")])
+def test_every_document_is_parsed_in_one_pass(encode):
+    assert_parsed(parse_job_response(encode(BODY)))
+
+
+def test_standard_library_decoder_without_orjson(monkeypatch):
+    monkeypatch.setattr(response_parser, "orjson", None)
+    assert_parsed(parse_job_response(json.dumps(BODY).encode("utf-8")))
+
+
+def test_missing_fields_get_defaults():
+    assert parse_entities([{"text": "Contoso", "subcategory": None}]) == [
+        {"text": "Contoso", "category": "Unknown", "subcategory": "", "confidence": 0, "offset": -1, "length": 7}]
+    assert parse_job_response({"documents": [{"id": "0", "entities": []}]}).documents == {"0": []}
+    assert parse_job_response({"status": "running", "tasks": {"items": []}}).documents == {}
+
+
+def test_streamed_body_matches_the_decoded_one():
+    pytest.importorskip("ijson")
+    assert_parsed(parse_job_stream(io.BytesIO(json.dumps(BODY).encode("utf-8"))))
+
+    failed = {"status": "failed", "errors": [{"code": "InternalServerError", "message": "Job failed."}]}
+    response = parse_job_stream(io.BytesIO(json.dumps(failed).encode("utf-8")))
+    assert (response.status, response.job_errors) == ("failed", failed["errors"])
+
+
+def test_stream_falls_back_to_decoding_without_ijson(monkeypatch):
+    monkeypatch.setattr(response_parser, "ijson", None)
+    assert_parsed(parse_job_stream(io.BytesIO(json.dumps(BODY).encode("utf-8"))))
+
+
+@pytest.mark.parametrize("stream_threshold", [0, 1024 ** 3])
+def test_live_job_response_is_parsed(mock_service, stream_threshold):
+    _, endpoint = mock_service(job_latency=0)
+    invoices = [{"file_name": f"invoice_{index}.txt",
+                 "content": f"Invoice INV-2025-00{index} dated 2025-01-1{index}\nCustomer: Contoso Ltd\n"}
+                for index in range(3)]
+    payload, id_map = build_job_payload(invoices, "project", "deployment")
+    location, _ = submit_job(endpoint, API_VERSION, "key", payload)
+
+    with requests.get(location, headers={"Ocp-Apim-Subscription-Key": "key"}, stream=True) as http_response:
+        response = read_job_response(http_response, stream_threshold=stream_threshold)
+
+    assert response.status == "succeeded"
+    assert sorted(response.documents) == sorted(id_map)
+    for doc_id, entities in response.documents.items():
+        content = id_map[doc_id]["content"]
+        assert {entity["category"] for entity in entities} >= {"InvoiceNumber", "Date", "CustomerName"}
+        for entity in entities:
+            assert content[entity["offset"]:entity["offset"] + entity["length"]] == entity["text"]
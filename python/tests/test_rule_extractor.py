@@ -0,0 +1,80 @@
+"""Rule pre-extractor tests: local fields, residual model text and offsets back into the document."""
+
+from rule_extractor import RuleExtractor
+
+INVOICE = (
+    "Invoice #1\n"
+    "----------\n"
+    "Invoice Number: INV-2025-001\n"
+    "Date: 2025-01-15\n"
+    "Customer: TechCore Solutions\n"
+    "Amount: $1,987.50\n"
+    "Quantity: 25\n"
+    "Item: USB-C Cables\n"
+    "Unit Price: $79.50\n"
+    "Status: Paid\n"
+)
+
+
+def model_entity(plan, value, category):
+    """Entity the model would return for value, positioned in the residual text."""
+    return {"text": value, "category": category, "offset": plan.model_text.index(value), "length": len(value)}
+
+
+def test_rule_fields_are_cut_from_the_model_text():
+    plan = RuleExtractor(required_types=["InvoiceNumber", "Date"]).plan(INVOICE)
+
+    assert plan.complete and plan.needs_model
+    assert {entity["category"]: entity["text"] for entity in plan.entities} == {
+        "InvoiceNumber": "INV-2025-001", "Date": "2025-01-15", "Amount": "$1,987.50",
+        "Quantity": "25", "UnitPrice": "$79.50"}
+    for entity in plan.entities:
+        assert INVOICE[entity["offset"]:entity["offset"] + entity["length"]] == entity["text"]
+    assert plan.model_text == "Invoice #1\n----------\nCustomer: TechCore Solutions\nItem: USB-C Cables\nStatus: Paid\n"
+
+
+def test_residual_entity_offsets_map_back_into_the_document():
+    plan = RuleExtractor().plan(INVOICE)
+    entities = [model_entity(plan, "TechCore Solutions", "CustomerName"),
+                model_entity(plan, "USB-C Cables", "Item"),
+                model_entity(plan, "Paid", "Status")]
+
+    remapped = plan.remap_model_entities(entities)
+
+    assert [INVOICE[entity["offset"]:entity["offset"] + entity["length"]] for entity in remapped] == [
+        "TechCore Solutions", "USB-C Cables", "Paid"]
+    # The model's entities are copied, not modified
+    assert entities[0]["offset"] == plan.model_text.index("TechCore Solutions")
+
+
+def test_fields_sharing_a_line_with_residual_text():
+    text = "Ref Invoice No.: ACME-77 for Contoso Ltd; Date: 3/4/2024 paid by Fabrikam\n"
+    plan = RuleExtractor(required_types=["InvoiceNumber"]).plan(text)
+
+    assert [entity["text"] for entity in plan.entities] == ["ACME-77", "3/4/2024"]
+    assert "ACME-77" not in plan.model_text and "3/4/2024" not in plan.model_text
+    for value in ("Contoso Ltd", "Fabrikam"):
+        entity, = plan.remap_model_entities([model_entity(plan, value, "Organization")])
+        assert text[entity["offset"]:entity["offset"] + entity["length"]] == value
+
+
+def test_incomplete_document_is_sent_whole_and_duplicates_are_dropped():
+    text = "Invoice Number: INV-2025-002\nCustomer: CloudSync Inc\n"
+    plan = RuleExtractor(required_types=["InvoiceNumber", "Date"]).plan(text)
+
+    assert not plan.complete
+    assert plan.model_text == text
+    number = model_entity(plan, "INV-2025-002", "InvoiceNumber")
+    customer = model_entity(plan, "CloudSync Inc", "CustomerName")
+    # The model's copy of a field the rules already found is dropped
+    assert plan.remap_model_entities([number, customer]) == [customer]
+
+
+def test_fully_covered_document_skips_the_model():
+    extractor = RuleExtractor()
+    plan = extractor.plan("Invoice Number: INV-2025-003\nDate: 2025-01-17\nAmount: $10.00\n")
+
+    assert not plan.needs_model
+    assert plan.model_text == ""
+    assert len(plan.entities) == 3
+    assert extractor.documents_skipped == 1
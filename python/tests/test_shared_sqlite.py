@@ -0,0 +1,74 @@
+"""Result cache and job ledger files shared by several worker processes, as sharded_runner does."""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from job_ledger import COMPLETED, SUBMITTED, JobLedger
+from result_cache import ResultCache
+
+WORKERS = 4
+DOCUMENTS = 150
+
+
+def make_invoice(shard, index):
+    return {"file_name": f"invoice_{shard}_{index:03d}.txt", "content": f"Invoice {shard}-{index} from Contoso Ltd"}
+
+
+def run_shard(cache_path, ledger_path, shard):
+    """One shard worker: cache every result and record it in its own ledger run."""
+    cache = ResultCache(cache_path)
+    ledger = JobLedger(ledger_path, f"run-{shard}-of-{WORKERS}")
+    for index in range(DOCUMENTS):
+        invoice = make_invoice(shard, index)
+        entities = [{"category": "Organization", "text": "Contoso Ltd", "offset": 0, "length": 11}]
+        if index % 10 == 0:
+            ledger.mark_submitted(f"https://mock/jobs/{shard}-{index}", {"0": invoice})
+        cache.put(ResultCache.make_key(invoice["content"], "test", "model", "v1"), entities)
+        ledger.mark_completed(invoice, entities)
+    cache.close()
+    ledger.close()
+    return shard
+
+
+def submit_job(ledger_path):
+    ledger = JobLedger(ledger_path, "other-shard")
+    ledger.mark_submitted("https://mock/jobs/other", {"0": make_invoice("other", 0)})
+    counts = ledger.counts()
+    ledger.close()
+    return counts
+
+
+def spawn_pool(workers):
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def test_concurrent_shards_share_the_cache_and_ledger(tmp_path):
+    cache_path = str(tmp_path / "cache.sqlite")
+    ledger_path = str(tmp_path / "ledger.sqlite")
+
+    with spawn_pool(WORKERS) as pool:
+        shards = list(pool.map(run_shard, [cache_path] * WORKERS, [ledger_path] * WORKERS, range(WORKERS)))
+
+    assert shards == list(range(WORKERS))
+    cache = ResultCache(cache_path)
+    assert len(cache) == WORKERS * DOCUMENTS
+    cache.close()
+    for shard in range(WORKERS):
+        ledger = JobLedger(ledger_path, f"run-{shard}-of-{WORKERS}")
+        assert ledger.counts() == {COMPLETED: DOCUMENTS}
+        ledger.close()
+
+
+def test_buffered_completions_do_not_block_other_processes(tmp_path):
+    ledger_path = str(tmp_path / "ledger.sqlite")
+    ledger = JobLedger(ledger_path, "this-shard")
+    # Fewer than COMMIT_INTERVAL, so they are still buffered
+    for index in range(10):
+        ledger.mark_completed(make_invoice("this", index), [])
+
+    with spawn_pool(1) as pool:
+        counts = pool.submit(submit_job, ledger_path).result(timeout=10)
+
+    assert counts == {SUBMITTED: 1}
+    assert ledger.counts() == {COMPLETED: 10}
+    ledger.close()
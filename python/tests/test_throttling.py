@@ -0,0 +1,141 @@
+"""429 handling tests: TokenBucket back-off and throttled standard NER requests against the mock service."""
+
+import time
+
+import pytest
+from azure.ai.textanalytics import TextAnalyticsClient
+from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import HttpResponseError, ODataV4Format
+
+import standard_ner
+from mock_language_service import MAX_DOCUMENTS_PER_REQUEST
+from rate_limiter import TokenBucket
+from standard_ner import CLIENT_RETRY_OPTIONS, AdaptiveBatchSizer, AsyncEntityRecognizer, recognize_entities_batched
+
+RETRY_AFTER = 0.2
+
+
+def make_documents(count):
+    return [f"Invoice INV-{index:05d} issued by Contoso Ltd on 2024-01-{index % 28 + 1:02d}" for index in range(count)]
+
+
+def assert_every_document_answered(documents, results):
+    assert len(results) == len(documents)
+    for document, result in zip(documents, results):
+        assert result is not None and not result.is_error
+        # Results stay aligned with their documents across retries and splits
+        assert all(entity.text in document for entity in result.entities)
+
+
+def test_throttle_pauses_for_retry_after_and_halves_rate():
+    bucket = TokenBucket(rate=100, name="test")
+    bucket.acquire()
+
+    bucket.record_throttle(retry_after=RETRY_AFTER)
+
+    assert bucket.rate == 50
+    started = time.monotonic()
+    waited = bucket.acquire()
+    assert waited >= RETRY_AFTER * 0.9
+    assert time.monotonic() - started >= RETRY_AFTER * 0.9
+
+
+def test_repeated_throttles_stop_at_min_rate():
+    bucket = TokenBucket(rate=100, min_rate=20)
+    for _ in range(5):
+        bucket.record_throttle(retry_after=0)
+    assert bucket.rate == 20
+    assert bucket.throttled == 5
+
+
+def test_successes_recover_the_configured_rate():
+    bucket = TokenBucket(rate=100, recovery=0.1)
+    bucket.record_throttle(retry_after=0)
+    bucket.record_throttle(retry_after=0)
+    assert bucket.rate == 25
+
+    rates = []
+    for _ in range(10):
+        bucket.record_success()
+        rates.append(bucket.rate)
+
+    assert rates[:3] == pytest.approx([35, 45, 55])
+    # Never beyond the configured rate
+    assert rates[-1] == 100 and max(rates) == 100
+
+
+def test_disabled_bucket_only_counts():
+    bucket = TokenBucket(rate=0)
+    bucket.record_throttle(retry_after=5)
+    assert bucket.acquire() == 0
+    assert bucket.throttled == 1
+
+
+def test_throttled_requests_are_retried_without_losing_documents(mock_service):
+    service, endpoint = mock_service(throttle_probability=0.3, retry_after=RETRY_AFTER, seed=7)
+    client = TextAnalyticsClient(endpoint=endpoint, credential=AzureKeyCredential("key"), **CLIENT_RETRY_OPTIONS)
+    limiter = TokenBucket(rate=200, name="standard")
+    batch_sizer = AdaptiveBatchSizer()
+    documents = make_documents(40)
+
+    with client:
+        results = recognize_entities_batched(client, documents, batch_sizer, max_throttle_retries=6,
+                                             limiter=limiter)
+
+    assert_every_document_answered(documents, results)
+    assert service.throttled_requests > 0
+    assert limiter.throttled == batch_sizer.throttled == service.throttled_requests
+    # Each 429 paused the next request for Retry-After
+    assert limiter.waited_seconds >= service.throttled_requests * RETRY_AFTER * 0.9
+
+
+def test_async_engine_retries_throttled_requests_without_losing_documents(mock_service):
+    service, endpoint = mock_service(throttle_probability=0.3, retry_after=RETRY_AFTER, seed=11)
+    limiter = TokenBucket(rate=200, name="standard")
+    documents = make_documents(60)
+    recognizer = AsyncEntityRecognizer(endpoint, "key", concurrency=4, max_throttle_retries=6, limiter=limiter,
+                                       batch_sizer=AdaptiveBatchSizer())
+    try:
+        results = recognizer.recognize(documents)
+    finally:
+        recognizer.close()
+
+    assert_every_document_answered(documents, results)
+    assert service.throttled_requests > 0
+    assert limiter.throttled == service.throttled_requests
+
+
+def test_oversized_batch_is_shrunk_and_bisected(mock_service, monkeypatch):
+    service, endpoint = mock_service()
+    # Let the sizer start above the mock's per-request document limit
+    monkeypatch.setattr(standard_ner, "SERVICE_MAX_BATCH_SIZE", MAX_DOCUMENTS_PER_REQUEST * 2)
+    client = TextAnalyticsClient(endpoint=endpoint, credential=AzureKeyCredential("key"), **CLIENT_RETRY_OPTIONS)
+    batch_sizer = AdaptiveBatchSizer(initial=MAX_DOCUMENTS_PER_REQUEST * 2, maximum=MAX_DOCUMENTS_PER_REQUEST * 2)
+    documents = make_documents(30)
+
+    rejected = []
+    record_too_large = batch_sizer.record_too_large
+    monkeypatch.setattr(batch_sizer, "record_too_large", lambda: rejected.append(batch_sizer.size) or record_too_large())
+
+    with client:
+        results = recognize_entities_batched(client, documents, batch_sizer)
+
+    assert_every_document_answered(documents, results)
+    # Every rejection was recognised as a payload error and halved the size
+    assert rejected and rejected[0] == MAX_DOCUMENTS_PER_REQUEST * 2
+    assert batch_sizer.size <= MAX_DOCUMENTS_PER_REQUEST + 1
+    assert service.recognition_requests < len(documents)
+
+
+@pytest.mark.parametrize("body, expected", [
+    ({"error": {"code": "InvalidArgument", "message": "Too many records.",
+                "innererror": {"code": "InvalidDocumentBatch", "message": "Too many records."}}}, True),
+    ({"error": {"code": "InvalidDocumentBatch", "message": "Too many records."}}, True),
+    ({"error": {"code": "InvalidArgument", "message": "Bad request.",
+                "innererror": {"code": "InvalidParameterValue", "message": "Bad request."}}}, False),
+])
+def test_payload_errors_are_recognised_in_the_raw_error_body(body, expected):
+    # The error shape the service (and mock_language_service) returns, before any SDK rewriting
+    err = HttpResponseError(message="Bad request")
+    err.error = ODataV4Format(body)
+    assert standard_ner._is_payload_error(err) is expected